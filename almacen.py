@@ -0,0 +1,198 @@
+# almacen.py
+import json
+import math
+import sqlite3
+import threading
+
+import numpy as np
+
+from modelos import MODELOS_CONTEOS, crear_calculadora, modelo_de
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS experimentos (
+    experimento TEXT PRIMARY KEY,
+    modelo      TEXT NOT NULL,
+    parametros  TEXT NOT NULL,
+    n_pasos     INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pasos (
+    experimento TEXT NOT NULL REFERENCES experimentos(experimento) ON DELETE CASCADE,
+    indice      INTEGER NOT NULL,
+    dia         TEXT NOT NULL,
+    valores     TEXT NOT NULL,
+    PRIMARY KEY (experimento, indice)
+);
+"""
+
+
+def parametros_calculadora(calculadora):
+    """
+    Argumentos del constructor que reconstruyen la calculadora (sin su historial):
+    priors, método, muestreo y, si los tiene, los ajustes de MCMC. Los priors hacen
+    falta también al cargar: resumen_secuencial los resta para recuperar los
+    conteos.
+    """
+    nombres_priors = ("alpha_prior_a", "beta_prior_a", "alpha_prior_b", "beta_prior_b")
+    parametros = {nombre: np.asarray(valor).item() for nombre, valor in zip(nombres_priors, calculadora.priors)}
+    parametros.update({"metodo": calculadora.metodo, "num_samples": calculadora.num_samples,
+                       "semilla": calculadora.semilla, "generador": calculadora.generador,
+                       "esquema": calculadora.esquema})
+    for nombre in ("cadenas", "nucleos", "sampler_nuts"):
+        if hasattr(calculadora, nombre):
+            parametros[nombre] = getattr(calculadora, nombre)
+    return parametros
+
+
+class AlmacenExperimentos:
+    """
+    Estado persistente de los experimentos en SQLite.
+
+    Por cada experimento se guardan sus parámetros (priors, método, semilla...) y,
+    en una tabla de solo inserción, una fila por paso del historial compacto:
+    parámetros posteriores alpha/beta, conteos del día y resúmenes. Nunca muestras.
+
+    actualizar_dia() aplica un día nuevo leyendo solo el último paso guardado, así
+    que su coste no depende de cuántos días lleve el experimento.
+    """
+
+    def __init__(self, ruta="experimentos.sqlite"):
+        self.ruta = ruta
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA foreign_keys = ON")
+        self._conexion.executescript(ESQUEMA)
+        self._lock = threading.RLock()
+
+    def cerrar(self):
+        self._conexion.close()
+
+    def _fila_experimento(self, experimento):
+        fila = self._conexion.execute(
+            "SELECT modelo, parametros, n_pasos FROM experimentos WHERE experimento = ?", (experimento,)
+        ).fetchone()
+        if fila is None:
+            raise KeyError(experimento)
+        modelo, parametros, n_pasos = fila
+        return modelo, json.loads(parametros), n_pasos
+
+    def __contains__(self, experimento):
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT 1 FROM experimentos WHERE experimento = ?", (experimento,)
+            ).fetchone() is not None
+
+    def listar(self):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT experimento, modelo, n_pasos FROM experimentos ORDER BY experimento"
+            ).fetchall()
+        return [{"experimento": e, "modelo": m, "dias": n - 1} for e, m, n in filas]
+
+    def crear(self, experimento, modelo, **parametros):
+        """
+        Crea el experimento con su paso "A priori" y devuelve la calculadora.
+        """
+        return self.guardar(experimento, crear_calculadora(modelo, **parametros), nuevo=True)
+
+    def guardar(self, experimento, calculadora, nuevo=False):
+        """
+        Persiste una calculadora con historial compacto: crea el experimento si no
+        existe y añade los pasos que todavía no estén guardados.
+        """
+        if modelo_de(calculadora) not in MODELOS_CONTEOS:
+            raise ValueError(f"Solo se pueden guardar modelos de conteos ({', '.join(MODELOS_CONTEOS)})")
+        if not calculadora.historial_compacto:
+            raise ValueError("Solo se pueden guardar calculadoras con historial_compacto=True")
+        with self._lock, self._conexion:
+            if experimento in self:
+                if nuevo:
+                    raise ValueError(f"El experimento '{experimento}' ya existe")
+                modelo, _, n_guardados = self._fila_experimento(experimento)
+                if modelo != modelo_de(calculadora):
+                    raise ValueError(f"El experimento '{experimento}' es de otro modelo ({modelo})")
+            else:
+                self._conexion.execute(
+                    "INSERT INTO experimentos (experimento, modelo, parametros, n_pasos) VALUES (?, ?, ?, 0)",
+                    (experimento, modelo_de(calculadora), json.dumps(parametros_calculadora(calculadora))),
+                )
+                n_guardados = 0
+            self._agregar_pasos(experimento, calculadora, n_guardados)
+        return calculadora
+
+    def _agregar_pasos(self, experimento, calculadora, n_guardados):
+        """
+        Inserta los pasos de la calculadora con índice global >= n_guardados.
+        """
+        historial = calculadora.historial
+        desde = n_guardados - calculadora.pasos_previos
+        if desde < 0:
+            raise ValueError("La calculadora no contiene los pasos siguientes a los guardados")
+        if desde >= len(historial):
+            return
+        columnas = {nombre: historial.columna(nombre)[desde:] for nombre in calculadora.COLUMNAS_HISTORIAL}
+        dias = historial.dias[desde:]
+        filas = []
+        for j, dia in enumerate(dias):
+            valores = {}
+            for nombre, columna in columnas.items():
+                valor = columna[j].item()
+                if not math.isnan(valor):
+                    valores[nombre] = valor
+            filas.append((experimento, n_guardados + j, str(dia), json.dumps(valores)))
+        self._conexion.executemany(
+            "INSERT INTO pasos (experimento, indice, dia, valores) VALUES (?, ?, ?, ?)", filas
+        )
+        self._conexion.execute(
+            "UPDATE experimentos SET n_pasos = ? WHERE experimento = ?", (n_guardados + len(filas), experimento)
+        )
+
+    def _calculadora_desde_filas(self, modelo, parametros, filas, pasos_previos):
+        calculadora = crear_calculadora(modelo, **parametros)
+        valores = [json.loads(v) for _, v in filas]
+        columnas = {
+            nombre: np.array([fila.get(nombre, np.nan) for fila in valores], dtype=float)
+            for nombre in calculadora.COLUMNAS_HISTORIAL
+        }
+        calculadora.restaurar_historial([dia for dia, _ in filas], columnas, pasos_previos=pasos_previos)
+        return calculadora
+
+    def restaurar(self, experimento):
+        """
+        Calculadora lista para seguir añadiendo días, con solo el último paso en
+        memoria (lectura O(1): una fila del experimento y una de pasos).
+        """
+        with self._lock:
+            modelo, parametros, n_pasos = self._fila_experimento(experimento)
+            filas = self._conexion.execute(
+                "SELECT dia, valores FROM pasos WHERE experimento = ? AND indice = ?", (experimento, n_pasos - 1)
+            ).fetchall()
+        return self._calculadora_desde_filas(modelo, parametros, filas, pasos_previos=n_pasos - 1)
+
+    def cargar(self, experimento):
+        """
+        Calculadora con el historial completo (para la interfaz y los gráficos).
+        No recalcula nada: vuelca las filas guardadas en el historial compacto.
+        """
+        with self._lock:
+            modelo, parametros, _ = self._fila_experimento(experimento)
+            filas = self._conexion.execute(
+                "SELECT dia, valores FROM pasos WHERE experimento = ? ORDER BY indice", (experimento,)
+            ).fetchall()
+        return self._calculadora_desde_filas(modelo, parametros, filas, pasos_previos=0)
+
+    def actualizar_dia(self, experimento, conv_a, visitas_a, conv_b, visitas_b, dia=None):
+        """
+        Aplica los datos de un día al estado guardado con actualizar_con_datos y
+        persiste el paso nuevo. Devuelve la calculadora restaurada.
+        """
+        with self._lock:
+            calculadora = self.restaurar(experimento)
+            calculadora.actualizar_con_datos(conv_a, visitas_a, conv_b, visitas_b, dia=dia)
+            with self._conexion:
+                self._agregar_pasos(experimento, calculadora, calculadora.pasos_previos + 1)
+        return calculadora
+
+    def eliminar(self, experimento):
+        with self._lock, self._conexion:
+            if experimento not in self:
+                raise KeyError(experimento)
+            self._conexion.execute("DELETE FROM experimentos WHERE experimento = ?", (experimento,))
@@ -0,0 +1,171 @@
+# analisis_segmentos.py
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from calculadora_frecuentista import comparar_proporciones
+from decision import decidir_arrays
+from ingesta import COLUMNAS_CONTEOS
+from posteriores_conjugadas import (
+    perdida_esperada_beta,
+    perdida_esperada_gamma,
+    prob_beta_b_mejor,
+    prob_gamma_b_mejor,
+    resumen_uplift_beta,
+    resumen_uplift_gamma,
+    valor_restante_beta,
+    valor_restante_gamma,
+)
+
+# Segmentos que se procesan juntos en cada bloque (acota la memoria de la cuadratura)
+TAM_BLOQUE = 2_000
+
+
+def preparar_segmentos(df, claves):
+    """
+    Totales por segmento a partir de un CSV en formato largo.
+
+    Acepta dos formatos:
+    - Una fila por segmento (y día) con las columnas Conversiones A/Visitas A/
+      Conversiones B/Visitas B más las columnas clave (país, dispositivo...).
+    - Una fila por segmento, (día) y grupo con columnas Grupo, Conversiones y Visitas.
+
+    Devuelve un DataFrame con una fila por segmento: las claves, los cuatro totales
+    y el número de filas (días) agregadas.
+    """
+    claves = list(claves)
+    if {'Grupo', 'Conversiones', 'Visitas'}.issubset(df.columns):
+        otras = [c for c in df.columns if c not in claves + ['Grupo', 'Conversiones', 'Visitas']]
+        indice = claves + [c for c in otras if c == 'Día']
+        ancho = df.pivot_table(index=indice, columns='Grupo', values=['Conversiones', 'Visitas'],
+                               aggfunc='sum', fill_value=0)
+        ancho.columns = [f"{metrica} {grupo}" for metrica, grupo in ancho.columns]
+        df = ancho.reset_index()
+
+    faltantes = [c for c in COLUMNAS_CONTEOS if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas: {', '.join(faltantes)}")
+
+    agrupado = df.groupby(claves, sort=True, observed=True)
+    totales = agrupado[COLUMNAS_CONTEOS].sum()
+    totales['Días'] = agrupado.size()
+    return totales.reset_index()
+
+
+def _analizar_bloque(conv_a, visitas_a, conv_b, visitas_b, alpha_prior, beta_prior,
+                     umbral_probabilidad, umbral_mejora_minima):
+    """
+    Los tres modelos sobre un bloque de segmentos, todo vectorizado.
+    Devuelve {modelo: {columna: array}}.
+    """
+    resultados = {}
+
+    # Beta-Binomial
+    alpha_a = alpha_prior + conv_a
+    beta_a = beta_prior + visitas_a - conv_a
+    alpha_b = alpha_prior + conv_b
+    beta_b = beta_prior + visitas_b - conv_b
+    prob = prob_beta_b_mejor(alpha_a, beta_a, alpha_b, beta_b)
+    uplift = resumen_uplift_beta(alpha_a, beta_a, alpha_b, beta_b)
+    perdida = perdida_esperada_beta(alpha_a, beta_a, alpha_b, beta_b)
+    resultados['Beta–Binomial'] = {
+        'tasa_a': alpha_a / (alpha_a + beta_a),
+        'tasa_b': alpha_b / (alpha_b + beta_b),
+        'prob_b_mejor': prob,
+        'mejora_relativa': uplift['media'],
+        'ic_inf': uplift['ic_95'][:, 0],
+        'ic_sup': uplift['ic_95'][:, 1],
+        'perdida_a': perdida['A'],
+        'perdida_b': perdida['B'],
+        'valor_restante': valor_restante_beta(alpha_a, beta_a, alpha_b, beta_b, prob_b_mejor=prob),
+        'ganador': decidir_arrays(prob, uplift['media'], umbral_probabilidad, umbral_mejora_minima),
+    }
+
+    # Gamma-Poisson (clicks por visita)
+    alpha_a = alpha_prior + conv_a
+    beta_a = beta_prior + visitas_a
+    alpha_b = alpha_prior + conv_b
+    beta_b = beta_prior + visitas_b
+    prob = prob_gamma_b_mejor(alpha_a, beta_a, alpha_b, beta_b)
+    uplift = resumen_uplift_gamma(alpha_a, beta_a, alpha_b, beta_b)
+    # Igual que CalculadoraClicksBayesiana.detectar_ganador: mejora sobre las medias
+    mejora = (alpha_b / beta_b) / (alpha_a / beta_a) - 1
+    perdida = perdida_esperada_gamma(alpha_a, beta_a, alpha_b, beta_b)
+    resultados['Gamma–Poisson'] = {
+        'tasa_a': alpha_a / beta_a,
+        'tasa_b': alpha_b / beta_b,
+        'prob_b_mejor': prob,
+        'mejora_relativa': mejora,
+        'ic_inf': uplift['ic_95'][:, 0],
+        'ic_sup': uplift['ic_95'][:, 1],
+        'perdida_a': perdida['A'],
+        'perdida_b': perdida['B'],
+        'valor_restante': valor_restante_gamma(alpha_a, beta_a, alpha_b, beta_b, prob_b_mejor=prob),
+        'ganador': decidir_arrays(prob, mejora, umbral_probabilidad, umbral_mejora_minima),
+    }
+
+    # Frecuentista (test z de dos proporciones, B vs A)
+    comp = comparar_proporciones(visitas_b, conv_b, visitas_a, conv_a)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tasa_a = np.where(visitas_a > 0, conv_a / visitas_a, 0.0)
+        tasa_b = np.where(visitas_b > 0, conv_b / visitas_b, 0.0)
+    resultados['Frecuentista'] = {
+        'tasa_a': tasa_a,
+        'tasa_b': tasa_b,
+        'prob_b_mejor': comp['prob_g1_mejor'],
+        'mejora_relativa': comp['uplift_mean'],
+        'ic_inf': comp['ci_diff_inf'],
+        'ic_sup': comp['ci_diff_sup'],
+        'p_valor': comp['p_valor'],
+        'ganador': decidir_arrays(comp['prob_g1_mejor'], comp['uplift_mean'],
+                            umbral_probabilidad, umbral_mejora_minima),
+    }
+    return resultados
+
+
+def analizar_segmentos(df, claves, umbral_probabilidad=0.95, umbral_mejora_minima=0.01,
+                       alpha_prior=1, beta_prior=1, procesos=1):
+    """
+    Ejecuta Beta-Binomial, Gamma-Poisson y el test frecuentista sobre todos los
+    segmentos de un CSV en formato largo y devuelve una única tabla "tidy":
+    una fila por segmento y modelo.
+
+    Columnas: las claves, modelo, los totales, tasa_a, tasa_b, prob_b_mejor,
+    mejora_relativa, ic_inf/ic_sup (IC 95% del uplift en los bayesianos, de la
+    diferencia en el frecuentista), perdida_a/perdida_b y valor_restante
+    (bayesianos), p_valor (frecuentista) y ganador.
+
+    Los segmentos se procesan por bloques vectorizados; con procesos > 1 los
+    bloques se reparten entre varios procesos.
+    """
+    totales = preparar_segmentos(df, claves)
+    conteos = [totales[c].to_numpy(dtype=float) for c in COLUMNAS_CONTEOS]
+    n = len(totales)
+
+    bloques = [slice(inicio, min(inicio + TAM_BLOQUE, n)) for inicio in range(0, n, TAM_BLOQUE)]
+    argumentos = [
+        tuple(c[bloque] for c in conteos)
+        + (alpha_prior, beta_prior, umbral_probabilidad, umbral_mejora_minima)
+        for bloque in bloques
+    ]
+    if procesos > 1 and len(bloques) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            por_bloque = list(pool.map(_analizar_bloque, *zip(*argumentos)))
+    else:
+        por_bloque = [_analizar_bloque(*args) for args in argumentos]
+
+    tablas = []
+    for modelo in ('Beta–Binomial', 'Gamma–Poisson', 'Frecuentista'):
+        tabla = totales.copy()
+        tabla.insert(len(claves), 'modelo', modelo)
+        columnas = {}
+        for resultado in por_bloque:
+            for nombre, valores in resultado[modelo].items():
+                columnas.setdefault(nombre, []).append(valores)
+        for nombre, partes in columnas.items():
+            tabla[nombre] = np.concatenate(partes)
+        tablas.append(tabla)
+
+    return pd.concat(tablas, ignore_index=True).sort_values(claves + ['modelo'], kind='stable',
+                                                             ignore_index=True)
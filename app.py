@@ -1,14 +1,33 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 import io
-from contextlib import redirect_stdout
-
-from calculadora_bayesiana import CalculadoraClicksBayesiana
-from calculadora_bayesiana_conversiones import CalculadoraConversionesBayesiana
+import os
+import time
+
+from almacen import AlmacenExperimentos
+from analisis_segmentos import analizar_segmentos
+from calculadora_bayesiana_jerarquica import CalculadoraJerarquicaBayesiana
+from calculadora_bayesiana_multigrupo import CalculadoraClicksMultiGrupo, CalculadoraConversionesMultiGrupo
+from decision import CRITERIOS_MULTIGRUPO, decidir_ganador
+from graficos import png_evolucion, png_posteriores
+from ingesta import (
+    COLUMNAS_REQUERIDAS,
+    COLUMNAS_VALORES,
+    columnas_conteos,
+    columnas_disponibles,
+    formato_archivo,
+    grupos_disponibles,
+    leer_conteos,
+    leer_valores,
+    totales_conteos,
+)
+from modelos import crear_calculadora, modelo_de
+from planificador import planificar
+from secuencial import DisenoSecuencial
+from sesiones import AgregadorSesiones
+from trabajos import ColaAjustes
 
 
 # =========================
@@ -197,6 +216,262 @@ transform: none;
 """, unsafe_allow_html=True)
 
 
+# =========================
+# Gráficos cacheados
+# =========================
+@st.cache_data(max_entries=64, show_spinner=False)
+def graficos_dia_png(modelo, dia, alpha_a, beta_a, alpha_b, beta_b):
+    """
+    PNG de las densidades de un día. Se cachea por (modelo, día, parámetros),
+    así que volver a un día ya visto o mover un slider no recalcula nada.
+    """
+    return png_posteriores(modelo, dia, alpha_a, beta_a, alpha_b, beta_b)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def grafico_evolucion_png(dias, tasas_a, tasas_b):
+    return png_evolucion(list(dias), list(tasas_a), list(tasas_b))
+
+
+# =========================
+# Ingesta
+# =========================
+# Filas del archivo que se muestran en la vista previa
+FILAS_VISTA_PREVIA = 20
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def resumen_log_sesiones(contenido, tipo_valores, formato="csv"):
+    """
+    Agrega un log de eventos con Session ID en bloques y devuelve los conteos
+    diarios, el número de eventos y el de sesiones contaminadas. Se cachea por
+    contenido para no recorrer el log en cada rerun.
+    """
+    agregador = AgregadorSesiones().agregar_archivo(io.BytesIO(contenido), formato)
+    return agregador.resumen_diario(tipo_valores), agregador.eventos, agregador.sesiones_contaminadas
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def valores_log_sesiones(contenido, formato="csv"):
+    """
+    Como resumen_log_sesiones, pero con los estadísticos de los valores de cada
+    sesión por día (métricas continuas) en vez de conteos.
+    """
+    agregador = AgregadorSesiones().agregar_archivo(io.BytesIO(contenido), formato)
+    return agregador.estadisticos_diarios(), agregador.eventos, agregador.sesiones_contaminadas
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def valores_archivo(contenido, formato="csv"):
+    """
+    leer_valores() cacheado por contenido: el archivo con una fila por usuario se
+    resume por bloques en estadísticos por día una sola vez.
+    """
+    return leer_valores(io.BytesIO(contenido), formato)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def conteos_archivo(contenido, formato="csv"):
+    """
+    leer_conteos() cacheado por contenido: volver a subir el mismo archivo (o
+    cualquier rerun) no lo vuelve a leer.
+    """
+    return leer_conteos(io.BytesIO(contenido), formato)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def calculadora_multigrupo(contenido, formato, grupos, modelo):
+    """
+    Calculadora multigrupo (integración exacta) con todos los días del archivo,
+    cacheada por contenido, grupos y modelo.
+    """
+    df, _ = leer_conteos(io.BytesIO(contenido), formato, grupos=grupos)
+    clase = CalculadoraClicksMultiGrupo if modelo == "Clicks (Gamma–Poisson)" else CalculadoraConversionesMultiGrupo
+    calculadora = clase(grupos=grupos, metodo="exacto", semilla=SEMILLA_CALCULADORAS)
+    calculadora.actualizar_con_lote(df)
+    return calculadora
+
+
+# Experimentos simulados por el planificador (con semilla fija: el plan no cambia entre reruns)
+SIMULACIONES_PLAN = 2_000
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def plan_test(tasa_base, mejora_relativa, visitas_por_dia, modelo, umbral_probabilidad, umbral_mejora_minima):
+    return planificar(tasa_base, mejora_relativa, visitas_por_dia, modelo=modelo,
+                      umbral_probabilidad=umbral_probabilidad, umbral_mejora_minima=umbral_mejora_minima,
+                      n_simulaciones=SIMULACIONES_PLAN, semilla=0)
+
+
+# =========================
+# Resultados cacheados
+# =========================
+# Filas por página en la pestaña "Historial detallado"
+FILAS_POR_PAGINA = 50
+
+# Calculadoras procesadas que se guardan y cuánto tiempo (segundos) siguen
+# siendo válidas. La caché es común a todas las sesiones.
+CACHE_RESULTADOS_ENTRADAS = 32
+CACHE_RESULTADOS_TTL = 24 * 3600
+
+
+# Semilla de todas las calculadoras de la app: las muestras de los gráficos (y los
+# resúmenes si se muestrea) son las mismas en cada rerun, sesión y entrada de caché
+SEMILLA_CALCULADORAS = 0
+
+
+def configuracion_calculadora(calculadora):
+    """
+    Lo que determina el resultado de procesar un CSV con una calculadora vacía:
+    modelo, priors, método, número de muestras y cómo se generan (semilla,
+    generador y esquema), tipo de historial y, con MCMC, cadenas, núcleos y
+    sampler NUTS.
+    """
+    return (modelo_de(calculadora), calculadora.metodo, calculadora.num_samples,
+            calculadora.alpha_a, calculadora.beta_a, calculadora.alpha_b, calculadora.beta_b,
+            calculadora.semilla, calculadora.generador, calculadora.esquema, calculadora.historial_compacto,
+            getattr(calculadora, "cadenas", None), getattr(calculadora, "nucleos", None),
+            getattr(calculadora, "sampler_nuts", None))
+
+
+@st.cache_data(max_entries=CACHE_RESULTADOS_ENTRADAS, ttl=CACHE_RESULTADOS_TTL, show_spinner=False)
+def calculadora_procesada(configuracion, df, _calculadora, _progreso=None):
+    """
+    Procesa df con _calculadora (vacía) y la devuelve. La clave es el contenido
+    de df más la configuración: los mismos datos con el mismo modelo y priors
+    devuelven el historial ya calculado, también a otros usuarios. Los argumentos
+    con guion bajo no forman parte de la clave.
+    """
+    _calculadora.actualizar_con_lote(df, progreso=_progreso)
+    return _calculadora
+
+
+def memo_calculadora(nombre, funcion):
+    """
+    funcion(calculadora) calculada una vez por estado de la calculadora actual:
+    se guarda en session_state hasta que cambie la calculadora o su número de
+    pasos. Mover los sliders de umbrales no rehace el historial ni los gráficos.
+    """
+    calculadora = st.session_state.calculadora
+    pasos = calculadora.pasos_previos + len(calculadora.historial)
+    memo = st.session_state.setdefault("memo_calculadora", {})
+    guardado = memo.get(nombre)
+    if guardado is None or guardado[0] is not calculadora or guardado[1] != pasos:
+        guardado = memo[nombre] = (calculadora, pasos, funcion(calculadora))
+    return guardado[2]
+
+
+def series_evolucion(calculadora):
+    """
+    (días, tasas A, tasas B) de los pasos con datos, para el gráfico de evolución.
+    """
+    dias = []
+    tasas_a = []
+    tasas_b = []
+
+    for paso in calculadora.historial[1:]:
+        if "dia" not in paso:
+            continue
+        dias.append(paso["dia"])
+
+        if "uplift" in paso:
+            tasa_a = paso["alpha_a"] / paso["beta_a"]
+            tasa_b = paso["alpha_b"] / paso["beta_b"]
+        elif "posterior" in paso:
+            tasa_a = paso["posterior"]["A"]["media"]
+            tasa_b = paso["posterior"]["B"]["media"]
+        else:
+            dias.pop()
+            continue
+
+        tasas_a.append(tasa_a)
+        tasas_b.append(tasa_b)
+
+    return tuple(dias), tuple(tasas_a), tuple(tasas_b)
+
+
+# =========================
+# Almacén de experimentos
+# =========================
+RUTA_ALMACEN = "experimentos.sqlite"
+
+
+@st.cache_resource(show_spinner=False)
+def obtener_almacen():
+    return AlmacenExperimentos(RUTA_ALMACEN)
+
+
+# =========================
+# Ajustes MCMC en segundo plano
+# =========================
+# Días que se ajustan a la vez entre todas las sesiones, cadenas por día y procesos
+# por ajuste (uno por cadena mientras queden núcleos libres)
+PROCESOS_MCMC = 2
+CADENAS_MCMC = 2
+NUCLEOS_MCMC = max(1, min(CADENAS_MCMC, (os.cpu_count() or 1) // PROCESOS_MCMC))
+
+# Segundos entre consultas al estado de un ajuste en marcha
+INTERVALO_SONDEO = 2
+
+
+@st.cache_resource(show_spinner=False)
+def obtener_cola_ajustes():
+    return ColaAjustes(max_procesos=PROCESOS_MCMC)
+
+
+def descartar_trabajo_mcmc():
+    """
+    Cancela y olvida el ajuste en segundo plano de la sesión, si lo hay.
+    """
+    id_trabajo = st.session_state.get("trabajo_mcmc")
+    if id_trabajo is not None:
+        obtener_cola_ajustes().olvidar(id_trabajo)
+        st.session_state.trabajo_mcmc = None
+
+
+def render_trabajo_mcmc():
+    """
+    Progreso del ajuste MCMC en segundo plano de la sesión. Mientras sigue en
+    marcha la página vuelve a consultarlo cada INTERVALO_SONDEO segundos (al final
+    del script); al terminar, su calculadora sustituye a la de la sesión.
+    """
+    id_trabajo = st.session_state.get("trabajo_mcmc")
+    if id_trabajo is None:
+        return
+    cola = obtener_cola_ajustes()
+    try:
+        estado = cola.estado(id_trabajo)
+    except KeyError:
+        # La cola es de otro proceso del servidor (reiniciado): el trabajo se perdió
+        st.session_state.trabajo_mcmc = None
+        st.warning("El ajuste MCMC en segundo plano se ha perdido. Vuelve a procesar el CSV.")
+        return
+
+    if estado["estado"] in ("en_cola", "ejecutando"):
+        if st.button("Cancelar ajuste", key="cancelar_mcmc"):
+            cola.cancelar(id_trabajo)
+            estado = cola.estado(id_trabajo)
+        else:
+            porcentaje = estado["hechos"] / estado["total"]
+            if estado["estado"] == "en_cola":
+                texto = "En cola: esperando a que quede un proceso libre..."
+            else:
+                texto = f"Ajustando con MCMC: día {estado['hechos']} de {estado['total']}... ({int(porcentaje*100)}%)"
+            st.progress(porcentaje, text=texto)
+            st.caption("El ajuste sigue en segundo plano: puedes seguir usando la página.")
+            return
+
+    if estado["estado"] == "terminado":
+        st.session_state.calculadora = cola.resultado(id_trabajo)
+        st.session_state.datos_procesados = True
+        st.markdown('<div class="success-box">¡Datos procesados correctamente!</div>', unsafe_allow_html=True)
+    elif estado["estado"] == "cancelado":
+        st.info("Ajuste cancelado: la calculadora no ha cambiado.")
+    else:
+        st.error(f"❌ El ajuste MCMC ha fallado: {estado['error']}")
+    descartar_trabajo_mcmc()
+
+
 # =========================
 # Helpers de estado
 # =========================
@@ -204,7 +479,7 @@ def reset_wizard():
     st.session_state.wizard_step = 1
     st.session_state.enfoque = None           # "bayesiano" | "frecuentista"
     st.session_state.session_id = None        # True | False
-    st.session_state.tipo_valores = None      # "0_1" | "0_inf"
+    st.session_state.tipo_valores = None      # "0_1" | "0_inf" | "continuo"
     st.session_state.ruta_ok = False
     st.session_state.selected_model_label = None
     st.session_state.show_app = False
@@ -216,16 +491,36 @@ def init_wizard_state():
         reset_wizard()
 
 
+# Métricas continuas (tipo_valores "continuo"): etiqueta del modelo y distribuciones
+MODELO_INGRESOS = "Valores continuos (Normal–Inversa-Gamma)"
+# (la primera es la de por defecto: la normal es estable también con pocos usuarios)
+DISTRIBUCIONES_INGRESOS = {
+    "Normal (media, cualquier forma)": "normal",
+    "Lognormal con ceros (ingresos por visitante)": "cero_inflado",
+    "Lognormal (valor de los pedidos)": "lognormal",
+}
+
+
 def set_calculadora_from_selected_model():
     """
     Inicializa la calculadora correcta según el modelo seleccionado por el wizard.
     """
     modelo = st.session_state.get("selected_model_label")
     if modelo == "Conversiones 0/1 (Beta–Binomial)":
-        st.session_state.calculadora = CalculadoraConversionesBayesiana()
+        st.session_state.calculadora = crear_calculadora("beta_binomial", semilla=SEMILLA_CALCULADORAS)
+    elif modelo == MODELO_INGRESOS:
+        distribucion = DISTRIBUCIONES_INGRESOS[st.session_state.get("distribucion_ingresos",
+                                                                    next(iter(DISTRIBUCIONES_INGRESOS)))]
+        st.session_state.calculadora = crear_calculadora("ingresos", distribucion=distribucion,
+                                                         semilla=SEMILLA_CALCULADORAS)
     else:
-        st.session_state.calculadora = CalculadoraClicksBayesiana()
+        metodo = "mcmc" if st.session_state.get("usar_mcmc", False) else "conjugado"
+        st.session_state.calculadora = crear_calculadora("gamma_poisson", metodo=metodo,
+                                                         semilla=SEMILLA_CALCULADORAS,
+                                                         cadenas=CADENAS_MCMC, nucleos=NUCLEOS_MCMC)
 
+    # Un ajuste en segundo plano pendiente ya no corresponde a esta calculadora
+    descartar_trabajo_mcmc()
     st.session_state.datos_procesados = False
 
 
@@ -239,15 +534,17 @@ def check_route_and_set_model():
 
     # Solo disponible:
     # - Bayesiano
-    # - Sin Session ID
+    # - Con o sin Session ID (con Session ID se agrega el log de eventos por sesión)
     # - valores 0/1 => Beta-Binomial
-    # - valores 0-inf => Gamma-Poisson
-    if enfoque == "bayesiano" and session_id is False and tipo_valores in ("0_1", "0_inf"):
+    # - valores 0-inf (conteos) => Gamma-Poisson
+    # - valores continuos (ingresos, valor del pedido) => Normal-Inversa-Gamma
+    if enfoque == "bayesiano" and session_id in (True, False) and tipo_valores in ("0_1", "0_inf", "continuo"):
         st.session_state.ruta_ok = True
-        st.session_state.selected_model_label = (
-            "Conversiones 0/1 (Beta–Binomial)" if tipo_valores == "0_1"
-            else "Clicks (Gamma–Poisson)"
-        )
+        st.session_state.selected_model_label = {
+            "0_1": "Conversiones 0/1 (Beta–Binomial)",
+            "0_inf": "Clicks (Gamma–Poisson)",
+            "continuo": MODELO_INGRESOS,
+        }[tipo_valores]
     else:
         st.session_state.ruta_ok = False
         st.session_state.selected_model_label = None
@@ -474,13 +771,14 @@ def render_wizard():
                 <ul>
                     <li><b>Valores entre 0 y 1</b>: de esta manera se analizará mediante la distribución previa Beta, ideal para conversiones (siendo 0 la no conversión y 1 si el usuario ha convertido en la sesión).</li>
                     <li><b>Valores de 0 a infinito</b>: con esta opción se analizará mediante la distrubución previa Gamma-Poisson, es adecuada para conteos de métricas.</li>
+                    <li><b>Valores continuos</b>: importes por usuario (ingresos por visitante, valor del pedido...), analizados con una posterior Normal-Inversa-Gamma sobre los valores o sus logaritmos.</li>
                 </ul>
             </div>
         </div>
         """, unsafe_allow_html=True)
 
         if step == 3:
-            c1, c2 = st.columns(2, gap="large")
+            c1, c2, c3 = st.columns(3, gap="large")
             with c1:
                 if st.button("Valores entre 0 y 1", key="btn_01", type="primary"):
                     st.session_state.tipo_valores = "0_1"
@@ -489,11 +787,19 @@ def render_wizard():
                 if st.button("Valores de 0 a infinito", key="btn_0inf", type="primary"):
                     st.session_state.tipo_valores = "0_inf"
                     go_to_step(4)
+            with c3:
+                if st.button("Valores continuos (ingresos)", key="btn_continuo", type="primary"):
+                    st.session_state.tipo_valores = "continuo"
+                    go_to_step(4)
 
             if st.button("⬅️ Volver", key="back_3"):
                 go_to_step(2)
         else:
-            tipo_txt = "Valores entre 0 y 1" if st.session_state.tipo_valores == "0_1" else "Valores de 0 a infinito"
+            tipo_txt = {
+                "0_1": "Valores entre 0 y 1",
+                "0_inf": "Valores de 0 a infinito",
+                "continuo": "Valores continuos (ingresos)",
+            }.get(st.session_state.tipo_valores, "—")
             st.markdown(f"""
             <div class="success-box">
                 ✅ Seleccionado: <b>{tipo_txt}</b>
@@ -520,11 +826,12 @@ def render_wizard():
         check_route_and_set_model()
 
         if st.session_state.ruta_ok:
-            extra = (
-                "De esta manera, el CSV de tu test A/B deberá contener eventos y sesiones agregados."
-                if st.session_state.session_id is False else
-                "De esta manera, el CSV deberá contener una columna con los Session ID."
-            )
+            if st.session_state.session_id:
+                extra = "De esta manera, el CSV deberá contener el log de eventos con una columna con los Session ID."
+            elif st.session_state.tipo_valores == "continuo":
+                extra = "De esta manera, el CSV de tu test A/B deberá contener una fila por usuario con su valor."
+            else:
+                extra = "De esta manera, el CSV de tu test A/B deberá contener eventos y sesiones agregados."
             st.markdown(f"""
             <div class="result-card">
                 <div class="choice-title">¡Perfecto!</div>
@@ -548,7 +855,7 @@ def render_wizard():
             <div class="warning-box">
                 <b>Todavía no disponible</b><br><br>
                 Con las opciones seleccionadas todavía no tenemos la implementación visual activa.
-                Puedes volver a un paso anterior y elegir una ruta disponible (Bayesiano + sin Session ID + 0/1 o 0–∞).
+                Puedes volver a un paso anterior y elegir una ruta disponible (Bayesiano + 0/1, 0–∞ o continuos).
             </div>
             """, unsafe_allow_html=True)
 
@@ -569,6 +876,296 @@ def render_wizard():
 # =========================
 # App actual (tu calculadora)
 # =========================
+# Criterios de decisión de detectar_ganador: etiqueta -> criterio
+CRITERIOS_DECISION = {
+    "Probabilidad y mejora mínima": "probabilidad",
+    "Pérdida esperada": "perdida_esperada",
+    "Valor potencial restante": "valor_restante",
+}
+
+# Reglas de parada del test secuencial: etiqueta -> (regla, función de gasto)
+REGLAS_SECUENCIALES = {
+    "mSPRT (p-valor siempre válido)": ("msprt", None),
+    "Gasto de alfa (O'Brien-Fleming)": ("gasto_alfa", "obrien_fleming"),
+    "Gasto de alfa (Pocock)": ("gasto_alfa", "pocock"),
+    "Pérdida esperada (bayesiana)": ("perdida_esperada", None),
+}
+
+
+def render_test_secuencial(calculadora, dias_con_datos):
+    """
+    Decisión con una regla de parada secuencial, válida aunque se mire el
+    resultado cada día (al contrario que el umbral fijo de detectar_ganador).
+    """
+    with st.expander("🔁 Test secuencial"):
+        st.caption(
+            "Mirar el resultado cada día con el mismo umbral infla los falsos positivos. "
+            "Estas reglas tratan cada día como una mirada y ajustan la frontera de parada."
+        )
+        etiqueta = st.selectbox("Regla de parada", list(REGLAS_SECUENCIALES), key="regla_secuencial")
+        regla, gasto = REGLAS_SECUENCIALES[etiqueta]
+
+        col1, col2 = st.columns(2)
+        parametros = {"regla": regla}
+        if regla == "perdida_esperada":
+            with col1:
+                parametros["umbral_perdida"] = st.number_input(
+                    "Pérdida máxima aceptable", min_value=0.0, value=0.001, step=0.0005, format="%.4f",
+                    key="umbral_perdida_secuencial",
+                    help="Se para cuando elegir el grupo que va delante cuesta, en promedio, menos que esto."
+                )
+        else:
+            with col1:
+                parametros["alpha"] = st.number_input(
+                    "Alfa", min_value=0.001, max_value=0.2, value=0.05, step=0.01, key="alpha_secuencial"
+                )
+            with col2:
+                if regla == "msprt":
+                    parametros["tau"] = st.number_input(
+                        "Efecto esperado (tau)", min_value=0.0001, value=0.01, step=0.005, format="%.4f",
+                        key="tau_secuencial",
+                        help="Escala de la diferencia absoluta de tasas que se espera detectar."
+                    )
+                else:
+                    parametros["gasto"] = gasto
+                    parametros["n_miradas"] = st.number_input(
+                        "Días planificados", min_value=1, value=max(30, dias_con_datos), step=1,
+                        key="miradas_secuencial"
+                    )
+
+        resultado = calculadora.evaluar_secuencial(DisenoSecuencial(**parametros))
+        if resultado["parar"]:
+            ganador = resultado["ganador"]
+            st.success(f"🛑 Se puede parar: la frontera se cruzó en el día {resultado['mirada_parada']} "
+                       f"a favor del Grupo {ganador}.")
+        elif len(resultado["estadistico"]):
+            st.info(f"⏳ Continuar: ninguna mirada ha cruzado la frontera (va delante el Grupo {resultado['lider']}).")
+        else:
+            st.info("No hay datos suficientes.")
+
+        if len(resultado["estadistico"]) > 1:
+            nombre = {"msprt": "p-valor siempre válido", "gasto_alfa": "|z|",
+                      "perdida_esperada": "pérdida esperada"}[regla]
+            st.line_chart(pd.DataFrame({nombre: resultado["estadistico"], "frontera": resultado["frontera"]}))
+
+
+def render_multigrupo(calculadora):
+    """
+    Comparación conjunta de todos los grupos del archivo (A/B/C/...): probabilidad
+    de que cada uno sea el mejor, pérdidas esperadas y comparaciones por parejas.
+    """
+    with st.expander(f"🔀 Comparación de los {len(calculadora.grupos)} grupos ({', '.join(calculadora.grupos)})"):
+        st.caption(
+            "El archivo tiene más de dos grupos. Aquí se comparan todos a la vez; "
+            f"el grupo {calculadora.grupos[0]} hace de control."
+        )
+        criterio = CRITERIOS_DECISION[st.session_state.get("criterio_decision", next(iter(CRITERIOS_DECISION)))]
+        if criterio not in CRITERIOS_MULTIGRUPO:
+            st.caption("El valor restante solo está disponible con dos grupos; se decide por probabilidad.")
+            criterio = "probabilidad"
+        resultado = calculadora.detectar_ganador(
+            umbral_probabilidad=st.session_state.get("umbral_prob", 0.95),
+            umbral_mejora_minima=st.session_state.get("umbral_mejora", 0.01),
+            criterio=criterio,
+            umbral_perdida=st.session_state.get("umbral_perdida", 0.001),
+        )
+        if resultado["ganador"] is not None:
+            st.success(f"🏆 El ganador es: Grupo {resultado['ganador']}")
+        else:
+            st.info(f"⚖️ No hay ganador claro todavía (va delante el Grupo {resultado.get('lider', '—')})")
+        st.write(f"**Razón:** {resultado['razon']}")
+
+        st.dataframe(calculadora.grupos_dataframe(), use_container_width=True, hide_index=True)
+        st.write("**Probabilidad de que el grupo de la fila supere al de la columna**")
+        st.dataframe(calculadora.matriz(), use_container_width=True)
+
+        evolucion = calculadora.historial_dataframe()
+        if len(evolucion) > 1:
+            st.write("**Probabilidad de ser el mejor por día**")
+            columnas = {f"Prob. mejor {grupo}": grupo for grupo in calculadora.grupos}
+            st.line_chart(evolucion[list(columnas)].rename(columns=columnas))
+
+
+def render_planificador(modelo):
+    """
+    Tamaño de muestra y duración antes de lanzar el test: fórmula cerrada
+    frecuentista y simulación de la regla de detectar_ganador mirando cada día.
+    """
+    st.markdown('<p class="sub-header">Planificar el test</p>', unsafe_allow_html=True)
+    clicks = modelo == "Clicks (Gamma–Poisson)"
+    st.caption(
+        "Estima cuántas visitas y días necesita el test para detectar la mejora mínima que te interesa. "
+        "La parte bayesiana simula miles de experimentos con los umbrales de la barra lateral."
+    )
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if clicks:
+            tasa_base = st.number_input("Clicks por visita actuales (A)", min_value=0.001, value=0.5,
+                                        step=0.05, format="%.3f", key="plan_tasa_base")
+        else:
+            tasa_base = st.number_input("Tasa de conversión actual (A, %)", min_value=0.01, max_value=99.0,
+                                        value=10.0, step=0.5, key="plan_tasa_base") / 100
+    with col2:
+        mejora = st.number_input("Mejora mínima a detectar (relativa, %)", min_value=0.5, value=10.0,
+                                 step=0.5, key="plan_mejora") / 100
+    with col3:
+        visitas_por_dia = st.number_input("Visitas diarias (total, 50% por grupo)", min_value=2, value=2_000,
+                                          step=100, key="plan_visitas")
+    if not clicks and tasa_base * (1 + mejora) >= 1:
+        st.error("❌ La tasa con la mejora supera el 100%.")
+        return
+    # Tras el primer cálculo, cambiar los valores recalcula el plan (cacheado) directamente
+    if st.button("Calcular plan", key="btn_plan", type="primary"):
+        st.session_state.plan_activo = True
+    if not st.session_state.get("plan_activo"):
+        return
+
+    with st.spinner("Simulando experimentos..."):
+        plan = plan_test(tasa_base, mejora, int(visitas_por_dia), "gamma_poisson" if clicks else "beta_binomial",
+                         st.session_state.get("umbral_prob", 0.95), st.session_state.get("umbral_mejora", 0.01))
+    frecuentista, bayesiano = plan["frecuentista"], plan["bayesiano"]
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Visitas por grupo (frecuentista, 80% potencia)", f"{frecuentista['visitas_por_grupo']:,}")
+    col2.metric("Duración frecuentista", f"{frecuentista['dias']} días")
+    col3.metric("Días hasta decidir (bayesiano, mediana)",
+                "—" if bayesiano["dias_mediana"] is None else f"{bayesiano['dias_mediana']:.0f}")
+    col1, col2, col3 = st.columns(3)
+    col1.metric(f"Prob. de declarar B en {bayesiano['max_dias']} días", f"{bayesiano['potencia']:.1%}")
+    col2.metric("Falsos positivos (sin efecto real)", f"{bayesiano['falsos_positivos']:.1%}",
+                help="Experimentos sin diferencia real en los que la regla declara un ganador al mirar cada día")
+    col3.metric("Prob. de elegir A por error", f"{bayesiano['prob_error_signo']:.1%}")
+
+    curva = plan["curva"].set_index("dia")
+    st.line_chart(curva[["potencia_frecuentista", "potencia_bayesiana", "falsos_positivos_bayesianos"]].rename(columns={
+        "potencia_frecuentista": "Potencia frecuentista",
+        "potencia_bayesiana": "Prob. de haber declarado B",
+        "falsos_positivos_bayesianos": "Falsos positivos",
+    }))
+    if bayesiano["falsos_positivos"] > 0.05:
+        st.caption("Mirar cada día con un umbral fijo infla los falsos positivos: considera el test secuencial.")
+
+
+def render_csv_valores(uploaded_file):
+    """
+    Carga para métricas continuas: un archivo con una fila por usuario (Día,
+    Grupo, Valor) o, con Session ID, el log de eventos. Se resume por bloques en
+    estadísticos suficientes por día, así que su tamaño no limita la memoria.
+    """
+    try:
+        formato = formato_archivo(uploaded_file.name)
+        if st.session_state.get("session_id"):
+            with st.spinner("Agregando el log de eventos por sesión..."):
+                df, eventos, sesiones_contaminadas = valores_log_sesiones(uploaded_file.getvalue(), formato)
+            st.caption(f"{eventos:,} eventos agregados en {int(df['Usuarios A'].sum() + df['Usuarios B'].sum()):,} sesiones.")
+            if sesiones_contaminadas:
+                st.warning(f"⚠️ {sesiones_contaminadas:,} sesiones aparecen en más de un grupo y se han excluido.")
+        else:
+            columnas_faltantes = [col for col in COLUMNAS_VALORES
+                                  if col not in columnas_disponibles(uploaded_file, formato)]
+            if columnas_faltantes:
+                st.error(f"❌ Faltan columnas: {', '.join(columnas_faltantes)}")
+                st.info("Revisa requisitos en **'Formato CSV'**.")
+                return
+            with st.spinner("Resumiendo los valores por día..."):
+                df = valores_archivo(uploaded_file.getvalue(), formato)
+
+        st.success("✅ ¡Archivo cargado correctamente!")
+        st.subheader("Resumen diario de tus datos:")
+        st.dataframe(df.head(FILAS_VISTA_PREVIA), use_container_width=True)
+        if len(df) > FILAS_VISTA_PREVIA:
+            st.caption(f"Mostrando los primeros {FILAS_VISTA_PREVIA} de {len(df):,} días.")
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Días de datos", len(df))
+        for col, grupo in ((col2, "A"), (col3, "B")):
+            usuarios = df[f'Usuarios {grupo}'].sum()
+            col.metric(f"Valor medio por usuario {grupo}",
+                       f"{df[f'Suma {grupo}'].sum() / usuarios:.4f}" if usuarios > 0 else "—")
+
+        if st.button("🚀 Procesar datos del CSV", type="primary"):
+            with st.spinner("Por favor ten paciencia mientras se cargan los datos..."):
+                progress_bar = st.progress(0, text="Procesando datos del test A/B...")
+
+                def actualizar_progreso(hechos, total):
+                    progress_bar.progress(hechos / total, text=f"Procesando día {hechos} de {total}...")
+
+                st.session_state.calculadora.actualizar_con_lote(df, progreso=actualizar_progreso)
+                st.session_state.datos_procesados = True
+                st.markdown('<div class="success-box">¡Datos procesados correctamente!</div>', unsafe_allow_html=True)
+
+    except Exception as e:
+        st.error(f"❌ Error al procesar el archivo: {e}")
+
+
+def _leer_valores_texto(texto):
+    # Un valor por línea o separados por espacios; se admite coma decimal
+    return np.array([valor.replace(",", ".") for valor in texto.split()], dtype=float)
+
+
+def render_entrada_valores():
+    """
+    Entrada manual para métricas continuas: los valores de cada usuario del día.
+    """
+    with st.form("entrada_manual_valores"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Grupo A")
+            texto_a = st.text_area("Valores A (uno por usuario, 0 si no aportó nada)", value="0 0 12.5 0 30")
+        with col2:
+            st.subheader("Grupo B")
+            texto_b = st.text_area("Valores B (uno por usuario, 0 si no aportó nada)", value="0 18 0 0 25")
+
+        dia = st.text_input("Etiqueta del día (opcional)", value="Día 1")
+        submitted = st.form_submit_button("Añadir datos")
+
+        if submitted:
+            try:
+                valores_a, valores_b = _leer_valores_texto(texto_a), _leer_valores_texto(texto_b)
+                if (valores_a < 0).any() or (valores_b < 0).any():
+                    raise ValueError("los valores no pueden ser negativos")
+            except ValueError as e:
+                st.error(f"❌ Valores no válidos: {e}")
+            else:
+                st.session_state.calculadora.actualizar_con_datos(valores_a, valores_b, dia=dia)
+                st.session_state.datos_procesados = True
+                st.markdown(f'<div class="success-box">Datos del {dia} añadidos correctamente</div>', unsafe_allow_html=True)
+
+
+def render_formato_valores():
+    st.markdown("""
+    ### 📋 Formato requerido
+    Con valores continuos el archivo tiene **una fila por usuario** (o visitante) con estas
+    3 columnas (también se admite Parquet). Se lee por bloques y solo se guardan sumas por
+    día y grupo, así que puede tener millones de filas:
+    """)
+    st.dataframe(pd.DataFrame({
+        'Columna': COLUMNAS_VALORES,
+        'Descripción': [
+            'Identificador del período (número o texto)',
+            'Grupo del usuario: A o B',
+            'Valor del usuario ese día (ingresos, importe del pedido...); 0 si no aportó nada',
+        ],
+        'Ejemplo': ['1, 2, 3... o "Lunes", "Martes"...', 'A, B', '0, 0, 24.90, 0, 112.35...'],
+    }), use_container_width=True, hide_index=True)
+
+    st.markdown("### 📄 Ejemplo de archivo CSV válido:")
+    st.code("""Día,Grupo,Valor
+1,A,0
+1,A,24.90
+1,B,0
+1,B,112.35
+2,A,0""", language="csv")
+
+    if st.session_state.get("session_id"):
+        st.markdown("""
+        ### 🧾 Log de eventos con Session ID
+        Con Session ID el archivo es el log de eventos (**session_id**, **group**, **timestamp**,
+        **value**). Cada sesión cuenta como un usuario el día de su primer evento y su valor es
+        la suma de los de sus eventos. Las sesiones que aparecen en más de un grupo se excluyen.
+        """)
+
+
 def render_calculadora_actual():
     st.markdown('<h2 class="main-header">Calculadora Bayesiana para Tests A/B</h2>', unsafe_allow_html=True)
     st.markdown("""
@@ -612,77 +1209,238 @@ def render_calculadora_actual():
             key="umbral_mejora"
         )
 
+        criterio = CRITERIOS_DECISION[st.selectbox(
+            "Criterio de decisión",
+            list(CRITERIOS_DECISION),
+            key="criterio_decision"
+        )]
+        if criterio == "perdida_esperada":
+            st.number_input(
+                "Umbral de pérdida esperada",
+                min_value=0.0,
+                max_value=None if modelo == MODELO_INGRESOS else 0.1,
+                value=0.001,
+                step=0.0005,
+                format="%.4f",
+                key="umbral_perdida",
+                help="Se elige el grupo con menor pérdida esperada cuando baja de este umbral "
+                     "(en unidades de la métrica: tasa, clicks por visita o importe por usuario)"
+            )
+        elif criterio == "valor_restante":
+            st.slider(
+                "Umbral de valor restante",
+                min_value=0.0,
+                max_value=0.10,
+                value=0.01,
+                step=0.005,
+                format="%.3f",
+                key="umbral_valor_restante",
+                help="Se elige el grupo que va delante cuando el valor potencial restante (relativo, percentil 95) baja de este umbral"
+            )
+
+        if modelo == MODELO_INGRESOS:
+            st.selectbox(
+                "Distribución de los valores",
+                list(DISTRIBUCIONES_INGRESOS),
+                key="distribucion_ingresos",
+                on_change=set_calculadora_from_selected_model,
+                help="Las lognormales modelan mejor importes sesgados pero necesitan bastantes valores positivos "
+                     "(cientos); con pocos, la media posterior es muy inestable. Cambiarla reinicia la calculadora."
+            )
+
+        if modelo == "Clicks (Gamma–Poisson)":
+            st.checkbox(
+                "Usar MCMC (PyMC) en lugar de la posterior conjugada",
+                key="usar_mcmc",
+                on_change=set_calculadora_from_selected_model,
+                help="El cálculo conjugado es exacto e instantáneo. MCMC reinicia la calculadora y es mucho más lento."
+            )
+
         if st.button("Reiniciar calculadora"):
             set_calculadora_from_selected_model()
             st.success("Calculadora reiniciada correctamente")
             st.rerun()
 
+        st.markdown('<p class="sub-header">Experimentos guardados</p>', unsafe_allow_html=True)
+        experimento_id = st.text_input(
+            "ID del experimento",
+            key="experimento_id",
+            help="Guarda el estado para añadir solo los días nuevos la próxima vez, sin volver a subir todo el CSV."
+        )
+        col_guardar, col_cargar = st.columns(2)
+        with col_guardar:
+            if st.button("💾 Guardar", disabled=not experimento_id):
+                try:
+                    obtener_almacen().guardar(experimento_id, st.session_state.calculadora)
+                    st.success(f"Experimento '{experimento_id}' guardado")
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+        with col_cargar:
+            if st.button("📂 Cargar", disabled=not experimento_id):
+                try:
+                    calculadora = obtener_almacen().cargar(experimento_id)
+                except KeyError:
+                    st.error(f"❌ No existe el experimento '{experimento_id}'")
+                else:
+                    if modelo_de(calculadora) != modelo_de(st.session_state.calculadora):
+                        st.error("❌ El experimento guardado es de otro modelo")
+                    else:
+                        st.session_state.calculadora = calculadora
+                        st.session_state.datos_procesados = len(calculadora.historial) > 1
+                        st.rerun()
+
     # Tabs
     st.markdown('<div class="subsection-spacer"></div>', unsafe_allow_html=True)
-    tab1, tab2, tab3 = st.tabs(["📊 Cargar CSV", "✏️ Entrada manual", "📋 Formato CSV"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📊 Cargar CSV", "✏️ Entrada manual", "📋 Formato CSV", "🧮 Planificar test"])
 
     # TAB 1 CSV
     with tab1:
         st.markdown('<p class="sub-header">Cargar datos desde CSV</p>', unsafe_allow_html=True)
         st.info("💡 Si no sabes cómo preparar tu archivo CSV, revisa la pestaña **'Formato CSV'**.")
 
-        uploaded_file = st.file_uploader("Selecciona tu archivo CSV", type=["csv"])
+        uploaded_file = st.file_uploader("Selecciona tu archivo CSV o Parquet", type=["csv", "parquet"])
 
-        if uploaded_file is not None:
+        # Ajuste MCMC del CSV en segundo plano (si hay uno en marcha)
+        render_trabajo_mcmc()
+
+        if uploaded_file is not None and modelo == MODELO_INGRESOS:
+            render_csv_valores(uploaded_file)
+        elif uploaded_file is not None:
             try:
-                df = pd.read_csv(uploaded_file)
+                formato = formato_archivo(uploaded_file.name)
+                if st.session_state.get("session_id"):
+                    with st.spinner("Agregando el log de eventos por sesión..."):
+                        df, eventos, sesiones_contaminadas = resumen_log_sesiones(
+                            uploaded_file.getvalue(), st.session_state.get("tipo_valores"), formato
+                        )
+                    st.caption(
+                        f"{eventos:,} eventos agregados en {int(df['Visitas A'].sum() + df['Visitas B'].sum()):,} sesiones."
+                    )
+                    if sesiones_contaminadas:
+                        st.warning(
+                            f"⚠️ {sesiones_contaminadas:,} sesiones aparecen en más de un grupo y se han excluido."
+                        )
+                    columnas = list(df.columns)
+                    totales = totales_conteos(df)
+                else:
+                    # Solo la cabecera: los datos se leen después por bloques
+                    df = None
+                    columnas = columnas_disponibles(uploaded_file, formato)
 
-                columnas_requeridas = ['Día', 'Conversiones A', 'Visitas A', 'Conversiones B', 'Visitas B']
-                columnas_faltantes = [col for col in columnas_requeridas if col not in df.columns]
+                columnas_faltantes = [col for col in COLUMNAS_REQUERIDAS if col not in columnas]
 
                 if columnas_faltantes:
                     st.error(f"❌ Faltan columnas: {', '.join(columnas_faltantes)}")
                     st.info("Revisa requisitos en **'Formato CSV'**.")
                 else:
+                    if df is None:
+                        # Cinco columnas con enteros compactos y totales en la misma pasada
+                        df, totales = conteos_archivo(uploaded_file.getvalue(), formato)
+                    grupos = grupos_disponibles(columnas)
+
                     st.success("✅ ¡Archivo cargado correctamente!")
 
                     st.subheader("Vista previa de tus datos:")
-                    st.dataframe(df, use_container_width=True)
+                    st.dataframe(df.head(FILAS_VISTA_PREVIA), use_container_width=True)
+                    if len(df) > FILAS_VISTA_PREVIA:
+                        st.caption(f"Mostrando las primeras {FILAS_VISTA_PREVIA} de {len(df):,} filas.")
 
                     col1, col2, col3 = st.columns(3)
                     with col1:
                         st.metric("Días de datos", len(df))
                     with col2:
-                        total_visitas_a = df['Visitas A'].sum()
-                        total_conv_a = df['Conversiones A'].sum()
+                        total_visitas_a = totales['Visitas A']
+                        total_conv_a = totales['Conversiones A']
                         tasa_prom_a = total_conv_a / total_visitas_a if total_visitas_a > 0 else 0
                         st.metric("Tasa promedio A", f"{tasa_prom_a:.2%}")
                     with col3:
-                        total_visitas_b = df['Visitas B'].sum()
-                        total_conv_b = df['Conversiones B'].sum()
+                        total_visitas_b = totales['Visitas B']
+                        total_conv_b = totales['Conversiones B']
                         tasa_prom_b = total_conv_b / total_visitas_b if total_visitas_b > 0 else 0
                         st.metric("Tasa promedio B", f"{tasa_prom_b:.2%}")
 
-                    if st.button("🚀 Procesar datos del CSV", type="primary"):
+                    trabajo_en_marcha = st.session_state.get("trabajo_mcmc") is not None
+                    if st.button("🚀 Procesar datos del CSV", type="primary", disabled=trabajo_en_marcha):
                         calculadora = st.session_state.calculadora
 
-                        with st.spinner("Por favor ten paciencia mientras se cargan los datos..."):
-                            progress_bar = st.progress(0, text="Procesando datos del test A/B...")
-                            total_rows = len(df)
-
-                            for i, row in df.iterrows():
-                                dia = f"Día {int(row['Día'])}"
-                                clicks_a = int(row['Conversiones A'])
-                                visitas_a = int(row['Visitas A'])
-                                clicks_b = int(row['Conversiones B'])
-                                visitas_b = int(row['Visitas B'])
-
-                                calculadora.actualizar_con_datos(clicks_a, visitas_a, clicks_b, visitas_b, dia=dia)
-
-                                current_progress = (i + 1) / total_rows
-                                progress_bar.progress(
-                                    current_progress,
-                                    text=f"Procesando día {i+1} de {total_rows}... ({int(current_progress*100)}%)"
+                        if calculadora.metodo == "mcmc":
+                            # Un ajuste NUTS por día: en segundo plano, sin bloquear la página
+                            st.session_state.trabajo_mcmc = obtener_cola_ajustes().enviar(calculadora, df)
+                        else:
+                            with st.spinner("Por favor ten paciencia mientras se cargan los datos..."):
+                                progress_bar = st.progress(0, text="Procesando datos del test A/B...")
+
+                                def actualizar_progreso(hechos, total):
+                                    porcentaje = hechos / total
+                                    progress_bar.progress(
+                                        porcentaje,
+                                        text=f"Procesando día {hechos} de {total}... ({int(porcentaje*100)}%)"
+                                    )
+
+                                if len(calculadora.historial) == 1:
+                                    # Calculadora vacía: el resultado solo depende de los datos y la configuración
+                                    st.session_state.calculadora = calculadora_procesada(
+                                        configuracion_calculadora(calculadora), df, calculadora,
+                                        _progreso=actualizar_progreso,
+                                    )
+                                else:
+                                    calculadora.actualizar_con_lote(df, progreso=actualizar_progreso)
+
+                                st.session_state.datos_procesados = True
+                                st.markdown('<div class="success-box">¡Datos procesados correctamente!</div>', unsafe_allow_html=True)
+
+                    # Más pares "Conversiones X" / "Visitas X" => test con más de dos grupos
+                    if len(grupos) > 2:
+                        with st.spinner("Comparando todos los grupos..."):
+                            render_multigrupo(calculadora_multigrupo(
+                                uploaded_file.getvalue(), formato, grupos, st.session_state.get("selected_model_label")
+                            ))
+
+                    # Columnas extra (país, dispositivo...) => el CSV tiene varios segmentos
+                    columnas_conteo = COLUMNAS_REQUERIDAS + columnas_conteos(grupos)
+                    columnas_segmento = [col for col in columnas if col not in columnas_conteo]
+                    if columnas_segmento:
+                        with st.expander("🧩 Análisis por segmentos"):
+                            st.caption(
+                                "Analiza cada segmento por separado con los tres modelos "
+                                "(Beta–Binomial, Gamma–Poisson y frecuentista) en una única tabla."
+                            )
+                            claves = st.multiselect(
+                                "Columnas que definen el segmento",
+                                columnas_segmento,
+                                default=columnas_segmento,
+                            )
+                            jerarquico = st.checkbox(
+                                "Añadir el modelo jerárquico (PyMC, ADVI)",
+                                help="Estima a la vez todos los segmentos con una distribución común: "
+                                     "los que tienen pocos datos se acercan a la media del resto.",
+                            )
+                            if claves and st.button("Analizar segmentos"):
+                                with st.spinner("Analizando segmentos..."):
+                                    df_segmentos, _ = leer_conteos(uploaded_file, formato, columnas_extra=claves)
+                                    tabla = analizar_segmentos(df_segmentos, claves)
+                                if jerarquico:
+                                    with st.spinner("Ajustando el modelo jerárquico..."):
+                                        # Misma familia que el modelo elegido (Beta–Binomial si no hay ninguno)
+                                        familia = "beta_binomial"
+                                        if "calculadora" in st.session_state:
+                                            familia = modelo_de(st.session_state.calculadora)
+                                        calculadora_jerarquica = CalculadoraJerarquicaBayesiana(
+                                            claves, familia=familia, semilla=SEMILLA_CALCULADORAS
+                                        )
+                                        calculadora_jerarquica.actualizar_con_lote(df_segmentos)
+                                        tabla = pd.concat(
+                                            [tabla, calculadora_jerarquica.segmentos_dataframe()], ignore_index=True
+                                        ).sort_values(claves + ['modelo'], kind='stable', ignore_index=True)
+                                    st.info(f"Medias poblacionales: {calculadora_jerarquica.detectar_ganador()['razon']}")
+                                st.dataframe(tabla, use_container_width=True)
+                                st.download_button(
+                                    "⬇️ Descargar resultados (CSV)",
+                                    tabla.to_csv(index=False).encode("utf-8"),
+                                    file_name="analisis_segmentos.csv",
+                                    mime="text/csv",
                                 )
 
-                            st.session_state.datos_procesados = True
-                            st.markdown('<div class="success-box">¡Datos procesados correctamente!</div>', unsafe_allow_html=True)
-
             except Exception as e:
                 st.error(f"❌ Error al procesar el archivo: {e}")
 
@@ -690,70 +1448,110 @@ def render_calculadora_actual():
     with tab2:
         st.markdown('<p class="sub-header">Entrada manual de datos</p>', unsafe_allow_html=True)
 
-        with st.form("entrada_manual"):
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.subheader("Grupo A")
-                clicks_a = st.number_input("Conversiones A", min_value=0, value=0)
-                visitas_a = st.number_input("Visitas A", min_value=1, value=100)
-                tasa_a = clicks_a / visitas_a if visitas_a > 0 else 0
-                st.metric("Tasa de conversión A", f"{tasa_a:.2%}")
-
-            with col2:
-                st.subheader("Grupo B")
-                clicks_b = st.number_input("Conversiones B", min_value=0, value=0)
-                visitas_b = st.number_input("Visitas B", min_value=1, value=100)
-                tasa_b = clicks_b / visitas_b if visitas_b > 0 else 0
-                st.metric("Tasa de conversión B", f"{tasa_b:.2%}")
-
-            dia = st.text_input("Etiqueta del día (opcional)", value="Día 1")
-            submitted = st.form_submit_button("Añadir datos")
-
-            if submitted:
-                with st.spinner("Por favor ten paciencia mientras se procesan los datos..."):
-                    calculadora = st.session_state.calculadora
-                    calculadora.actualizar_con_datos(clicks_a, visitas_a, clicks_b, visitas_b, dia=dia)
-                    st.session_state.datos_procesados = True
-                    st.markdown(f'<div class="success-box">Datos del {dia} añadidos correctamente</div>', unsafe_allow_html=True)
+        if modelo == MODELO_INGRESOS:
+            render_entrada_valores()
+        else:
+            with st.form("entrada_manual"):
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    st.subheader("Grupo A")
+                    clicks_a = st.number_input("Conversiones A", min_value=0, value=0)
+                    visitas_a = st.number_input("Visitas A", min_value=1, value=100)
+                    tasa_a = clicks_a / visitas_a if visitas_a > 0 else 0
+                    st.metric("Tasa de conversión A", f"{tasa_a:.2%}")
+
+                with col2:
+                    st.subheader("Grupo B")
+                    clicks_b = st.number_input("Conversiones B", min_value=0, value=0)
+                    visitas_b = st.number_input("Visitas B", min_value=1, value=100)
+                    tasa_b = clicks_b / visitas_b if visitas_b > 0 else 0
+                    st.metric("Tasa de conversión B", f"{tasa_b:.2%}")
+
+                dia = st.text_input("Etiqueta del día (opcional)", value="Día 1")
+                submitted = st.form_submit_button("Añadir datos")
+
+                if submitted:
+                    with st.spinner("Por favor ten paciencia mientras se procesan los datos..."):
+                        calculadora = st.session_state.calculadora
+                        calculadora.actualizar_con_datos(clicks_a, visitas_a, clicks_b, visitas_b, dia=dia)
+                        st.session_state.datos_procesados = True
+                        st.markdown(f'<div class="success-box">Datos del {dia} añadidos correctamente</div>', unsafe_allow_html=True)
 
     # TAB 3 Formato CSV
     with tab3:
         st.markdown('<p class="sub-header">Cómo preparar tu archivo CSV</p>', unsafe_allow_html=True)
 
-        st.markdown("""
-        ### 📋 Formato requerido
-        Tu archivo CSV debe contener **exactamente** estas 5 columnas con estos nombres:
-        """)
+        if modelo == MODELO_INGRESOS:
+            render_formato_valores()
+        else:
+            st.markdown("""
+            ### 📋 Formato requerido
+            Tu archivo CSV debe contener **exactamente** estas 5 columnas con estos nombres
+            (también se admite Parquet con las mismas columnas; el resto de columnas no se carga):
+            """)
+
+            requisitos_df = pd.DataFrame({
+                'Columna': ['Día', 'Conversiones A', 'Visitas A', 'Conversiones B', 'Visitas B'],
+                'Descripción': [
+                    'Identificador del período (número o texto)',
+                    'Número de conversiones del grupo A',
+                    'Número total de visitas del grupo A',
+                    'Número de conversiones del grupo B',
+                    'Número total de visitas del grupo B'
+                ],
+                'Ejemplo': [
+                    '1, 2, 3... o "Lunes", "Martes"...',
+                    '13, 29, 28...',
+                    '188, 254, 207...',
+                    '21, 14, 22...',
+                    '181, 176, 173...'
+                ]
+            })
 
-        requisitos_df = pd.DataFrame({
-            'Columna': ['Día', 'Conversiones A', 'Visitas A', 'Conversiones B', 'Visitas B'],
-            'Descripción': [
-                'Identificador del período (número o texto)',
-                'Número de conversiones del grupo A',
-                'Número total de visitas del grupo A',
-                'Número de conversiones del grupo B',
-                'Número total de visitas del grupo B'
-            ],
-            'Ejemplo': [
-                '1, 2, 3... o "Lunes", "Martes"...',
-                '13, 29, 28...',
-                '188, 254, 207...',
-                '21, 14, 22...',
-                '181, 176, 173...'
-            ]
-        })
-
-        st.dataframe(requisitos_df, use_container_width=True, hide_index=True)
-
-        st.markdown("### 📄 Ejemplo de archivo CSV válido:")
-        ejemplo_csv_texto = """Día,Conversiones A,Visitas A,Conversiones B,Visitas B
+            st.dataframe(requisitos_df, use_container_width=True, hide_index=True)
+
+            st.markdown("### 📄 Ejemplo de archivo CSV válido:")
+            ejemplo_csv_texto = """Día,Conversiones A,Visitas A,Conversiones B,Visitas B
 1,13,188,21,181
 2,29,254,14,176
 3,28,207,22,173
 4,35,312,41,298
 5,22,189,28,201"""
-        st.code(ejemplo_csv_texto, language="csv")
+            st.code(ejemplo_csv_texto, language="csv")
+
+            st.markdown("""
+            ### 🔀 Más de dos grupos (A/B/C/...)
+            Añade un par de columnas **Conversiones X** y **Visitas X** por cada grupo extra.
+            A y B se siguen analizando como hasta ahora y, además, se comparan todos los
+            grupos a la vez (probabilidad de que cada uno sea el mejor).
+            """)
+            st.code("""Día,Conversiones A,Visitas A,Conversiones B,Visitas B,Conversiones C,Visitas C
+1,13,188,21,181,17,190
+2,29,254,14,176,25,240""", language="csv")
+
+            if st.session_state.get("session_id"):
+                st.markdown("""
+                ### 🧾 Log de eventos con Session ID
+                Con Session ID el archivo es el log de eventos sin agregar, con las columnas
+                **session_id**, **group**, **timestamp** y **value** (una fila por evento).
+                Se recorre por bloques y se agrega por sesión: cada sesión cuenta una visita
+                el día de su primer evento y sus valores se suman (con valores 0/1, la sesión
+                convierte si algún evento tiene valor). Las sesiones que aparecen en más de
+                un grupo se excluyen.
+                """)
+                st.code("""session_id,group,timestamp,value
+s-001,A,2024-01-01 10:02:11,0
+s-001,A,2024-01-01 10:05:40,1
+s-002,B,2024-01-01 11:20:03,0
+s-003,B,2024-01-02 09:14:55,1""", language="csv")
+
+    # TAB 4 Planificación
+    with tab4:
+        if modelo == MODELO_INGRESOS:
+            st.info("La planificación del test todavía solo está disponible para conversiones y clicks.")
+        else:
+            render_planificador(st.session_state.get("selected_model_label"))
 
     # Resultados
     st.markdown('<div class="section-spacer"></div>', unsafe_allow_html=True)
@@ -775,12 +1573,18 @@ def render_calculadora_actual():
 
         umbral_prob = st.session_state.get("umbral_prob", 0.95)
         umbral_mejora = st.session_state.get("umbral_mejora", 0.01)
+        criterio = CRITERIOS_DECISION[st.session_state.get("criterio_decision", next(iter(CRITERIOS_DECISION)))]
 
         with res_tab1:
-            resultado = st.session_state.calculadora.detectar_ganador(
-                umbral_probabilidad=umbral_prob,
-                umbral_mejora_minima=umbral_mejora
-            )
+            # Los resúmenes se calculan una vez por estado; con los umbrales solo se reevalúa la regla
+            resumen = memo_calculadora("resumen_decision", lambda c: c.resumen_decision())
+            if resumen is None:
+                resultado = st.session_state.calculadora.detectar_ganador()
+            else:
+                resultado = decidir_ganador(resumen, umbral_probabilidad=umbral_prob,
+                                            umbral_mejora_minima=umbral_mejora, criterio=criterio,
+                                            umbral_perdida=st.session_state.get("umbral_perdida", 0.001),
+                                            umbral_valor_restante=st.session_state.get("umbral_valor_restante", 0.01))
 
             col1, col2 = st.columns(2)
 
@@ -796,11 +1600,10 @@ def render_calculadora_actual():
                 st.write(f"**Recomendación:** {resultado.get('decision', '—')}")
                 st.write(f"**Razón:** {resultado.get('razon', '—')}")
 
-                dias_con_datos = [
-                    paso for paso in st.session_state.calculadora.historial
-                    if paso.get('dia') and paso['dia'] != 'A priori'
-                ]
-                if len(dias_con_datos) < 6:
+                dias_con_datos = memo_calculadora("dias_con_datos", lambda c: sum(
+                    1 for paso in c.historial if paso.get('dia') and paso['dia'] != 'A priori'
+                ))
+                if dias_con_datos < 6:
                     st.warning("⚠️ Has cargado menos de 6 días de datos. La recomendación puede cambiar al añadir más información.")
 
             with col2:
@@ -812,7 +1615,29 @@ def render_calculadora_actual():
                 if "mejora_relativa" in resultado:
                     st.metric("Mejora relativa", f"{resultado['mejora_relativa']:.2%}")
 
-            if len(st.session_state.calculadora.historial) > 0:
+            if resumen is not None:
+                col_perdida_a, col_perdida_b, col_valor = st.columns(3)
+                col_perdida_a.metric("Pérdida esperada si se elige A", f"{resumen['perdida_a']:.5f}",
+                                     help="E[max(B - A, 0)]: lo que se pierde, en promedio, si A no es el mejor")
+                col_perdida_b.metric("Pérdida esperada si se elige B", f"{resumen['perdida_b']:.5f}",
+                                     help="E[max(A - B, 0)]: lo que se pierde, en promedio, si B no es el mejor")
+                col_valor.metric("Valor potencial restante", f"{resumen['valor_restante']:.2%}",
+                                 help="Percentil 95 de la mejora relativa que aún se podría obtener sobre el grupo que va delante")
+
+            if modelo == MODELO_INGRESOS:
+                ultimo = st.session_state.calculadora.historial[-1]
+                if "posterior" in ultimo:
+                    st.subheader("Estado actual")
+                    colA, colB = st.columns(2)
+                    for col, grupo in ((colA, "A"), (colB, "B")):
+                        posterior = ultimo["posterior"][grupo]
+                        with col:
+                            st.write(f"**Grupo {grupo}**")
+                            st.metric("Valor esperado por usuario", f"{posterior['media']:.4f}")
+                            st.write(f"IC 95%: [{posterior['ci'][0]:.4f}, {posterior['ci'][1]:.4f}] "
+                                     f"con {ultimo['acumulados'][grupo]['Usuarios']:,.0f} usuarios")
+
+            elif len(st.session_state.calculadora.historial) > 0:
                 ultimo = st.session_state.calculadora.historial[-1]
 
                 st.subheader("Estado actual")
@@ -830,59 +1655,89 @@ def render_calculadora_actual():
                     st.metric("Tasa de conversión esperada", f"{mean_b:.4f}")
                     st.write(f"Parámetros: alpha={ultimo['alpha_b']:.1f}, beta={ultimo['beta_b']:.1f}")
 
+            render_test_secuencial(st.session_state.calculadora, dias_con_datos)
+
         with res_tab2:
-            buffer = io.StringIO()
-            with redirect_stdout(buffer):
-                st.session_state.calculadora.mostrar_historial_completo()
-            st.code(buffer.getvalue(), language="text")
+            # Tabla por páginas: el coste de pintar no depende de cuántos días lleve el test
+            tabla = memo_calculadora("historial_dataframe", lambda c: c.historial_dataframe())
+            paginas = max(1, -(-len(tabla) // FILAS_POR_PAGINA))
+            pagina = 1
+            if paginas > 1:
+                pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas,
+                                         value=1, step=1, key="pagina_historial")
+            inicio = (pagina - 1) * FILAS_POR_PAGINA
+            st.dataframe(tabla.iloc[inicio:inicio + FILAS_POR_PAGINA], use_container_width=True, hide_index=True)
+            st.caption(f"Pasos {inicio + 1}–{min(inicio + FILAS_POR_PAGINA, len(tabla))} de {len(tabla)}.")
+            st.download_button(
+                "⬇️ Descargar historial (CSV)",
+                memo_calculadora("historial_csv", lambda c: tabla.to_csv(index=False).encode("utf-8")),
+                file_name="historial.csv",
+                mime="text/csv",
+            )
 
         with res_tab3:
             if len(st.session_state.calculadora.historial) > 0:
                 st.subheader("Gráficos")
 
-                dias_disponibles = [paso["dia"] for paso in st.session_state.calculadora.historial if "dia" in paso]
+                calculadora = st.session_state.calculadora
+                dias_disponibles = memo_calculadora(
+                    "dias_disponibles", lambda c: [paso["dia"] for paso in c.historial if "dia" in paso]
+                )
                 if len(dias_disponibles) > 1:
                     dia_seleccionado = st.selectbox(
                         "Selecciona un día para ver sus gráficos:",
                         dias_disponibles[1:],
                         index=len(dias_disponibles) - 2
                     )
-
-                    paso_seleccionado = None
-                    for paso in st.session_state.calculadora.historial:
-                        if paso.get("dia") == dia_seleccionado:
-                            paso_seleccionado = paso
-                            break
+                    indice_seleccionado = dias_disponibles.index(dia_seleccionado)
                 else:
-                    paso_seleccionado = st.session_state.calculadora.historial[-1]
+                    indice_seleccionado = len(calculadora.historial) - 1
+
+                paso_seleccionado = calculadora.historial[indice_seleccionado]
+
+                if modelo == MODELO_INGRESOS:
+                    if "comparacion" not in paso_seleccionado:
+                        st.info("No hay datos suficientes para mostrar gráficos.")
+                    else:
+                        post_a = paso_seleccionado["posterior"]["A"]
+                        post_b = paso_seleccionado["posterior"]["B"]
+                        comp = paso_seleccionado["comparacion"]
+                        muestras = calculadora.obtener_muestras(indice_seleccionado)
+                        st.write(f"**Distribución posterior del uplift (B vs A), {paso_seleccionado['dia']}**")
+                        conteos, bordes = np.histogram(muestras["uplift"][np.isfinite(muestras["uplift"])], bins=60)
+                        st.bar_chart(pd.DataFrame({"Uplift": (bordes[:-1] + bordes[1:]) / 2, "Muestras": conteos})
+                                     .set_index("Uplift"))
 
-                if paso_seleccionado is None:
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.subheader(f"Estadísticas del {paso_seleccionado['dia']}")
+                            st.metric("Valor esperado A", f"{post_a['media']:.4f}")
+                            st.metric("Valor esperado B", f"{post_b['media']:.4f}")
+                            st.write(f"IC95% A: [{post_a['ci'][0]:.4f}, {post_a['ci'][1]:.4f}]")
+                            st.write(f"IC95% B: [{post_b['ci'][0]:.4f}, {post_b['ci'][1]:.4f}]")
+                        with col2:
+                            st.subheader("Comparación B vs A")
+                            st.metric("Uplift medio", f"{comp['uplift_media']:.2%}")
+                            st.write(f"IC95% uplift: [{comp['uplift_ci'][0]:.2%}, {comp['uplift_ci'][1]:.2%}]")
+                            st.metric("Probabilidad de que B > A", f"{comp['prob_b_mejor']:.2%}")
+
+                elif "datos" not in paso_seleccionado:
                     st.info("No hay datos suficientes para mostrar gráficos.")
                 else:
-                    es_gamma = "trace" in paso_seleccionado
-                    es_beta = "posterior" in paso_seleccionado and "comparacion" in paso_seleccionado
+                    es_gamma = modelo_de(calculadora) == "gamma_poisson"
+                    es_beta = modelo_de(calculadora) == "beta_binomial"
+
+                    # Densidades analíticas; las figuras quedan cacheadas por día y parámetros
+                    png_post, png_diff = graficos_dia_png(
+                        "gamma" if es_gamma else "beta",
+                        paso_seleccionado["dia"],
+                        paso_seleccionado["alpha_a"], paso_seleccionado["beta_a"],
+                        paso_seleccionado["alpha_b"], paso_seleccionado["beta_b"]
+                    )
+                    st.image(png_post, use_column_width=True)
+                    st.image(png_diff, use_column_width=True)
 
                     if es_gamma:
-                        fig1, ax1 = plt.subplots(figsize=(10, 5))
-                        tasa_a_samples = paso_seleccionado["trace"].posterior["tasa_clicks_a"].values.flatten()
-                        tasa_b_samples = paso_seleccionado["trace"].posterior["tasa_clicks_b"].values.flatten()
-
-                        sns.kdeplot(tasa_a_samples, label="Grupo A", fill=True, ax=ax1)
-                        sns.kdeplot(tasa_b_samples, label="Grupo B", fill=True, ax=ax1)
-                        ax1.set_title(f"{paso_seleccionado['dia']} - Distribuciones posteriores (Gamma–Poisson)")
-                        ax1.set_xlabel("Tasa de clicks por visita")
-                        ax1.legend()
-                        st.pyplot(fig1)
-
-                        fig2, ax2 = plt.subplots(figsize=(10, 4))
-                        diff = paso_seleccionado["trace"].posterior["diferencia"].values.flatten()
-                        sns.kdeplot(diff, label="Diferencia (B - A)", fill=True, ax=ax2)
-                        ax2.axvline(0, color="black", linestyle="--")
-                        ax2.set_title(f"{paso_seleccionado['dia']} - Diferencia de tasa de clicks")
-                        ax2.set_xlabel("Diferencia en clicks por visita")
-                        ax2.legend()
-                        st.pyplot(fig2)
-
                         col1, col2 = st.columns(2)
                         with col1:
                             st.subheader(f"Estadísticas del {paso_seleccionado['dia']}")
@@ -897,35 +1752,13 @@ def render_calculadora_actual():
                                 st.metric("Media", f"{uplift['media']:.2%}")
                                 st.metric("IC 95%", f"[{uplift['ic_95'][0]:.2%}, {uplift['ic_95'][1]:.2%}]")
 
-                            prob_b_mejor = np.mean(diff > 0)
-                            st.metric("Probabilidad de que B > A", f"{prob_b_mejor:.2%}")
+                            st.metric("Probabilidad de que B > A", f"{paso_seleccionado['prob_b_mejor']:.2%}")
 
                     elif es_beta:
                         post_a = paso_seleccionado["posterior"]["A"]
                         post_b = paso_seleccionado["posterior"]["B"]
                         comp = paso_seleccionado["comparacion"]
 
-                        muestras_a = post_a["muestras"]
-                        muestras_b = post_b["muestras"]
-                        diff = comp["diff"]
-
-                        fig1, ax1 = plt.subplots(figsize=(10, 5))
-                        sns.kdeplot(muestras_a, label="Grupo A", fill=True, ax=ax1)
-                        sns.kdeplot(muestras_b, label="Grupo B", fill=True, ax=ax1)
-                        ax1.set_title(f"{paso_seleccionado['dia']} - Distribuciones posteriores (Beta–Binomial)")
-                        ax1.set_xlabel("Tasa de conversión")
-                        ax1.legend()
-                        st.pyplot(fig1)
-
-                        fig2, ax2 = plt.subplots(figsize=(10, 4))
-                        diff_clean = diff[~np.isnan(diff)]
-                        sns.kdeplot(diff_clean, label="Diferencia (B - A)", fill=True, ax=ax2)
-                        ax2.axvline(0, color="black", linestyle="--")
-                        ax2.set_title(f"{paso_seleccionado['dia']} - Diferencia de tasa de conversión")
-                        ax2.set_xlabel("Diferencia en tasa de conversión")
-                        ax2.legend()
-                        st.pyplot(fig2)
-
                         col1, col2 = st.columns(2)
                         with col1:
                             st.subheader(f"Estadísticas del {paso_seleccionado['dia']}")
@@ -938,46 +1771,14 @@ def render_calculadora_actual():
                             st.metric("Uplift medio", f"{comp['uplift_media']:.2%}")
                             st.write(f"IC95% uplift: [{comp['uplift_ci'][0]:.2%}, {comp['uplift_ci'][1]:.2%}]")
                             st.metric("Probabilidad de que B > A", f"{comp['prob_b_mejor']:.2%}")
-                    else:
-                        st.info("No hay información suficiente para mostrar gráficos para este modelo.")
 
-                if len(st.session_state.calculadora.historial) > 2:
+                if len(calculadora.historial) > 2:
                     st.subheader("Evolución de tasas")
 
-                    dias = []
-                    tasas_a = []
-                    tasas_b = []
-
-                    for paso in st.session_state.calculadora.historial[1:]:
-                        if "dia" not in paso:
-                            continue
-                        dias.append(paso["dia"])
-
-                        if "trace" in paso:
-                            tasa_a = paso["alpha_a"] / paso["beta_a"]
-                            tasa_b = paso["alpha_b"] / paso["beta_b"]
-                        elif "posterior" in paso:
-                            tasa_a = paso["posterior"]["A"]["media"]
-                            tasa_b = paso["posterior"]["B"]["media"]
-                        else:
-                            dias.pop()
-                            continue
-
-                        tasas_a.append(tasa_a)
-                        tasas_b.append(tasa_b)
-
+                    dias, tasas_a, tasas_b = memo_calculadora("series_evolucion", series_evolucion)
                     if dias:
-                        fig3, ax3 = plt.subplots(figsize=(10, 5))
-                        ax3.plot(dias, tasas_a, 'o-', label="Grupo A")
-                        ax3.plot(dias, tasas_b, 'o-', label="Grupo B")
-                        ax3.set_title("Evolución de tasas")
-                        ax3.set_xlabel("Día")
-                        ax3.set_ylabel("Tasa")
-                        ax3.legend()
-                        ax3.grid(True)
-                        plt.xticks(rotation=45)
-                        plt.tight_layout()
-                        st.pyplot(fig3)
+                        st.image(grafico_evolucion_png(dias, tasas_a, tasas_b),
+                                 use_column_width=True)
 
     # Footer
     st.markdown('<div class="section-spacer"></div>', unsafe_allow_html=True)
@@ -997,4 +1798,9 @@ init_wizard_state()
 if st.session_state.get("show_app", False):
     render_calculadora_actual()
 else:
-    render_wizard()
\ No newline at end of file
+    render_wizard()
+
+if st.session_state.get("show_app", False) and st.session_state.get("trabajo_mcmc") is not None:
+    # Ajuste MCMC en marcha: se vuelve a consultar su estado dentro de unos segundos
+    time.sleep(INTERVALO_SONDEO)
+    st.rerun()
\ No newline at end of file
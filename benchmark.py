@@ -0,0 +1,307 @@
+# benchmark.py
+#
+# Benchmarks reproducibles de las tres calculadoras.
+#
+#   python benchmark.py                          # rejilla completa -> benchmark.json
+#   python benchmark.py --rapido                 # rejilla reducida
+#   python benchmark.py --mcmc                   # incluye CalculadoraClicksBayesiana(metodo="mcmc")
+#   python benchmark.py --arranque               # incluye el arranque en frío de la app
+#   python benchmark.py --comparar anterior.json # falla si algún caso es más lento que la referencia
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from calculadora_bayesiana import CalculadoraClicksBayesiana
+from calculadora_bayesiana_conversiones import CalculadoraConversionesBayesiana
+from calculadora_frecuentista import ConversionFrecuentistaMultiGrupo
+
+SEMILLA = 12345
+
+REJILLA = {
+    'dias': (1, 30, 365),
+    'visitas_dia': (1_000, 100_000),
+    'num_samples': (10_000, 100_000),
+    'grupos': (2, 5, 20, 100),
+}
+REJILLA_RAPIDA = {
+    'dias': (1, 30),
+    'visitas_dia': (1_000,),
+    'num_samples': (10_000,),
+    'grupos': (2, 20),
+}
+
+
+def datos_sinteticos(dias, visitas_dia, semilla=SEMILLA, tasa_a=0.10, tasa_b=0.11):
+    """
+    Serie diaria (conv_a, visitas_a, conv_b, visitas_b) reproducible.
+    """
+    rng = np.random.default_rng(semilla)
+    visitas_a = np.full(dias, visitas_dia, dtype=np.int64)
+    visitas_b = np.full(dias, visitas_dia, dtype=np.int64)
+    return rng.binomial(visitas_a, tasa_a), visitas_a, rng.binomial(visitas_b, tasa_b), visitas_b
+
+
+def _percentiles_ms(latencias):
+    latencias = np.asarray(latencias) * 1000
+    return {
+        'p50': float(np.percentile(latencias, 50)),
+        'p90': float(np.percentile(latencias, 90)),
+        'p99': float(np.percentile(latencias, 99)),
+        'max': float(latencias.max()),
+    }
+
+
+def medir(preparar, llamadas):
+    """
+    Mide una ejecución completa: preparar() crea el estado (una calculadora nueva)
+    y llamadas(estado) genera las llamadas a cronometrar una a una.
+
+    El tiempo se mide sin tracemalloc; la memoria pico, en una segunda ejecución
+    con tracemalloc (que ralentiza el código Python y falsearía las latencias).
+    """
+    estado = preparar()
+    latencias = []
+    inicio = time.perf_counter()
+    for llamada in llamadas(estado):
+        t0 = time.perf_counter()
+        llamada()
+        latencias.append(time.perf_counter() - t0)
+    tiempo_total = time.perf_counter() - inicio
+
+    estado = preparar()
+    tracemalloc.start()
+    for llamada in llamadas(estado):
+        llamada()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'llamadas': len(latencias),
+        'tiempo_total_s': tiempo_total,
+        'latencia_ms': _percentiles_ms(latencias),
+        'memoria_pico_mb': pico / 2**20,
+    }
+
+
+def _llamadas_bayesianas(serie, modo):
+    """
+    modo "diario": una llamada a actualizar_con_datos por día (como la entrada manual).
+    modo "lote": una única llamada a procesar_serie con toda la serie (como el CSV).
+    """
+    conv_a, visitas_a, conv_b, visitas_b = serie
+
+    def llamadas(calculadora):
+        if modo == "lote":
+            yield lambda: calculadora.procesar_serie(conv_a, visitas_a, conv_b, visitas_b)
+            return
+        for i in range(len(conv_a)):
+            yield lambda i=i: calculadora.actualizar_con_datos(
+                int(conv_a[i]), int(visitas_a[i]), int(conv_b[i]), int(visitas_b[i]))
+
+    return llamadas
+
+
+def casos_clicks(rejilla, mcmc=False):
+    metodos = ("conjugado", "mcmc") if mcmc else ("conjugado",)
+    for metodo, dias, visitas_dia, modo in itertools.product(
+            metodos, rejilla['dias'], rejilla['visitas_dia'], ("diario", "lote")):
+        if metodo == "mcmc" and dias > 30:
+            continue  # un ajuste NUTS por día: 365 días no es razonable en un benchmark
+        caso = {'calculadora': 'CalculadoraClicksBayesiana', 'metodo': metodo, 'modo': modo,
+                'dias': dias, 'visitas_dia': visitas_dia}
+        serie = datos_sinteticos(dias, visitas_dia)
+        yield caso, (lambda metodo=metodo: CalculadoraClicksBayesiana(
+            metodo=metodo, historial_compacto=True, semilla=SEMILLA)), _llamadas_bayesianas(serie, modo)
+
+
+def casos_conversiones(rejilla):
+    configuraciones = [("muestreo", n) for n in rejilla['num_samples']] + [("exacto", None)]
+    for (metodo, num_samples), dias, visitas_dia, modo in itertools.product(
+            configuraciones, rejilla['dias'], rejilla['visitas_dia'], ("diario", "lote")):
+        caso = {'calculadora': 'CalculadoraConversionesBayesiana', 'metodo': metodo, 'modo': modo,
+                'dias': dias, 'visitas_dia': visitas_dia, 'num_samples': num_samples}
+        serie = datos_sinteticos(dias, visitas_dia)
+        kwargs = {'metodo': metodo, 'historial_compacto': True, 'semilla': SEMILLA}
+        if num_samples is not None:
+            kwargs['num_samples'] = num_samples
+        yield caso, (lambda kwargs=kwargs: CalculadoraConversionesBayesiana(**kwargs)), \
+            _llamadas_bayesianas(serie, modo)
+
+
+def casos_frecuentista(rejilla, repeticiones):
+    for grupos, visitas_dia in itertools.product(rejilla['grupos'], rejilla['visitas_dia']):
+        caso = {'calculadora': 'ConversionFrecuentistaMultiGrupo', 'metodo': 'z', 'modo': 'analizar_datos',
+                'grupos': grupos, 'visitas_dia': visitas_dia, 'repeticiones': repeticiones}
+        rng = np.random.default_rng(SEMILLA)
+        tasas = rng.uniform(0.05, 0.15, grupos)
+        datos = {
+            f"G{i}": {'visitas': visitas_dia, 'conv': int(rng.binomial(visitas_dia, tasa))}
+            for i, tasa in enumerate(tasas)
+        }
+
+        def llamadas(calculadora, datos=datos):
+            for _ in range(repeticiones):
+                yield lambda: (calculadora.analizar_datos(datos), calculadora.obtener_ganador_global())
+
+        yield caso, ConversionFrecuentistaMultiGrupo, llamadas
+
+
+# Módulos pesados que la primera pantalla de la app no debería cargar
+MODULOS_PESADOS = ('pymc', 'pytensor', 'arviz', 'seaborn', 'matplotlib')
+
+# Se ejecuta en un intérprete nuevo: primera pantalla de la app (wizard) con AppTest,
+# sin servidor. Imprime tiempo, memoria pico (kB en Linux) y módulos pesados cargados.
+_CODIGO_ARRANQUE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+AppTest.from_file({ruta!r}, default_timeout=600).run()
+print(json.dumps([time.perf_counter() - t0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  [m for m in {pesados!r} if m in sys.modules]]))
+"""
+
+
+def medir_arranque(repeticiones=5, ruta_app=None):
+    """
+    Arranque en frío de la app: cada repetición es un proceso nuevo que importa
+    todo lo que importa app.py y pinta la primera pantalla. Devuelve un resultado
+    con los mismos campos que medir(), más los módulos pesados que quedan cargados.
+    """
+    ruta_app = ruta_app or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    codigo = _CODIGO_ARRANQUE.format(ruta=ruta_app, pesados=MODULOS_PESADOS)
+    tiempos, memorias = [], []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(ruta_app)).stdout
+        tiempo, memoria_kb, cargados = json.loads(salida.strip().splitlines()[-1])
+        tiempos.append(tiempo)
+        memorias.append(memoria_kb / 1024)
+    return {
+        'calculadora': 'arranque app',
+        'llamadas': repeticiones,
+        'tiempo_total_s': float(np.median(tiempos)),
+        'latencia_ms': _percentiles_ms(tiempos),
+        'memoria_pico_mb': float(np.max(memorias)),
+        'modulos_pesados': cargados,
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(rejilla, mcmc=False, repeticiones=50, filtro=None):
+    casos = itertools.chain(
+        casos_clicks(rejilla, mcmc=mcmc),
+        casos_conversiones(rejilla),
+        casos_frecuentista(rejilla, repeticiones),
+    )
+    resultados = []
+    for caso, preparar, llamadas in casos:
+        if filtro and filtro not in caso['calculadora']:
+            continue
+        resultado = {**caso, **medir(preparar, llamadas)}
+        resultados.append(resultado)
+        descripcion = ", ".join(f"{k}={v}" for k, v in caso.items() if k != 'calculadora' and v is not None)
+        print(f"{caso['calculadora']} ({descripcion}): {resultado['tiempo_total_s']:.3f} s, "
+              f"p50 {resultado['latencia_ms']['p50']:.2f} ms, pico {resultado['memoria_pico_mb']:.1f} MB",
+              flush=True)
+    return resultados
+
+
+# Campos medidos (el resto describe el caso)
+METRICAS = ('llamadas', 'tiempo_total_s', 'latencia_ms', 'memoria_pico_mb', 'ratio_referencia',
+            'modulos_pesados')
+
+
+def _clave(resultado):
+    return tuple(sorted((k, v) for k, v in resultado.items() if k not in METRICAS))
+
+
+def comparar(resultados, referencia, tolerancia):
+    """
+    Compara el tiempo total de cada caso con el mismo caso de la referencia.
+    Devuelve la lista de regresiones (casos más lentos que tolerancia x referencia).
+    """
+    anteriores = {_clave(r): r for r in referencia['resultados']}
+    regresiones = []
+    for resultado in resultados:
+        anterior = anteriores.get(_clave(resultado))
+        if anterior is None or anterior['tiempo_total_s'] <= 0:
+            continue
+        ratio = resultado['tiempo_total_s'] / anterior['tiempo_total_s']
+        resultado['ratio_referencia'] = ratio
+        if ratio > tolerancia:
+            regresiones.append(resultado)
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de las calculadoras A/B")
+    parser.add_argument("--salida", default="benchmark.json", help="archivo JSON de resultados")
+    parser.add_argument("--rapido", action="store_true", help="rejilla reducida")
+    parser.add_argument("--mcmc", action="store_true", help="incluir el método mcmc (lento)")
+    parser.add_argument("--arranque", action="store_true",
+                        help="medir también el arranque en frío de la app (procesos nuevos)")
+    parser.add_argument("--repeticiones", type=int, default=50,
+                        help="llamadas por caso en el frecuentista")
+    parser.add_argument("--solo", help="solo las calculadoras cuyo nombre contenga este texto")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    parser.add_argument("--tolerancia", type=float, default=1.5,
+                        help="ratio de tiempo a partir del cual un caso cuenta como regresión")
+    args = parser.parse_args(argv)
+
+    rejilla = REJILLA_RAPIDA if args.rapido else REJILLA
+    resultados = ejecutar(rejilla, mcmc=args.mcmc, repeticiones=args.repeticiones, filtro=args.solo)
+    if args.arranque:
+        arranque = medir_arranque()
+        resultados.append(arranque)
+        print(f"Arranque de la app: {arranque['tiempo_total_s']:.2f} s (mediana), "
+              f"pico {arranque['memoria_pico_mb']:.1f} MB, "
+              f"módulos pesados: {', '.join(arranque['modulos_pesados']) or 'ninguno'}", flush=True)
+
+    regresiones = []
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+
+    informe = {
+        'metadatos': {
+            'fecha': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            'commit': _commit_actual(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'semilla': SEMILLA,
+            'rejilla': {k: list(v) for k, v in rejilla.items()},
+        },
+        'resultados': resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+
+    if regresiones:
+        print(f"{len(regresiones)} casos más lentos que {args.tolerancia}x la referencia:")
+        for r in regresiones:
+            caso = ", ".join(f"{k}={v}" for k, v in _clave(r) if k != 'calculadora' and v is not None)
+            print(f"  {r['calculadora']} ({caso}): x{r['ratio_referencia']:.2f}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
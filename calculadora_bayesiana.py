@@ -1,70 +1,450 @@
 # calculadora_bayesiana.py
-import pymc as pm
+import os
+import threading
+from functools import lru_cache
+from importlib.util import find_spec
+
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
+from scipy import stats
+
+from decision import decidir_ganador
+from historial import HistorialCompacto, columnas_historial
+from ingesta import series_desde_dataframe
+from muestreo import generador_dia, muestrear_posteriores, validar_muestreo
+from posteriores_conjugadas import (
+    perdida_esperada_gamma,
+    prob_gamma_b_mejor,
+    resumen_uplift_gamma,
+    valor_restante_gamma,
+)
+
+METODOS = ("conjugado", "mcmc")
+
+# Implementaciones de NUTS que acepta pm.sample (nuts_sampler). "pymc" es la de
+# siempre; las otras compilan el modelo con numba (nutpie) o JAX (numpyro,
+# blackjax) y muestrean bastante más rápido, pero solo si el paquete está instalado.
+SAMPLERS_NUTS = ("pymc", "nutpie", "numpyro", "blackjax")
+
+# Entradas del modelo MCMC que cambian de un día a otro (pm.MutableData)
+DATOS_MCMC = ("alpha_a", "beta_a", "alpha_b", "beta_b", "clicks_a", "visitas_a", "clicks_b", "visitas_b")
+
+
+def validar_sampler_nuts(sampler_nuts):
+    if sampler_nuts not in SAMPLERS_NUTS:
+        raise ValueError(f"sampler_nuts debe ser uno de {SAMPLERS_NUTS}, no {sampler_nuts!r}")
+    if sampler_nuts != "pymc" and find_spec(sampler_nuts) is None:
+        raise ValueError(f"sampler_nuts={sampler_nuts!r} necesita tener instalado el paquete {sampler_nuts}")
+
+
+@lru_cache(maxsize=None)
+def _plantilla_mcmc():
+    """
+    Modelo Gamma-Poisson con los priors y los datos del día como pm.MutableData,
+    su paso NUTS ya compilado y un lock. Se construye una vez por proceso y sirve
+    para todos los días y experimentos: cada ajuste solo cambia los datos.
+    """
+    import pymc as pm
+
+    with pm.Model() as modelo:
+        datos = {
+            nombre: pm.MutableData(nombre, 0 if nombre.startswith("clicks") else 1.0)
+            for nombre in DATOS_MCMC
+        }
+        tasa_a = pm.Gamma('tasa_clicks_a', alpha=datos["alpha_a"], beta=datos["beta_a"])
+        tasa_b = pm.Gamma('tasa_clicks_b', alpha=datos["alpha_b"], beta=datos["beta_b"])
+
+        pm.Poisson('obs_a', mu=tasa_a * datos["visitas_a"], observed=datos["clicks_a"])
+        pm.Poisson('obs_b', mu=tasa_b * datos["visitas_b"], observed=datos["clicks_b"])
+
+        pm.Deterministic('diferencia', tasa_b - tasa_a)
+
+        # Compilar logp y gradiente es lo caro de construir el paso: se hace aquí una vez
+        paso = pm.NUTS()
+    return modelo, paso, threading.Lock()
+
+
+# Un proceso hijo (fork) no hereda la plantilla: su lock podría estar cogido
+os.register_at_fork(after_in_child=_plantilla_mcmc.cache_clear)
+
+
+def ajustar_mcmc(priors, datos, rng, cadenas=2, nucleos=1, sampler_nuts="pymc"):
+    """
+    Ajuste NUTS de un día: priors Gamma (alpha_a, beta_a, alpha_b, beta_b) y
+    datos (clicks_a, visitas_a, clicks_b, visitas_b). Devuelve el trace de PyMC.
+
+    Es una función de módulo (y no un método) para poder ejecutarla en otro
+    proceso: la usa trabajos.ColaAjustes. nucleos > 1 reparte las cadenas
+    entre procesos. Usa la plantilla del proceso (_plantilla_mcmc); con otro
+    sampler_nuts que "pymc" el modelo lo compila el paquete correspondiente.
+    """
+    # PyMC tarda segundos en importarse: solo se carga si se usa metodo="mcmc"
+    import pymc as pm
+
+    modelo, paso, lock = _plantilla_mcmc()
+    opciones = {"step": paso} if sampler_nuts == "pymc" else {"nuts_sampler": sampler_nuts}
+    with lock, modelo:
+        # Con el paso a cero cada ajuste da lo mismo que con un paso nuevo
+        paso.reset_tuning()
+        pm.set_data(dict(zip(DATOS_MCMC, (*priors, *datos))))
+        return pm.sample(2000, tune=1000, chains=cadenas, cores=nucleos, progressbar=False,
+                         random_seed=rng, compute_convergence_checks=False, **opciones)
 
-# Estilo para los gráficos
-sns.set(style="whitegrid")
 
 class CalculadoraClicksBayesiana:
-    def __init__(self, alpha_prior_a=1, beta_prior_a=1, alpha_prior_b=1, beta_prior_b=1):
+    """
+    Calculadora bayesiana Gamma-Poisson para clicks por visita en dos grupos A y B.
+
+    metodo="conjugado" (por defecto) usa directamente las posteriores Gamma conjugadas:
+    P(B > A) y el uplift se calculan de forma exacta y las muestras del "trace" se
+    generan con NumPy. metodo="mcmc" ajusta el modelo con PyMC (NUTS) en cada día,
+    con `cadenas` cadenas repartidas entre `nucleos` procesos y la implementación de
+    NUTS `sampler_nuts` (una de SAMPLERS_NUTS). Los ajustes de una
+    serie son independientes entre sí (el prior de cada día sale de los conteos
+    acumulados), así que también pueden hacerse fuera (tareas_mcmc / registrar_mcmc).
+
+    Tanto las muestras conjugadas como NUTS usan un generador sembrado con
+    (semilla, día): generador ("pcg64" / "sfc64") y esquema ("aleatorio",
+    "antitetico", "sobol", solo para las conjugadas) como en muestreo.py.
+    """
+
+    # Columnas del historial compacto (un float por día)
+    COLUMNAS_HISTORIAL = (
+        "alpha_a", "beta_a", "alpha_b", "beta_b",
+        "clicks_a", "visitas_a", "clicks_b", "visitas_b",
+        "prob_b_mejor", "uplift_media", "uplift_std", "uplift_ic_inf", "uplift_ic_sup",
+    )
+
+    def __init__(self, alpha_prior_a=1, beta_prior_a=1, alpha_prior_b=1, beta_prior_b=1,
+                 metodo="conjugado", num_samples=4000, historial_compacto=False, semilla=None,
+                 generador="pcg64", esquema="aleatorio", cadenas=2, nucleos=1,
+                 sampler_nuts="pymc"):
+        if metodo not in METODOS:
+            raise ValueError(f"metodo debe ser uno de {METODOS}, no {metodo!r}")
+        validar_muestreo(generador, esquema)
+        validar_sampler_nuts(sampler_nuts)
+        self.metodo = metodo
+        self.generador = generador
+        self.esquema = esquema
+        self.num_samples = num_samples
+        self.cadenas = cadenas
+        self.nucleos = nucleos
+        self.sampler_nuts = sampler_nuts
+        self.priors = (alpha_prior_a, beta_prior_a, alpha_prior_b, beta_prior_b)
+        # Las muestras de cada día (conjugadas o de NUTS) salen de un generador sembrado
+        # con (semilla, día), así se pueden regenerar idénticas cuando no se guardan
+        self.semilla = np.random.SeedSequence().entropy if semilla is None else semilla
         self.alpha_a = alpha_prior_a
         self.beta_a = beta_prior_a
         self.alpha_b = alpha_prior_b
         self.beta_b = beta_prior_b
-        self.historial = []
+        # Pasos anteriores al primero del historial (solo al restaurar desde un almacén)
+        self.pasos_previos = 0
+        self.historial_compacto = historial_compacto
+        if historial_compacto:
+            self.historial = HistorialCompacto(self.COLUMNAS_HISTORIAL, self._paso_desde_fila)
+        else:
+            self.historial = []
         self._guardar_estado("A priori")
 
-    def _guardar_estado(self, dia):
+    def _guardar_estado(self, dia, parametros=None):
+        if parametros is None:
+            parametros = (self.alpha_a, self.beta_a, self.alpha_b, self.beta_b)
+        alpha_a, beta_a, alpha_b, beta_b = (np.asarray(x).item() for x in parametros)
+        if self.historial_compacto:
+            self.historial.agregar(dia, alpha_a=alpha_a, beta_a=beta_a, alpha_b=alpha_b, beta_b=beta_b)
+            return
         estado = {
             'dia': dia,
-            'alpha_a': self.alpha_a,
-            'beta_a': self.beta_a,
-            'alpha_b': self.alpha_b,
-            'beta_b': self.beta_b
+            'alpha_a': alpha_a,
+            'beta_a': beta_a,
+            'alpha_b': alpha_b,
+            'beta_b': beta_b
         }
         self.historial.append(estado)
 
-    def actualizar_con_datos(self, clicks_a, visitas_a, clicks_b, visitas_b, dia=None):
-        datos_dia = {
-            'clicks_a': clicks_a,
-            'visitas_a': visitas_a,
-            'clicks_b': clicks_b,
-            'visitas_b': visitas_b
+    def _guardar_dia(self, dia, parametros, datos_dia, prob_b_mejor, uplift, trace=None):
+        """
+        Añade al historial un día con datos. En el historial compacto solo quedan
+        los números; el trace se descarta y obtener_muestras() lo regenera.
+        """
+        if self.historial_compacto:
+            alpha_a, beta_a, alpha_b, beta_b = parametros
+            self.historial.agregar(
+                dia, alpha_a=alpha_a, beta_a=beta_a, alpha_b=alpha_b, beta_b=beta_b,
+                **datos_dia, prob_b_mejor=prob_b_mejor,
+                uplift_media=uplift["media"], uplift_std=uplift["std"],
+                uplift_ic_inf=uplift["ic_95"][0], uplift_ic_sup=uplift["ic_95"][1]
+            )
+            return
+
+        self._guardar_estado(dia, parametros)
+        if trace is not None:
+            self.historial[-1]["trace"] = trace
+        self.historial[-1]["datos"] = datos_dia
+        self.historial[-1]["prob_b_mejor"] = prob_b_mejor
+        self.historial[-1]["uplift"] = uplift
+
+    def _paso_desde_fila(self, dia, fila):
+        """
+        Construye el dict de un paso a partir de una fila del historial compacto.
+        """
+        paso = {
+            'dia': dia,
+            'alpha_a': fila['alpha_a'],
+            'beta_a': fila['beta_a'],
+            'alpha_b': fila['alpha_b'],
+            'beta_b': fila['beta_b']
+        }
+        if np.isnan(fila['visitas_a']):
+            return paso  # Paso "A priori"
+
+        paso["datos"] = {
+            'clicks_a': int(fila['clicks_a']),
+            'visitas_a': int(fila['visitas_a']),
+            'clicks_b': int(fila['clicks_b']),
+            'visitas_b': int(fila['visitas_b'])
+        }
+        paso["prob_b_mejor"] = fila['prob_b_mejor']
+        paso["uplift"] = {
+            "media": fila['uplift_media'],
+            "std": fila['uplift_std'],
+            "ic_95": np.array([fila['uplift_ic_inf'], fila['uplift_ic_sup']])
         }
+        return paso
 
-        with pm.Model() as model:
-            tasa_a = pm.Gamma('tasa_clicks_a', alpha=self.alpha_a, beta=self.beta_a)
-            tasa_b = pm.Gamma('tasa_clicks_b', alpha=self.alpha_b, beta=self.beta_b)
+    def _fila_desde_paso(self, paso):
+        """
+        Inversa de _paso_desde_fila: valores escalares de un paso del historial en lista.
+        """
+        fila = {clave: paso[clave] for clave in ('alpha_a', 'beta_a', 'alpha_b', 'beta_b')}
+        if "datos" in paso:
+            fila.update(paso["datos"])
+            fila["prob_b_mejor"] = paso["prob_b_mejor"]
+            fila["uplift_media"] = paso["uplift"]["media"]
+            fila["uplift_std"] = paso["uplift"]["std"]
+            fila["uplift_ic_inf"], fila["uplift_ic_sup"] = paso["uplift"]["ic_95"]
+        return fila
 
-            pm.Poisson('obs_a', mu=tasa_a * visitas_a, observed=clicks_a)
-            pm.Poisson('obs_b', mu=tasa_b * visitas_b, observed=clicks_b)
+    def actualizar_con_datos(self, clicks_a, visitas_a, clicks_b, visitas_b, dia=None):
+        if self.metodo == "conjugado":
+            self.procesar_serie([clicks_a], [visitas_a], [clicks_b], [visitas_b], dias=[dia])
+            return
 
-            pm.Deterministic('diferencia', tasa_b - tasa_a)
+        tarea, = self.tareas_mcmc([clicks_a], [visitas_a], [clicks_b], [visitas_b], dias=[dia])
+        self.registrar_mcmc(tarea, self._muestrear_mcmc(tarea))
 
-            trace = pm.sample(2000, tune=1000, chains=2, cores=1, progressbar=False)
+    def tareas_mcmc(self, clicks_a, visitas_a, clicks_b, visitas_b, dias=None):
+        """
+        Un ajuste MCMC por día de la serie, listos para ejecutarse en cualquier
+        orden (o en otros procesos): dicts con dia, priors, datos y el generador
+        sembrado del día. Sus traces se añaden luego, en orden, con registrar_mcmc.
+        """
+        n_previos = self.pasos_previos + len(self.historial)
+        if dias is None:
+            dias = [None] * len(clicks_a)
+        # El prior de cada día es la posterior conjugada del anterior
+        priors = np.column_stack([
+            self.alpha_a + np.cumsum(np.concatenate([[0], clicks_a[:-1]])),
+            self.beta_a + np.cumsum(np.concatenate([[0], visitas_a[:-1]])),
+            self.alpha_b + np.cumsum(np.concatenate([[0], clicks_b[:-1]])),
+            self.beta_b + np.cumsum(np.concatenate([[0], visitas_b[:-1]])),
+        ])
+        return [
+            {
+                "dia": dia or f"Día {n_previos + i}",
+                "priors": tuple(priors[i].tolist()),
+                "datos": (int(clicks_a[i]), int(visitas_a[i]), int(clicks_b[i]), int(visitas_b[i])),
+                "rng": generador_dia(self.semilla, n_previos + i, self.generador),
+            }
+            for i, dia in enumerate(dias)
+        ]
 
+    def registrar_mcmc(self, tarea, trace):
+        """
+        Añade al historial el día de una tarea de tareas_mcmc con su trace. Las
+        tareas se tienen que registrar en el orden en que se crearon.
+        """
+        clicks_a, visitas_a, clicks_b, visitas_b = tarea["datos"]
         self.alpha_a += clicks_a
         self.beta_a += visitas_a
         self.alpha_b += clicks_b
         self.beta_b += visitas_b
 
-        self._guardar_estado(dia or f"Día {len(self.historial)}")
-        self.historial[-1]["trace"] = trace
-        self.historial[-1]["datos"] = datos_dia
-
         # Cálculo de uplift/downlift
         tasa_a_muestral = trace.posterior['tasa_clicks_a'].values.flatten()
         tasa_b_muestral = trace.posterior['tasa_clicks_b'].values.flatten()
         uplift_muestral = (tasa_b_muestral - tasa_a_muestral) / tasa_a_muestral
 
-        self.historial[-1]["uplift"] = {
-            "media": np.mean(uplift_muestral),
-            "std": np.std(uplift_muestral),
-            "ic_95": np.percentile(uplift_muestral, [2.5, 97.5])
-        }
+        self._guardar_dia(
+            tarea["dia"],
+            (self.alpha_a, self.beta_a, self.alpha_b, self.beta_b),
+            {
+                'clicks_a': clicks_a,
+                'visitas_a': visitas_a,
+                'clicks_b': clicks_b,
+                'visitas_b': visitas_b
+            },
+            float(np.mean(tasa_b_muestral > tasa_a_muestral)),
+            {
+                "media": np.mean(uplift_muestral),
+                "std": np.std(uplift_muestral),
+                "ic_95": np.percentile(uplift_muestral, [2.5, 97.5])
+            },
+            trace=trace
+        )
+
+    def actualizar_con_lote(self, df, progreso=None):
+        """
+        Procesa de una vez un DataFrame con las columnas del CSV
+        (Día, Conversiones A, Visitas A, Conversiones B, Visitas B).
+        """
+        dias, clicks_a, visitas_a, clicks_b, visitas_b = series_desde_dataframe(df)
+        self.procesar_serie(clicks_a, visitas_a, clicks_b, visitas_b, dias=dias, progreso=progreso)
+
+    def restaurar_historial(self, dias, columnas, pasos_previos=0):
+        """
+        Reconstruye el estado a partir de pasos ya calculados: dias son sus etiquetas
+        y columnas {columna del historial compacto: array}. Los parámetros posteriores
+        pasan a ser los del último paso. Con pasos_previos > 0 los pasos dados son los
+        últimos de una serie más larga (basta con el último para seguir añadiendo días
+        sin releer ni reprocesar la serie).
+        """
+        self.historial_compacto = True
+        self.historial = HistorialCompacto(self.COLUMNAS_HISTORIAL, self._paso_desde_fila,
+                                           capacidad=max(len(dias), 1))
+        self.historial.extender(list(dias), columnas)
+        ultimo = self.historial[-1]
+        self.alpha_a, self.beta_a = ultimo["alpha_a"], ultimo["beta_a"]
+        self.alpha_b, self.beta_b = ultimo["alpha_b"], ultimo["beta_b"]
+        self.pasos_previos = pasos_previos
+
+    def procesar_serie(self, clicks_a, visitas_a, clicks_b, visitas_b, dias=None, progreso=None):
+        """
+        Versión vectorizada de actualizar_con_datos para una serie de días.
+
+        Con metodo="conjugado" los parámetros de cada día salen de np.cumsum sobre
+        los conteos y P(B > A) y el uplift se calculan para todos los días a la vez.
+        Con metodo="mcmc" no hay atajo posible y se ajusta un modelo por día.
+        progreso(hechos, total) se llama tras cada día.
+        """
+        n_dias = len(clicks_a)
+        if n_dias == 0:
+            return
+
+        n_previos = self.pasos_previos + len(self.historial)
+        if dias is None:
+            dias = [None] * n_dias
+        dias = [dia or f"Día {n_previos + i}" for i, dia in enumerate(dias)]
+
+        if self.metodo == "mcmc":
+            tareas = self.tareas_mcmc(clicks_a, visitas_a, clicks_b, visitas_b, dias=dias)
+            for i, tarea in enumerate(tareas):
+                self.registrar_mcmc(tarea, self._muestrear_mcmc(tarea))
+                if progreso is not None:
+                    progreso(i + 1, n_dias)
+            return
+
+        clicks_a = np.asarray(clicks_a, dtype=np.int64)
+        visitas_a = np.asarray(visitas_a, dtype=np.int64)
+        clicks_b = np.asarray(clicks_b, dtype=np.int64)
+        visitas_b = np.asarray(visitas_b, dtype=np.int64)
+
+        # Posteriores Gamma de todos los días a partir de los priors actuales
+        alpha_a = self.alpha_a + np.cumsum(clicks_a)
+        beta_a = self.beta_a + np.cumsum(visitas_a)
+        alpha_b = self.alpha_b + np.cumsum(clicks_b)
+        beta_b = self.beta_b + np.cumsum(visitas_b)
+
+        prob_b_mejor = prob_gamma_b_mejor(alpha_a, beta_a, alpha_b, beta_b)
+        uplift = resumen_uplift_gamma(alpha_a, beta_a, alpha_b, beta_b)
+
+        if self.historial_compacto:
+            # Sin muestras: basta con volcar las columnas
+            self.historial.extender(dias, {
+                "alpha_a": alpha_a, "beta_a": beta_a, "alpha_b": alpha_b, "beta_b": beta_b,
+                "clicks_a": clicks_a, "visitas_a": visitas_a, "clicks_b": clicks_b, "visitas_b": visitas_b,
+                "prob_b_mejor": prob_b_mejor,
+                "uplift_media": uplift["media"], "uplift_std": uplift["std"],
+                "uplift_ic_inf": uplift["ic_95"][:, 0], "uplift_ic_sup": uplift["ic_95"][:, 1],
+            })
+            if progreso is not None:
+                progreso(n_dias, n_dias)
+        else:
+            for i in range(n_dias):
+                indice = n_previos + i
+                tasas_a, tasas_b = self._muestrear_dia(indice, alpha_a[i], beta_a[i], alpha_b[i], beta_b[i])
+                self._guardar_dia(
+                    dias[i],
+                    (alpha_a[i], beta_a[i], alpha_b[i], beta_b[i]),
+                    {
+                        'clicks_a': int(clicks_a[i]),
+                        'visitas_a': int(visitas_a[i]),
+                        'clicks_b': int(clicks_b[i]),
+                        'visitas_b': int(visitas_b[i])
+                    },
+                    float(prob_b_mejor[i]),
+                    {
+                        "media": float(uplift["media"][i]),
+                        "std": float(uplift["std"][i]),
+                        "ic_95": uplift["ic_95"][i]
+                    },
+                    trace=self._trace_desde_muestras(tasas_a, tasas_b)
+                )
+                if progreso is not None:
+                    progreso(i + 1, n_dias)
+
+        self.alpha_a, self.beta_a = alpha_a[-1].item(), beta_a[-1].item()
+        self.alpha_b, self.beta_b = alpha_b[-1].item(), beta_b[-1].item()
+
+    def obtener_muestras(self, indice):
+        """
+        Muestras posteriores del paso `indice` del historial para los gráficos:
+        {"A", "B", "diff"} con las tasas de clicks y su diferencia.
+
+        Si el paso no guarda trace (historial compacto) se regeneran de la posterior
+        Gamma conjugada con el generador sembrado de ese día. Con metodo="mcmc" es la
+        misma distribución que muestreaba NUTS, aunque no las mismas muestras.
+        """
+        paso = self.historial[indice]
+        if "datos" not in paso:
+            return None
+        if "trace" in paso:
+            posterior = paso["trace"].posterior
+            return {
+                "A": posterior['tasa_clicks_a'].values.flatten(),
+                "B": posterior['tasa_clicks_b'].values.flatten(),
+                "diff": posterior['diferencia'].values.flatten(),
+            }
+
+        tasas_a, tasas_b = self._muestrear_dia(
+            self.pasos_previos + indice % len(self.historial), paso['alpha_a'], paso['beta_a'], paso['alpha_b'], paso['beta_b']
+        )
+        return {"A": tasas_a, "B": tasas_b, "diff": tasas_b - tasas_a}
+
+    def _muestrear_dia(self, indice, alpha_a, beta_a, alpha_b, beta_b):
+        rng = generador_dia(self.semilla, indice, self.generador)
+        tasas_a, tasas_b = muestrear_posteriores("gamma", [alpha_a, alpha_b], [beta_a, beta_b],
+                                                 self.num_samples, rng, self.esquema)
+        return tasas_a, tasas_b
+
+    def _muestrear_mcmc(self, tarea):
+        return ajustar_mcmc(tarea["priors"], tarea["datos"], tarea["rng"],
+                            self.cadenas, self.nucleos, self.sampler_nuts)
+
+    @staticmethod
+    def _trace_desde_muestras(tasa_a, tasa_b):
+        """
+        Empaqueta muestras directas de las posteriores Gamma como un InferenceData
+        con las mismas variables que el trace de PyMC.
+        """
+        import arviz as az
+
+        return az.from_dict(posterior={
+            'tasa_clicks_a': tasa_a[np.newaxis, :],
+            'tasa_clicks_b': tasa_b[np.newaxis, :],
+            'diferencia': (tasa_b - tasa_a)[np.newaxis, :],
+        })
 
     def _resumen(self, muestras):
         return {
@@ -73,65 +453,151 @@ class CalculadoraClicksBayesiana:
             'IC 95%': np.percentile(muestras, [2.5, 97.5])
         }
 
-    def detectar_ganador(self, umbral_probabilidad = 0.95, umbral_mejora_minima = 0.01):
-        if not self.historial or 'trace' not in self.historial[-1]:
+    def resumen_decision(self):
+        """
+        Lo que necesita la regla de decisión (decision.decidir_ganador) del estado
+        actual: prob_b_mejor, mejora_relativa, perdida_a, perdida_b y valor_restante.
+        Pérdidas y valor restante son cerrados, así que no hace falta muestrear.
+        None si todavía no hay datos.
+        """
+        if not self.historial or 'datos' not in self.historial[-1]:
+            return None
+        ultimo = self.historial[-1]
+        if 'prob_b_mejor' in ultimo:
+            prob_b_mejor = ultimo['prob_b_mejor']
+        else:
+            diff = ultimo['trace'].posterior['diferencia'].values.flatten()
+            prob_b_mejor = np.mean(diff > 0)
+
+        tasa_a = self.alpha_a / self.beta_a
+        tasa_b = self.alpha_b / self.beta_b
+        parametros = (self.alpha_a, self.beta_a, self.alpha_b, self.beta_b)
+        perdida = perdida_esperada_gamma(*parametros)
+        return {
+            'prob_b_mejor': prob_b_mejor,
+            'mejora_relativa': (tasa_b - tasa_a) / tasa_a,
+            'perdida_a': float(perdida['A'][0]),
+            'perdida_b': float(perdida['B'][0]),
+            'valor_restante': float(valor_restante_gamma(*parametros, prob_b_mejor=prob_b_mejor)[0]),
+        }
+
+    def detectar_ganador(self, umbral_probabilidad = 0.95, umbral_mejora_minima = 0.01,
+                         criterio = "probabilidad", umbral_perdida = 0.001, umbral_valor_restante = 0.01):
+        """
+        criterio: "probabilidad" (por defecto), "perdida_esperada" o "valor_restante";
+        ver decision.decidir_ganador.
+        """
+        if not self.historial or 'datos' not in self.historial[-1]:
             return {
                 "ganador": None,
                 "decision": "Continuar prueba",
                 "razon": "No hay datos suficientes"
             }
 
-        ultimo_trace = self.historial[-1]['trace']
-        diff = ultimo_trace.posterior['diferencia'].values.flatten()
+        return decidir_ganador(self.resumen_decision(), umbral_probabilidad, umbral_mejora_minima,
+                               criterio, umbral_perdida, umbral_valor_restante)
 
-        prob_b_mejor = np.mean(diff > 0)
-        prob_a_mejor = np.mean(diff < 0)
+    def resumen_secuencial(self):
+        """
+        Resúmenes acumulados de cada día con datos para un DisenoSecuencial: diferencia
+        de tasas observadas B - A (clicks por visita), su error estándar (Poisson) y
+        pérdidas esperadas exactas. Devuelve también la mirada del primer día
+        ("primera_mirada").
+        """
+        if self.pasos_previos:
+            # Con solo los últimos pasos (AlmacenExperimentos.restaurar) faltarían las
+            # miradas anteriores: el mSPRT y la primera parada dependen de todas
+            raise ValueError('El test secuencial necesita el historial completo (AlmacenExperimentos.cargar)')
+        columnas = columnas_historial(self.historial, self.COLUMNAS_HISTORIAL, self._fila_desde_paso)
+        con_datos = ~np.isnan(columnas['visitas_a'])
+        alpha_a, beta_a = columnas['alpha_a'][con_datos], columnas['beta_a'][con_datos]
+        alpha_b, beta_b = columnas['alpha_b'][con_datos], columnas['beta_b'][con_datos]
+        alpha_prior_a, beta_prior_a, alpha_prior_b, beta_prior_b = self.priors
+        visitas_a = beta_a - beta_prior_a
+        visitas_b = beta_b - beta_prior_b
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tasa_a = (alpha_a - alpha_prior_a) / visitas_a
+            tasa_b = (alpha_b - alpha_prior_b) / visitas_b
+            error = np.sqrt(tasa_a / visitas_a + tasa_b / visitas_b)
+        perdida = perdida_esperada_gamma(alpha_a, beta_a, alpha_b, beta_b)
+        return {
+            'diferencia': tasa_b - tasa_a,
+            'error_estandar': error,
+            'perdida_a': perdida['A'],
+            'perdida_b': perdida['B'],
+            'primera_mirada': int(np.argmax(con_datos)),
+        }
 
-        tasa_a = self.alpha_a / self.beta_a
-        tasa_b = self.alpha_b / self.beta_b
-        mejora_relativa = (tasa_b - tasa_a) / tasa_a
+    def evaluar_secuencial(self, diseno):
+        """
+        Aplica un DisenoSecuencial (secuencial.py) a todos los días procesados:
+        cada día es una mirada. ValueError si la calculadora viene de
+        AlmacenExperimentos.restaurar (solo tiene el último paso).
+        """
+        resumenes = self.resumen_secuencial()
+        return diseno.evaluar_serie(resumenes, primera_mirada=resumenes.pop('primera_mirada'))
 
-        if prob_b_mejor >= umbral_probabilidad and mejora_relativa >= umbral_mejora_minima:
-            return {
-                "ganador": "B",
-                "decision": "Implementar B",
-                "razon": f"B es mejor con {prob_b_mejor:.1%} de probabilidad y {mejora_relativa:.1%} de mejora",
-                "probabilidad": prob_b_mejor,
-                "mejora_relativa": mejora_relativa
-            }
-        elif prob_a_mejor >= umbral_probabilidad and mejora_relativa <= -umbral_mejora_minima:
-            return {
-                "ganador": "A",
-                "decision": "Mantener A",
-                "razon": f"A es mejor con {prob_a_mejor:.1%} de probabilidad y {abs(mejora_relativa):.1%} de mejora",
-                "probabilidad": prob_a_mejor,
-                "mejora_relativa": mejora_relativa
-            }
-        else:
-            return {
-                "ganador": None,
-                "decision": "Continuar prueba",
-                "razon": "No hay evidencia suficiente para declarar un ganador",
-                "probabilidad_b_mejor": prob_b_mejor,
-                "mejora_relativa": mejora_relativa
-            }
+    def historial_dataframe(self):
+        """
+        Una fila por paso con sus resúmenes: datos del día, parámetros, media, IC 95%
+        (cuantiles exactos de la Gamma) y desviación de cada grupo, probabilidad de
+        que B sea mejor, uplift, pérdida esperada y valor restante. Se calcula de
+        golpe sobre las columnas del historial, sin muestras.
+        """
+        columnas = columnas_historial(self.historial, self.COLUMNAS_HISTORIAL, self._fila_desde_paso)
+        dias = self.historial.dias if self.historial_compacto else [paso['dia'] for paso in self.historial]
+        alpha_a, beta_a = columnas['alpha_a'], columnas['beta_a']
+        alpha_b, beta_b = columnas['alpha_b'], columnas['beta_b']
+        ic_a = stats.gamma.ppf([[0.025], [0.975]], alpha_a, scale=1 / beta_a)
+        ic_b = stats.gamma.ppf([[0.025], [0.975]], alpha_b, scale=1 / beta_b)
+        # Métricas de decisión; vacías en el paso "A priori", como el resto de resúmenes
+        sin_datos = np.isnan(columnas['visitas_a'])
+        perdida = perdida_esperada_gamma(alpha_a, beta_a, alpha_b, beta_b)
+        valor_restante = valor_restante_gamma(alpha_a, beta_a, alpha_b, beta_b, prob_b_mejor=columnas['prob_b_mejor'])
+        return pd.DataFrame({
+            'Día': dias,
+            'Clicks A': columnas['clicks_a'],
+            'Visitas A': columnas['visitas_a'],
+            'Clicks B': columnas['clicks_b'],
+            'Visitas B': columnas['visitas_b'],
+            'alpha A': alpha_a,
+            'beta A': beta_a,
+            'alpha B': alpha_b,
+            'beta B': beta_b,
+            'Media A': alpha_a / beta_a,
+            'Desv. A': np.sqrt(alpha_a) / beta_a,
+            'IC 95% A inf': ic_a[0],
+            'IC 95% A sup': ic_a[1],
+            'Media B': alpha_b / beta_b,
+            'Desv. B': np.sqrt(alpha_b) / beta_b,
+            'IC 95% B inf': ic_b[0],
+            'IC 95% B sup': ic_b[1],
+            'Prob. B > A': columnas['prob_b_mejor'],
+            'Uplift medio': columnas['uplift_media'],
+            'Uplift desv.': columnas['uplift_std'],
+            'Uplift IC 95% inf': columnas['uplift_ic_inf'],
+            'Uplift IC 95% sup': columnas['uplift_ic_sup'],
+            'Pérdida esperada A': np.where(sin_datos, np.nan, perdida['A']),
+            'Pérdida esperada B': np.where(sin_datos, np.nan, perdida['B']),
+            'Valor restante': np.where(sin_datos, np.nan, valor_restante),
+        })
 
     def mostrar_historial_completo(self):
-        for paso in self.historial:
+        for indice, paso in enumerate(self.historial):
             print(f"\n🗓️  {paso['dia']}")
-            print(f"Parámetros:")
+            print("Parámetros:")
             print(f"  Grupo A: alpha={paso['alpha_a']:.1f}, beta={paso['beta_a']:.1f}")
             print(f"  Grupo B: alpha={paso['alpha_b']:.1f}, beta={paso['beta_b']:.1f}")
 
             if "datos" in paso:
                 datos = paso["datos"]
-                print(f"Datos del día:")
+                print("Datos del día:")
                 print(f"  Grupo A: {datos['clicks_a']} clicks en {datos['visitas_a']} visitas (tasa: {datos['clicks_a']/datos['visitas_a']:.4f})")
                 print(f"  Grupo B: {datos['clicks_b']} clicks en {datos['visitas_b']} visitas (tasa: {datos['clicks_b']/datos['visitas_b']:.4f})")
 
             mean_a = paso['alpha_a'] / paso['beta_a']
             std_a = np.sqrt(paso['alpha_a'] / (paso['beta_a']**2))
-            ic_a = np.percentile(np.random.gamma(paso['alpha_a'], 1/paso['beta_a'], 10000), [2.5, 97.5])
+            ic_a = stats.gamma.ppf([0.025, 0.975], paso['alpha_a'], scale=1 / paso['beta_a'])
             print("Grupo A:")
             print(f"  Media esperada: {mean_a:.4f}")
             print(f"  Desviación estándar: {std_a:.4f}")
@@ -139,20 +605,20 @@ class CalculadoraClicksBayesiana:
 
             mean_b = paso['alpha_b'] / paso['beta_b']
             std_b = np.sqrt(paso['alpha_b'] / (paso['beta_b']**2))
-            ic_b = np.percentile(np.random.gamma(paso['alpha_b'], 1/paso['beta_b'], 10000), [2.5, 97.5])
+            ic_b = stats.gamma.ppf([0.025, 0.975], paso['alpha_b'], scale=1 / paso['beta_b'])
             print("Grupo B:")
             print(f"  Media esperada: {mean_b:.4f}")
             print(f"  Desviación estándar: {std_b:.4f}")
             print(f"  IC 95%: [{ic_b[0]:.4f}, {ic_b[1]:.4f}]")
 
-            if "trace" in paso:
-                diff = paso['trace'].posterior['diferencia'].values.flatten()
+            if "datos" in paso:
+                diff = self.obtener_muestras(indice)["diff"]
                 resumen_diff = self._resumen(diff)
                 print("Diferencia (B - A):")
                 print(f"  Media: {resumen_diff['Media']:.4f}")
                 print(f"  Desviación estándar: {resumen_diff['Desviación estándar']:.4f}")
                 print(f"  IC 95%: [{resumen_diff['IC 95%'][0]:.4f}, {resumen_diff['IC 95%'][1]:.4f}]")
-                print(f"  Probabilidad de que B > A: {np.mean(diff > 0):.2%}")
+                print(f"  Probabilidad de que B > A: {paso.get('prob_b_mejor', np.mean(diff > 0)):.2%}")
 
                 if "uplift" in paso:
                     uplift = paso["uplift"]
@@ -161,24 +627,5 @@ class CalculadoraClicksBayesiana:
                     print(f"  Desviación estándar: {uplift['std']:.2%}")
                     print(f"  IC 95%: [{uplift['ic_95'][0]:.2%}, {uplift['ic_95'][1]:.2%}]")
 
-                tasa_a_samples = paso['trace'].posterior['tasa_clicks_a'].values.flatten()
-                tasa_b_samples = paso['trace'].posterior['tasa_clicks_b'].values.flatten()
-
-                plt.figure(figsize=(10, 5))
-                sns.kdeplot(tasa_a_samples, label="Grupo A", fill=True)
-                sns.kdeplot(tasa_b_samples, label="Grupo B", fill=True)
-                plt.title(f"{paso['dia']} - Distribuciones posteriores")
-                plt.xlabel("Tasa de clicks por visita")
-                plt.legend()
-                plt.show()
-
-                plt.figure(figsize=(10, 4))
-                sns.kdeplot(diff, label="Diferencia (B - A)", color="purple", fill=True)
-                plt.axvline(0, color="black", linestyle="--")
-                plt.title(f"{paso['dia']} - Diferencia de tasa de clicks")
-                plt.xlabel("Diferencia en clicks por visita")
-                plt.legend()
-                plt.show()
-
 
 
@@ -1,5 +1,21 @@
 # calculadora_bayesiana_conversiones.py
 import numpy as np
+import pandas as pd
+from scipy import stats
+
+from decision import decidir_ganador
+from historial import HistorialCompacto, columnas_historial
+from ingesta import series_desde_dataframe
+from muestreo import generador_dia, muestrear_posteriores, validar_muestreo
+from posteriores_conjugadas import (
+    perdida_esperada_beta,
+    prob_beta_b_mejor,
+    resumen_uplift_beta,
+    valor_restante_beta,
+)
+
+METODOS = ("muestreo", "exacto")
+
 
 class CalculadoraConversionesBayesiana:
     """
@@ -8,11 +24,40 @@ class CalculadoraConversionesBayesiana:
 
     La interfaz imita a CalculadoraClicksBayesiana para que app.py
     pueda usarla igual: .actualizar_con_datos(), .historial, .detectar_ganador(), etc.
+
+    metodo="muestreo" (por defecto) estima los resúmenes con num_samples muestras Beta
+    por grupo y día. metodo="exacto" los calcula sin muestreo (cuadratura y fórmulas
+    cerradas): resultados deterministas y sin guardar muestras en el historial.
+
+    generador ("pcg64" / "sfc64") y esquema ("aleatorio", "antitetico", "sobol")
+    eligen cómo se generan las muestras (ver muestreo.py): con "antitetico" o
+    "sobol" bastan bastantes menos num_samples para la misma precisión.
     """
 
+    # Máximo de muestras por grupo que se generan a la vez al procesar una serie
+    MAX_MUESTRAS_BLOQUE = 4_000_000
+
+    # Columnas del historial compacto (un float por día)
+    COLUMNAS_HISTORIAL = (
+        "alpha_a", "beta_a", "alpha_b", "beta_b",
+        "conversiones_a", "visitas_a", "conversiones_b", "visitas_b",
+        "media_a", "ci_a_inf", "ci_a_sup", "media_b", "ci_b_inf", "ci_b_sup",
+        "prob_b_mejor", "uplift_media", "uplift_ci_inf", "uplift_ci_sup",
+        "perdida_a", "perdida_b",
+    )
+
     def __init__(self, alpha_prior_a=1, beta_prior_a=1,
                        alpha_prior_b=1, beta_prior_b=1,
-                       num_samples=100_000):
+                       num_samples=100_000, metodo="muestreo",
+                       historial_compacto=False, semilla=None,
+                       generador="pcg64", esquema="aleatorio"):
+        if metodo not in METODOS:
+            raise ValueError(f"metodo debe ser uno de {METODOS}, no {metodo!r}")
+        validar_muestreo(generador, esquema)
+        self.metodo = metodo
+        self.generador = generador
+        self.esquema = esquema
+
         # Priors Beta para A y B
         self.alpha_a = alpha_prior_a
         self.beta_a = beta_prior_a
@@ -20,16 +65,32 @@ class CalculadoraConversionesBayesiana:
         self.beta_b = beta_prior_b
 
         self.num_samples = num_samples
-        self.historial = []  # lista de "pasos" (días)
-
-        # Paso 0: estado “a priori”
-        self.historial.append({
-            "dia": "A priori",
-            "alpha_a": self.alpha_a,
-            "beta_a": self.beta_a,
-            "alpha_b": self.alpha_b,
-            "beta_b": self.beta_b,
-        })
+        self.priors = (alpha_prior_a, beta_prior_a, alpha_prior_b, beta_prior_b)
+
+        # Las muestras de cada día salen de un generador sembrado con (semilla, día),
+        # así se pueden regenerar idénticas cuando no se guardan
+        self.semilla = np.random.SeedSequence().entropy if semilla is None else semilla
+
+        # Pasos anteriores al primero del historial (solo al restaurar desde un almacén)
+        self.pasos_previos = 0
+
+        # Lista de "pasos" (días), o arrays con solo los resúmenes si es compacto
+        self.historial_compacto = historial_compacto
+        if historial_compacto:
+            self.historial = HistorialCompacto(self.COLUMNAS_HISTORIAL, self._paso_desde_fila)
+            self.historial.agregar("A priori", alpha_a=self.alpha_a, beta_a=self.beta_a,
+                                   alpha_b=self.alpha_b, beta_b=self.beta_b)
+        else:
+            self.historial = []
+
+            # Paso 0: estado “a priori”
+            self.historial.append({
+                "dia": "A priori",
+                "alpha_a": self.alpha_a,
+                "beta_a": self.beta_a,
+                "alpha_b": self.alpha_b,
+                "beta_b": self.beta_b,
+            })
 
     def actualizar_con_datos(self, conv_a, visitas_a, conv_b, visitas_b, dia=None):
         """
@@ -37,74 +98,289 @@ class CalculadoraConversionesBayesiana:
         - conv_a / visitas_a: conversiones y visitas del grupo A
         - conv_b / visitas_b: conversiones y visitas del grupo B
         """
-        dia = dia or f"Día {len(self.historial)}"
+        self.procesar_serie([conv_a], [visitas_a], [conv_b], [visitas_b], dias=[dia])
+
+    def actualizar_con_lote(self, df, progreso=None):
+        """
+        Procesa de una vez un DataFrame con las columnas del CSV
+        (Día, Conversiones A, Visitas A, Conversiones B, Visitas B).
+        """
+        dias, conv_a, visitas_a, conv_b, visitas_b = series_desde_dataframe(df)
+        self.procesar_serie(conv_a, visitas_a, conv_b, visitas_b, dias=dias, progreso=progreso)
+
+    def restaurar_historial(self, dias, columnas, pasos_previos=0):
+        """
+        Reconstruye el estado a partir de pasos ya calculados: dias son sus etiquetas
+        y columnas {columna del historial compacto: array}. Los parámetros posteriores
+        pasan a ser los del último paso. Con pasos_previos > 0 los pasos dados son los
+        últimos de una serie más larga (basta con el último para seguir añadiendo días
+        sin releer ni reprocesar la serie).
+        """
+        self.historial_compacto = True
+        self.historial = HistorialCompacto(self.COLUMNAS_HISTORIAL, self._paso_desde_fila,
+                                           capacidad=max(len(dias), 1))
+        self.historial.extender(list(dias), columnas)
+        ultimo = self.historial[-1]
+        self.alpha_a, self.beta_a = ultimo["alpha_a"], ultimo["beta_a"]
+        self.alpha_b, self.beta_b = ultimo["alpha_b"], ultimo["beta_b"]
+        self.pasos_previos = pasos_previos
+
+    def procesar_serie(self, conv_a, visitas_a, conv_b, visitas_b, dias=None, progreso=None):
+        """
+        Versión vectorizada de actualizar_con_datos para una serie de días.
+
+        Los parámetros posteriores de cada día salen de sumas acumuladas (np.cumsum)
+        sobre los conteos, y los resúmenes se calculan por bloques de días en una
+        sola pasada. progreso(hechos, total) se llama al terminar cada bloque.
+        """
+        conv_a = np.asarray(conv_a, dtype=np.int64)
+        visitas_a = np.asarray(visitas_a, dtype=np.int64)
+        conv_b = np.asarray(conv_b, dtype=np.int64)
+        visitas_b = np.asarray(visitas_b, dtype=np.int64)
+        n_dias = len(conv_a)
+        if n_dias == 0:
+            return
+
+        n_previos = self.pasos_previos + len(self.historial)
+        if dias is None:
+            dias = [None] * n_dias
+        dias = [dia or f"Día {n_previos + i}" for i, dia in enumerate(dias)]
+
+        # Posteriores de todos los días a partir de los priors actuales
+        alpha_a = self.alpha_a + np.cumsum(conv_a)
+        beta_a = self.beta_a + np.cumsum(visitas_a - conv_a)
+        alpha_b = self.alpha_b + np.cumsum(conv_b)
+        beta_b = self.beta_b + np.cumsum(visitas_b - conv_b)
+
+        # Bloques de días para acotar la memoria del muestreo (dias x num_samples)
+        if self.metodo == "exacto":
+            tam_bloque = n_dias
+        else:
+            tam_bloque = max(1, self.MAX_MUESTRAS_BLOQUE // self.num_samples)
+        for inicio in range(0, n_dias, tam_bloque):
+            bloque = slice(inicio, min(inicio + tam_bloque, n_dias))
+            resumen = self._resumir(alpha_a[bloque], beta_a[bloque], alpha_b[bloque], beta_b[bloque],
+                                    indices=range(n_previos + bloque.start, n_previos + bloque.stop))
+            columnas = {
+                "alpha_a": alpha_a[bloque],
+                "beta_a": beta_a[bloque],
+                "alpha_b": alpha_b[bloque],
+                "beta_b": beta_b[bloque],
+                "conversiones_a": conv_a[bloque],
+                "visitas_a": visitas_a[bloque],
+                "conversiones_b": conv_b[bloque],
+                "visitas_b": visitas_b[bloque],
+                "media_a": resumen["media_a"],
+                "ci_a_inf": resumen["ci_a"][:, 0],
+                "ci_a_sup": resumen["ci_a"][:, 1],
+                "media_b": resumen["media_b"],
+                "ci_b_inf": resumen["ci_b"][:, 0],
+                "ci_b_sup": resumen["ci_b"][:, 1],
+                "prob_b_mejor": resumen["prob_b_mejor"],
+                "uplift_media": resumen["uplift_media"],
+                "uplift_ci_inf": resumen["uplift_ci"][:, 0],
+                "uplift_ci_sup": resumen["uplift_ci"][:, 1],
+                "perdida_a": resumen["perdida_a"],
+                "perdida_b": resumen["perdida_b"],
+            }
 
-        # Posterior A
-        alpha_post_a = self.alpha_a + conv_a
-        beta_post_a  = self.beta_a + (visitas_a - conv_a)
+            if self.historial_compacto:
+                self.historial.extender(dias[bloque], columnas)
+            else:
+                for j, i in enumerate(range(bloque.start, bloque.stop)):
+                    paso = self._paso_desde_fila(dias[i], {clave: valor[j].item() for clave, valor in columnas.items()})
+                    # Solo el método de muestreo tiene muestras que guardar
+                    if "muestras_a" in resumen:
+                        paso["posterior"]["A"]["muestras"] = resumen["muestras_a"][j]
+                        paso["posterior"]["B"]["muestras"] = resumen["muestras_b"][j]
+                        paso["comparacion"]["diff"] = resumen["diff"][j]
+                        paso["comparacion"]["uplift"] = resumen["uplift"][j]
+                    self.historial.append(paso)
 
-        # Posterior B
-        alpha_post_b = self.alpha_b + conv_b
-        beta_post_b  = self.beta_b + (visitas_b - conv_b)
+            if progreso is not None:
+                progreso(bloque.stop, n_dias)
 
         # Guardamos como nuevos priors para la siguiente iteración
-        self.alpha_a, self.beta_a = alpha_post_a, beta_post_a
-        self.alpha_b, self.beta_b = alpha_post_b, beta_post_b
+        self.alpha_a, self.beta_a = alpha_a[-1].item(), beta_a[-1].item()
+        self.alpha_b, self.beta_b = alpha_b[-1].item(), beta_b[-1].item()
 
-        # Muestreo Beta
-        muestras_a = np.random.beta(alpha_post_a, beta_post_a, self.num_samples).astype(float)
-        muestras_b = np.random.beta(alpha_post_b, beta_post_b, self.num_samples).astype(float)
+    def obtener_muestras(self, indice):
+        """
+        Muestras posteriores del paso `indice` del historial para los gráficos:
+        {"A", "B", "diff", "uplift"}.
+
+        Si el paso no guarda muestras (historial compacto o metodo="exacto") se
+        regeneran con el generador sembrado de ese día, de modo que con
+        metodo="muestreo" son exactamente las que produjeron sus resúmenes.
+        """
+        paso = self.historial[indice]
+        if "comparacion" not in paso:
+            return None
+        if "muestras" in paso["posterior"]["A"]:
+            return {
+                "A": paso["posterior"]["A"]["muestras"],
+                "B": paso["posterior"]["B"]["muestras"],
+                "diff": paso["comparacion"]["diff"],
+                "uplift": paso["comparacion"]["uplift"],
+            }
 
-        # Estadísticos individuales
-        mean_a = muestras_a.mean()
-        mean_b = muestras_b.mean()
-        ci_a   = np.percentile(muestras_a, [2.5, 97.5])
-        ci_b   = np.percentile(muestras_b, [2.5, 97.5])
+        indice = self.pasos_previos + indice % len(self.historial)
+        muestras_a, muestras_b = self._muestrear_dia(
+            indice, paso["alpha_a"], paso["beta_a"], paso["alpha_b"], paso["beta_b"]
+        )
+        diff = muestras_b - muestras_a
+        with np.errstate(divide="ignore", invalid="ignore"):
+            uplift = np.where(muestras_a != 0, diff / muestras_a, np.nan)
+        return {"A": muestras_a, "B": muestras_b, "diff": diff, "uplift": uplift}
+
+    def _muestrear_dia(self, indice, alpha_a, beta_a, alpha_b, beta_b):
+        rng = generador_dia(self.semilla, indice, self.generador)
+        muestras_a, muestras_b = muestrear_posteriores("beta", [alpha_a, alpha_b], [beta_a, beta_b],
+                                                       self.num_samples, rng, self.esquema)
+        return muestras_a, muestras_b
+
+    def _resumir(self, alpha_a, beta_a, alpha_b, beta_b, indices):
+        """
+        Resúmenes posteriores de varios días a la vez, según el método elegido.
+        """
+        if self.metodo == "exacto":
+            return self._resumir_exacto(alpha_a, beta_a, alpha_b, beta_b)
+        return self._resumir_muestreo(alpha_a, beta_a, alpha_b, beta_b, indices)
+
+    def _resumir_exacto(self, alpha_a, beta_a, alpha_b, beta_b):
+        """
+        Resúmenes sin muestreo: medias e IC de las Beta con ppf, P(B > A) y pérdida
+        esperada por cuadratura, y media y cuantiles del uplift invirtiendo su CDF.
+        """
+        uplift = resumen_uplift_beta(alpha_a, beta_a, alpha_b, beta_b)
+        perdida = perdida_esperada_beta(alpha_a, beta_a, alpha_b, beta_b)
+        return {
+            "media_a": alpha_a / (alpha_a + beta_a),
+            "media_b": alpha_b / (alpha_b + beta_b),
+            "ci_a": stats.beta.ppf([[0.025, 0.975]], alpha_a[:, np.newaxis], beta_a[:, np.newaxis]),
+            "ci_b": stats.beta.ppf([[0.025, 0.975]], alpha_b[:, np.newaxis], beta_b[:, np.newaxis]),
+            "prob_b_mejor": prob_beta_b_mejor(alpha_a, beta_a, alpha_b, beta_b),
+            "perdida_a": perdida["A"],
+            "perdida_b": perdida["B"],
+            "uplift_media": uplift["media"],
+            "uplift_ci": uplift["ic_95"],
+        }
+
+    def _resumir_muestreo(self, alpha_a, beta_a, alpha_b, beta_b, indices):
+        """
+        Resúmenes por Monte Carlo (una fila de muestras por día).
+        """
+        # Muestreo Beta, con el generador propio de cada día
+        filas = [self._muestrear_dia(i, *parametros)
+                 for i, parametros in zip(indices, zip(alpha_a, beta_a, alpha_b, beta_b))]
+        muestras_a = np.stack([a for a, _ in filas])
+        muestras_b = np.stack([b for _, b in filas])
 
         # Comparación B vs A
-        diff   = muestras_b - muestras_a
-        uplift = np.where(muestras_a != 0, (muestras_b - muestras_a) / muestras_a, np.nan)
-        prob_b_mejor = np.mean(diff > 0)
+        diff = muestras_b - muestras_a
+        with np.errstate(divide="ignore", invalid="ignore"):
+            uplift = np.where(muestras_a != 0, diff / muestras_a, np.nan)
 
-        uplift_mean = np.nanmean(uplift)
-        uplift_ci   = np.nanpercentile(uplift, [2.5, 97.5])
+        return {
+            "muestras_a": muestras_a,
+            "muestras_b": muestras_b,
+            "media_a": muestras_a.mean(axis=1),
+            "media_b": muestras_b.mean(axis=1),
+            "ci_a": np.percentile(muestras_a, [2.5, 97.5], axis=1).T,
+            "ci_b": np.percentile(muestras_b, [2.5, 97.5], axis=1).T,
+            "diff": diff,
+            "uplift": uplift,
+            "prob_b_mejor": np.mean(diff > 0, axis=1),
+            "perdida_a": np.mean(np.maximum(diff, 0), axis=1),
+            "perdida_b": np.mean(np.maximum(-diff, 0), axis=1),
+            "uplift_media": np.nanmean(uplift, axis=1),
+            "uplift_ci": np.nanpercentile(uplift, [2.5, 97.5], axis=1).T,
+        }
 
+    def _paso_desde_fila(self, dia, fila):
+        """
+        Construye el dict de un paso a partir de sus valores escalares
+        (los del historial compacto o los recién calculados).
+        """
         paso = {
             "dia": dia,
-            "alpha_a": alpha_post_a,
-            "beta_a": beta_post_a,
-            "alpha_b": alpha_post_b,
-            "beta_b": beta_post_b,
-            "datos": {
-                "conversiones_a": conv_a,
-                "visitas_a": visitas_a,
-                "conversiones_b": conv_b,
-                "visitas_b": visitas_b,
+            "alpha_a": fila["alpha_a"],
+            "beta_a": fila["beta_a"],
+            "alpha_b": fila["alpha_b"],
+            "beta_b": fila["beta_b"],
+        }
+        if np.isnan(fila.get("visitas_a", np.nan)):
+            return paso  # Paso "A priori"
+
+        paso["datos"] = {
+            "conversiones_a": int(fila["conversiones_a"]),
+            "visitas_a": int(fila["visitas_a"]),
+            "conversiones_b": int(fila["conversiones_b"]),
+            "visitas_b": int(fila["visitas_b"]),
+        }
+        paso["posterior"] = {
+            "A": {
+                "media": fila["media_a"],
+                "ci": np.array([fila["ci_a_inf"], fila["ci_a_sup"]]),
             },
-            "posterior": {
-                "A": {
-                    "media": float(mean_a),
-                    "ci": ci_a,
-                    "muestras": muestras_a,
-                },
-                "B": {
-                    "media": float(mean_b),
-                    "ci": ci_b,
-                    "muestras": muestras_b,
-                },
+            "B": {
+                "media": fila["media_b"],
+                "ci": np.array([fila["ci_b_inf"], fila["ci_b_sup"]]),
             },
-            "comparacion": {
-                "diff": diff,
-                "uplift": uplift,
-                "prob_b_mejor": float(prob_b_mejor),
-                "uplift_media": float(uplift_mean),
-                "uplift_ci": uplift_ci,
+        }
+        paso["comparacion"] = {
+            "prob_b_mejor": fila["prob_b_mejor"],
+            "uplift_media": fila["uplift_media"],
+            "uplift_ci": np.array([fila["uplift_ci_inf"], fila["uplift_ci_sup"]]),
+            "perdida_esperada": {
+                "A": fila["perdida_a"],
+                "B": fila["perdida_b"],
             },
         }
+        return paso
+
+    def _fila_desde_paso(self, paso):
+        """
+        Inversa de _paso_desde_fila: valores escalares de un paso del historial en lista.
+        """
+        fila = {clave: paso[clave] for clave in ("alpha_a", "beta_a", "alpha_b", "beta_b")}
+        if "datos" in paso:
+            fila.update(paso["datos"])
+            for grupo in ("A", "B"):
+                posterior = paso["posterior"][grupo]
+                sufijo = grupo.lower()
+                fila[f"media_{sufijo}"] = posterior["media"]
+                fila[f"ci_{sufijo}_inf"], fila[f"ci_{sufijo}_sup"] = posterior["ci"]
+            comp = paso["comparacion"]
+            fila["prob_b_mejor"] = comp["prob_b_mejor"]
+            fila["uplift_media"] = comp["uplift_media"]
+            fila["uplift_ci_inf"], fila["uplift_ci_sup"] = comp["uplift_ci"]
+            fila["perdida_a"] = comp["perdida_esperada"]["A"]
+            fila["perdida_b"] = comp["perdida_esperada"]["B"]
+        return fila
 
-        self.historial.append(paso)
+    def resumen_decision(self):
+        """
+        Lo que necesita la regla de decisión (decision.decidir_ganador) del último
+        paso: prob_b_mejor, mejora_relativa (uplift medio), perdida_a, perdida_b y
+        valor_restante. Todo sale del historial salvo el valor restante, que es un
+        único cuantil del uplift por cuadratura. None si todavía no hay datos.
+        """
+        if "comparacion" not in self.historial[-1]:
+            return None
+        comp = self.historial[-1]["comparacion"]
+        valor_restante = valor_restante_beta(self.alpha_a, self.beta_a, self.alpha_b, self.beta_b,
+                                             prob_b_mejor=comp["prob_b_mejor"])
+        return {
+            "prob_b_mejor": comp["prob_b_mejor"],
+            "mejora_relativa": comp["uplift_media"],
+            "perdida_a": comp["perdida_esperada"]["A"],
+            "perdida_b": comp["perdida_esperada"]["B"],
+            "valor_restante": float(valor_restante[0]),
+        }
 
-    def detectar_ganador(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
+    def detectar_ganador(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01,
+                         criterio="probabilidad", umbral_perdida=0.001, umbral_valor_restante=0.01):
         """
         Devuelve un dict con la MISMA estructura que CalculadoraClicksBayesiana.detectar_ganador:
         - ganador: "A", "B" o None
@@ -113,8 +389,12 @@ class CalculadoraConversionesBayesiana:
         - probabilidad (si hay ganador)
         - probabilidad_b_mejor (si no hay ganador)
         - mejora_relativa
+        - perdida_esperada ({"A", "B"}) y valor_restante
+
+        criterio: "probabilidad" (por defecto), "perdida_esperada" o "valor_restante";
+        ver decision.decidir_ganador.
         """
-        if len(self.historial) < 2:
+        if "comparacion" not in self.historial[-1]:
             return {
                 "ganador": None,
                 "decision": "Continuar prueba",
@@ -123,40 +403,82 @@ class CalculadoraConversionesBayesiana:
                 "mejora_relativa": None
             }
 
-        ultimo = self.historial[-1]
-        comp = ultimo["comparacion"]
-        prob_b_mejor = comp["prob_b_mejor"]
-        uplift_media = comp["uplift_media"]
+        return decidir_ganador(self.resumen_decision(), umbral_probabilidad, umbral_mejora_minima,
+                               criterio, umbral_perdida, umbral_valor_restante)
 
-        prob_a_mejor = 1 - prob_b_mejor
+    def resumen_secuencial(self):
+        """
+        Resúmenes acumulados de cada día con datos para un DisenoSecuencial: diferencia
+        de tasas observadas B - A, su error estándar (binomial) y pérdidas esperadas.
+        Devuelve también la mirada del primer día ("primera_mirada").
+        """
+        if self.pasos_previos:
+            # Con solo los últimos pasos (AlmacenExperimentos.restaurar) faltarían las
+            # miradas anteriores: el mSPRT y la primera parada dependen de todas
+            raise ValueError("El test secuencial necesita el historial completo (AlmacenExperimentos.cargar)")
+        columnas = columnas_historial(self.historial, self.COLUMNAS_HISTORIAL, self._fila_desde_paso)
+        con_datos = ~np.isnan(columnas["visitas_a"])
+        alpha_prior_a, beta_prior_a, alpha_prior_b, beta_prior_b = self.priors
+        conv_a = columnas["alpha_a"][con_datos] - alpha_prior_a
+        visitas_a = conv_a + columnas["beta_a"][con_datos] - beta_prior_a
+        conv_b = columnas["alpha_b"][con_datos] - alpha_prior_b
+        visitas_b = conv_b + columnas["beta_b"][con_datos] - beta_prior_b
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tasa_a = conv_a / visitas_a
+            tasa_b = conv_b / visitas_b
+            error = np.sqrt(tasa_a * (1 - tasa_a) / visitas_a + tasa_b * (1 - tasa_b) / visitas_b)
+        return {
+            "diferencia": tasa_b - tasa_a,
+            "error_estandar": error,
+            "perdida_a": columnas["perdida_a"][con_datos],
+            "perdida_b": columnas["perdida_b"][con_datos],
+            "primera_mirada": int(np.argmax(con_datos)),
+        }
 
-        # B gana
-        if prob_b_mejor >= umbral_probabilidad and uplift_media >= umbral_mejora_minima:
-            return {
-                "ganador": "B",
-                "decision": "Implementar B",
-                "razon": f"B es mejor con {prob_b_mejor:.1%} de probabilidad y {uplift_media:.1%} de mejora",
-                "probabilidad": prob_b_mejor,
-                "mejora_relativa": uplift_media
-            }
-        # A gana
-        elif prob_a_mejor >= umbral_probabilidad and uplift_media <= -umbral_mejora_minima:
-            return {
-                "ganador": "A",
-                "decision": "Mantener A",
-                "razon": f"A es mejor con {prob_a_mejor:.1%} de probabilidad y {abs(uplift_media):.1%} de mejora",
-                "probabilidad": prob_a_mejor,
-                "mejora_relativa": uplift_media
-            }
-        # Nadie gana todavía
-        else:
-            return {
-                "ganador": None,
-                "decision": "Continuar prueba",
-                "razon": "No hay evidencia suficiente para declarar un ganador",
-                "probabilidad_b_mejor": prob_b_mejor,
-                "mejora_relativa": uplift_media
-            }
+    def evaluar_secuencial(self, diseno):
+        """
+        Aplica un DisenoSecuencial (secuencial.py) a todos los días procesados:
+        cada día es una mirada. ValueError si la calculadora viene de
+        AlmacenExperimentos.restaurar (solo tiene el último paso).
+        """
+        resumenes = self.resumen_secuencial()
+        return diseno.evaluar_serie(resumenes, primera_mirada=resumenes.pop("primera_mirada"))
+
+    def historial_dataframe(self):
+        """
+        Una fila por paso con sus resúmenes: datos del día, parámetros Beta, media e
+        IC 95% de cada grupo, probabilidad de que B sea mejor, uplift, pérdida
+        esperada y valor restante. Sale de las columnas del historial; solo el valor
+        restante se calcula aquí (un cuantil por día, vectorizado).
+        """
+        columnas = columnas_historial(self.historial, self.COLUMNAS_HISTORIAL, self._fila_desde_paso)
+        dias = self.historial.dias if self.historial_compacto else [paso["dia"] for paso in self.historial]
+        parametros = [columnas[nombre] for nombre in ("alpha_a", "beta_a", "alpha_b", "beta_b")]
+        valor_restante = valor_restante_beta(*parametros, prob_b_mejor=columnas["prob_b_mejor"])
+        return pd.DataFrame({
+            "Día": dias,
+            "Conversiones A": columnas["conversiones_a"],
+            "Visitas A": columnas["visitas_a"],
+            "Conversiones B": columnas["conversiones_b"],
+            "Visitas B": columnas["visitas_b"],
+            "alpha A": columnas["alpha_a"],
+            "beta A": columnas["beta_a"],
+            "alpha B": columnas["alpha_b"],
+            "beta B": columnas["beta_b"],
+            "Media A": columnas["media_a"],
+            "IC 95% A inf": columnas["ci_a_inf"],
+            "IC 95% A sup": columnas["ci_a_sup"],
+            "Media B": columnas["media_b"],
+            "IC 95% B inf": columnas["ci_b_inf"],
+            "IC 95% B sup": columnas["ci_b_sup"],
+            "Prob. B > A": columnas["prob_b_mejor"],
+            "Uplift medio": columnas["uplift_media"],
+            "Uplift IC 95% inf": columnas["uplift_ci_inf"],
+            "Uplift IC 95% sup": columnas["uplift_ci_sup"],
+            "Pérdida esperada A": columnas["perdida_a"],
+            "Pérdida esperada B": columnas["perdida_b"],
+            "Valor restante": np.where(np.isnan(columnas["visitas_a"]), np.nan, valor_restante),
+        })
 
     def mostrar_historial_completo(self):
         """
@@ -166,7 +488,7 @@ class CalculadoraConversionesBayesiana:
         for paso in self.historial:
             dia = paso["dia"]
             print(f"\n🗓️  {dia}")
-            print(f"Parámetros Beta actuales:")
+            print("Parámetros Beta actuales:")
             print(f"  Grupo A: alpha={paso['alpha_a']:.1f}, beta={paso['beta_a']:.1f}")
             print(f"  Grupo B: alpha={paso['alpha_b']:.1f}, beta={paso['beta_b']:.1f}")
 
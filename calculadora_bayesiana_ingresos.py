@@ -0,0 +1,397 @@
+# calculadora_bayesiana_ingresos.py
+import numpy as np
+import pandas as pd
+
+from decision import decidir_ganador
+from historial import HistorialCompacto
+from ingesta import (
+    ESTADISTICOS_VALORES,
+    estadisticos_por_dia,
+    estadisticos_valores,
+    series_valores_desde_dataframe,
+)
+from muestreo import (
+    generador_dia,
+    muestrear_normal_inversa_gamma,
+    resumir_comparacion,
+    validar_muestreo,
+)
+
+# Modelo de los valores de cada usuario:
+#   "normal"        Normal con media y varianza desconocidas (prior Normal-Inversa-Gamma):
+#                   la métrica es la media, sin suponer nada de la forma de los valores
+#   "lognormal"     log(valor) Normal (Normal-Inversa-Gamma sobre los log); los ceros
+#                   no cuentan y la métrica es la media exp(mu + sigma² / 2)
+#   "cero_inflado"  P(valor > 0) Beta por un lognormal para los positivos:
+#                   métrica P(valor > 0) * exp(mu + sigma² / 2), p. ej. ingresos por visitante
+DISTRIBUCIONES = ("normal", "lognormal", "cero_inflado")
+
+
+class CalculadoraIngresosBayesiana:
+    """
+    Calculadora bayesiana para métricas continuas >= 0 por usuario (ingresos por
+    visitante, valor del pedido...) en dos grupos A y B.
+
+    Solo usa estadísticos suficientes acumulados (ingesta.ESTADISTICOS_VALORES:
+    usuarios, positivos, suma y suma de cuadrados de los valores y de sus log), así
+    que millones de valores cuestan lo mismo que unos pocos y nunca se guardan.
+    Las posteriores son conjugadas (Normal-Inversa-Gamma y Beta) y la comparación
+    sale de num_samples muestras vectorizadas de la métrica de cada grupo, con el
+    generador sembrado con (semilla, día) como el resto de calculadoras.
+
+    La interfaz sigue a CalculadoraConversionesBayesiana: .actualizar_con_datos(),
+    .actualizar_con_lote(), .historial (compacto, sin muestras),
+    .obtener_muestras(), .detectar_ganador() y .historial_dataframe().
+    """
+
+    # Máximo de muestras por grupo que se generan a la vez al procesar una serie
+    MAX_MUESTRAS_BLOQUE = 4_000_000
+
+    # Estadísticos acumulados de cada grupo (el estado, como alpha/beta en las demás)
+    ACUMULADOS = tuple(
+        f"{estadistico.lower().replace(' ', '_')}_{grupo}"
+        for grupo in ("a", "b") for estadistico in ESTADISTICOS_VALORES
+    )
+
+    # Columnas del historial compacto (un float por día)
+    COLUMNAS_HISTORIAL = ACUMULADOS + (
+        "media_a", "ci_a_inf", "ci_a_sup", "media_b", "ci_b_inf", "ci_b_sup",
+        "prob_b_mejor", "mejora_relativa", "uplift_media", "uplift_std", "uplift_ci_inf", "uplift_ci_sup",
+        "perdida_a", "perdida_b", "valor_restante",
+    )
+
+    def __init__(self, distribucion="normal", mu_prior=0.0, kappa_prior=0.01, alpha_prior=1.0,
+                 beta_prior=1.0, alpha_positivos=1.0, beta_positivos=1.0, num_samples=100_000,
+                 semilla=None, generador="pcg64", esquema="aleatorio"):
+        if distribucion not in DISTRIBUCIONES:
+            raise ValueError(f"distribucion debe ser una de {DISTRIBUCIONES}, no {distribucion!r}")
+        validar_muestreo(generador, esquema)
+        self.distribucion = distribucion
+        self.generador = generador
+        self.esquema = esquema
+        self.num_samples = num_samples
+        # Normal-Inversa-Gamma (de los valores o de sus log) y Beta de P(valor > 0)
+        self.priors = (mu_prior, kappa_prior, alpha_prior, beta_prior, alpha_positivos, beta_positivos)
+
+        # Las muestras de cada día salen de un generador sembrado con (semilla, día),
+        # así se pueden regenerar idénticas cuando no se guardan
+        self.semilla = np.random.SeedSequence().entropy if semilla is None else semilla
+
+        # Estadísticos acumulados de A y B (fila 0 y 1, columnas ESTADISTICOS_VALORES)
+        self.acumulados = np.zeros((2, len(ESTADISTICOS_VALORES)))
+
+        # El historial siempre está entero en memoria (no se restaura desde un almacén)
+        self.pasos_previos = 0
+        self.historial_compacto = True
+
+        self.historial = HistorialCompacto(self.COLUMNAS_HISTORIAL, self._paso_desde_fila)
+        self.historial.agregar("A priori", **dict.fromkeys(self.ACUMULADOS, 0.0))
+
+    def actualizar_con_datos(self, valores_a, valores_b, dia=None):
+        """
+        Añade un día a partir de los valores de cada usuario de A y de B (arrays).
+        """
+        self.procesar_serie([estadisticos_valores(valores_a)], [estadisticos_valores(valores_b)], dias=[dia])
+
+    def actualizar_con_lote(self, df, progreso=None):
+        """
+        Procesa de una vez un DataFrame con una fila por usuario (Día, Grupo, Valor)
+        o con una fila por día y sus estadísticos (ingesta.leer_valores).
+        """
+        if 'Valor' in df.columns:
+            df = estadisticos_por_dia(df)
+        dias, estadisticos_a, estadisticos_b = series_valores_desde_dataframe(df)
+        self.procesar_serie(estadisticos_a, estadisticos_b, dias=dias, progreso=progreso)
+
+    def procesar_serie(self, estadisticos_a, estadisticos_b, dias=None, progreso=None):
+        """
+        Añade una serie de días: estadisticos_a y estadisticos_b son arrays (dias, 6)
+        con los estadísticos de cada día (ESTADISTICOS_VALORES). Los acumulados de
+        todos los días salen de np.cumsum y los resúmenes se calculan por bloques
+        de días. progreso(hechos, total) se llama al terminar cada bloque.
+        """
+        estadisticos = np.stack([np.asarray(estadisticos_a, dtype=float).reshape(-1, len(ESTADISTICOS_VALORES)),
+                                 np.asarray(estadisticos_b, dtype=float).reshape(-1, len(ESTADISTICOS_VALORES))],
+                                axis=1)
+        n_dias = len(estadisticos)
+        if n_dias == 0:
+            return
+
+        n_previos = len(self.historial)
+        if dias is None:
+            dias = [None] * n_dias
+        dias = [dia or f"Día {n_previos + i}" for i, dia in enumerate(dias)]
+
+        # Acumulados de todos los días, (dias, 2, 6)
+        acumulados = self.acumulados + np.cumsum(estadisticos, axis=0)
+
+        # Bloques de días para acotar la memoria del muestreo (dias x num_samples)
+        tam_bloque = max(1, self.MAX_MUESTRAS_BLOQUE // self.num_samples)
+        for inicio in range(0, n_dias, tam_bloque):
+            bloque = slice(inicio, min(inicio + tam_bloque, n_dias))
+            muestras = np.stack([
+                self._muestrear_dia(n_previos + i, acumulados[i]) for i in range(bloque.start, bloque.stop)
+            ])
+            muestras_a, muestras_b = muestras[:, 0], muestras[:, 1]
+            comparacion = resumir_comparacion(muestras_a, muestras_b)
+            ci_a = np.percentile(muestras_a, [2.5, 97.5], axis=1)
+            ci_b = np.percentile(muestras_b, [2.5, 97.5], axis=1)
+            columnas = dict(zip(self.ACUMULADOS, acumulados[bloque].reshape(-1, len(self.ACUMULADOS)).T))
+            columnas.update({
+                "media_a": muestras_a.mean(axis=1),
+                "ci_a_inf": ci_a[0],
+                "ci_a_sup": ci_a[1],
+                "media_b": muestras_b.mean(axis=1),
+                "ci_b_inf": ci_b[0],
+                "ci_b_sup": ci_b[1],
+                "prob_b_mejor": comparacion["prob_b_mejor"],
+                "mejora_relativa": comparacion["mejora_relativa"],
+                "uplift_media": comparacion["uplift"]["media"],
+                "uplift_std": comparacion["uplift"]["std"],
+                "uplift_ci_inf": comparacion["uplift"]["ic_95"][:, 0],
+                "uplift_ci_sup": comparacion["uplift"]["ic_95"][:, 1],
+                "perdida_a": comparacion["perdida_a"],
+                "perdida_b": comparacion["perdida_b"],
+                "valor_restante": comparacion["valor_restante"],
+            })
+            self.historial.extender(dias[bloque], columnas)
+
+            if progreso is not None:
+                progreso(bloque.stop, n_dias)
+
+        self.acumulados = acumulados[-1]
+
+    def posteriores(self, acumulados=None):
+        """
+        Parámetros posteriores de A y B (arrays de 2) a partir de sus estadísticos
+        acumulados (por defecto, los actuales): mu, kappa, alpha y beta de la
+        Normal-Inversa-Gamma y alpha_positivos, beta_positivos de P(valor > 0).
+        """
+        if acumulados is None:
+            acumulados = self.acumulados
+        usuarios, positivos, suma, suma_cuadrados, suma_log, suma_log_cuadrados = np.moveaxis(acumulados, -1, 0)
+        mu_0, kappa_0, alpha_0, beta_0, alpha_positivos, beta_positivos = self.priors
+        if self.distribucion == "normal":
+            n, s1, s2 = usuarios, suma, suma_cuadrados
+        else:
+            n, s1, s2 = positivos, suma_log, suma_log_cuadrados
+
+        kappa = kappa_0 + n
+        mu = (kappa_0 * mu_0 + s1) / kappa
+        # beta_0 + (suma de cuadrados centrada + término del prior) / 2
+        beta = beta_0 + 0.5 * (s2 + kappa_0 * mu_0 ** 2 - kappa * mu ** 2)
+        return {
+            "mu": mu,
+            "kappa": kappa,
+            "alpha": alpha_0 + n / 2,
+            "beta": np.maximum(beta, beta_0),
+            "alpha_positivos": alpha_positivos + positivos,
+            "beta_positivos": beta_positivos + usuarios - positivos,
+        }
+
+    def _muestrear_dia(self, indice, acumulados):
+        """
+        num_samples muestras de la métrica de A y B (array (2, num_samples)) con los
+        estadísticos acumulados de un día (2, 6).
+        """
+        rng = generador_dia(self.semilla, indice, self.generador)
+        post = self.posteriores(acumulados)
+        positivos = ((post["alpha_positivos"], post["beta_positivos"]) if self.distribucion == "cero_inflado"
+                     else (None, None))
+        media, varianza, prob_positivo = muestrear_normal_inversa_gamma(
+            post["mu"], post["kappa"], post["alpha"], post["beta"], self.num_samples, rng, self.esquema, *positivos
+        )
+        if self.distribucion == "normal":
+            return media
+        with np.errstate(over="ignore"):
+            valor = np.exp(media + varianza / 2)
+        if self.distribucion == "cero_inflado":
+            valor = prob_positivo * valor
+        return valor
+
+    def obtener_muestras(self, indice):
+        """
+        Muestras posteriores de la métrica en el paso `indice` del historial,
+        regeneradas con el generador sembrado de ese día: {"A", "B", "diff", "uplift"}.
+        """
+        paso = self.historial[indice]
+        if "comparacion" not in paso:
+            return None
+        indice = indice % len(self.historial)
+        acumulados = np.array([[paso["acumulados"][grupo][estadistico] for estadistico in ESTADISTICOS_VALORES]
+                               for grupo in ("A", "B")])
+        muestras_a, muestras_b = self._muestrear_dia(indice, acumulados)
+        diff = muestras_b - muestras_a
+        with np.errstate(divide="ignore", invalid="ignore"):
+            uplift = np.where(muestras_a != 0, diff / muestras_a, np.nan)
+        return {"A": muestras_a, "B": muestras_b, "diff": diff, "uplift": uplift}
+
+    def _paso_desde_fila(self, dia, fila):
+        """
+        Construye el dict de un paso a partir de sus valores escalares del historial.
+        """
+        paso = {
+            "dia": dia,
+            "acumulados": {
+                grupo: {
+                    estadistico: fila[f"{estadistico.lower().replace(' ', '_')}_{grupo.lower()}"]
+                    for estadistico in ESTADISTICOS_VALORES
+                }
+                for grupo in ("A", "B")
+            },
+        }
+        if np.isnan(fila["prob_b_mejor"]):
+            return paso  # Paso "A priori"
+
+        paso["posterior"] = {
+            "A": {
+                "media": fila["media_a"],
+                "ci": np.array([fila["ci_a_inf"], fila["ci_a_sup"]]),
+            },
+            "B": {
+                "media": fila["media_b"],
+                "ci": np.array([fila["ci_b_inf"], fila["ci_b_sup"]]),
+            },
+        }
+        paso["comparacion"] = {
+            "prob_b_mejor": fila["prob_b_mejor"],
+            "mejora_relativa": fila["mejora_relativa"],
+            "uplift_media": fila["uplift_media"],
+            "uplift_std": fila["uplift_std"],
+            "uplift_ci": np.array([fila["uplift_ci_inf"], fila["uplift_ci_sup"]]),
+            "perdida_esperada": {
+                "A": fila["perdida_a"],
+                "B": fila["perdida_b"],
+            },
+            "valor_restante": fila["valor_restante"],
+        }
+        return paso
+
+    def resumen_decision(self):
+        """
+        Lo que necesita la regla de decisión (decision.decidir_ganador) del último
+        paso: prob_b_mejor, mejora_relativa (de las medias), perdida_a, perdida_b
+        (en unidades de la métrica) y valor_restante. None si todavía no hay datos.
+        """
+        if len(self.historial) < 2:
+            return None
+        comp = self.historial[-1]["comparacion"]
+        return {
+            "prob_b_mejor": comp["prob_b_mejor"],
+            "mejora_relativa": comp["mejora_relativa"],
+            "perdida_a": comp["perdida_esperada"]["A"],
+            "perdida_b": comp["perdida_esperada"]["B"],
+            "valor_restante": comp["valor_restante"],
+        }
+
+    def detectar_ganador(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01,
+                         criterio="probabilidad", umbral_perdida=0.001, umbral_valor_restante=0.01):
+        """
+        Misma estructura que CalculadoraConversionesBayesiana.detectar_ganador.
+        Con criterio="perdida_esperada", umbral_perdida va en unidades de la
+        métrica (p. ej. euros por visitante).
+        """
+        if len(self.historial) < 2:
+            return {
+                "ganador": None,
+                "decision": "Continuar prueba",
+                "razon": "No hay datos suficientes para declarar un ganador",
+                "probabilidad_b_mejor": None,
+                "mejora_relativa": None
+            }
+
+        return decidir_ganador(self.resumen_decision(), umbral_probabilidad, umbral_mejora_minima,
+                               criterio, umbral_perdida, umbral_valor_restante)
+
+    def resumen_secuencial(self):
+        """
+        Resúmenes acumulados de cada día con datos para un DisenoSecuencial: diferencia
+        de medias observadas B - A (de los positivos con "lognormal"), su error
+        estándar a partir de las sumas de cuadrados y pérdidas esperadas.
+        Devuelve también la mirada del primer día ("primera_mirada").
+        """
+        columnas = {nombre: self.historial.columna(nombre)[1:] for nombre in self.COLUMNAS_HISTORIAL}
+        medias, varianzas = [], []
+        for grupo in ("a", "b"):
+            n = columnas[f"{'positivos' if self.distribucion == 'lognormal' else 'usuarios'}_{grupo}"]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                media = columnas[f"suma_{grupo}"] / n
+                varianza = (columnas[f"suma_cuadrados_{grupo}"] - n * media ** 2) / (n - 1)
+            medias.append(media)
+            varianzas.append(np.maximum(varianza, 0.0) / n)
+        return {
+            "diferencia": medias[1] - medias[0],
+            "error_estandar": np.sqrt(varianzas[0] + varianzas[1]),
+            "perdida_a": columnas["perdida_a"],
+            "perdida_b": columnas["perdida_b"],
+            "primera_mirada": 1,
+        }
+
+    def evaluar_secuencial(self, diseno):
+        """
+        Aplica un DisenoSecuencial (secuencial.py) a todos los días procesados:
+        cada día es una mirada.
+        """
+        resumenes = self.resumen_secuencial()
+        return diseno.evaluar_serie(resumenes, primera_mirada=resumenes.pop("primera_mirada"))
+
+    def historial_dataframe(self):
+        """
+        Una fila por paso: usuarios, positivos y media observada del día en cada
+        grupo, media e IC 95% posteriores de la métrica, probabilidad de que B sea
+        mejor, uplift, pérdida esperada y valor restante.
+        """
+        columnas = {nombre: self.historial.columna(nombre) for nombre in self.COLUMNAS_HISTORIAL}
+        filas = {}
+        for grupo in ("a", "b"):
+            # Los datos del día son la diferencia entre acumulados consecutivos
+            usuarios = np.diff(columnas[f"usuarios_{grupo}"], prepend=np.nan)
+            suma = np.diff(columnas[f"suma_{grupo}"], prepend=np.nan)
+            filas[f"Usuarios {grupo.upper()}"] = usuarios
+            filas[f"Positivos {grupo.upper()}"] = np.diff(columnas[f"positivos_{grupo}"], prepend=np.nan)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                filas[f"Media del día {grupo.upper()}"] = suma / usuarios
+        return pd.DataFrame({
+            "Día": self.historial.dias,
+            **filas,
+            "Media A": columnas["media_a"],
+            "IC 95% A inf": columnas["ci_a_inf"],
+            "IC 95% A sup": columnas["ci_a_sup"],
+            "Media B": columnas["media_b"],
+            "IC 95% B inf": columnas["ci_b_inf"],
+            "IC 95% B sup": columnas["ci_b_sup"],
+            "Prob. B > A": columnas["prob_b_mejor"],
+            "Mejora relativa": columnas["mejora_relativa"],
+            "Uplift medio": columnas["uplift_media"],
+            "Uplift IC 95% inf": columnas["uplift_ci_inf"],
+            "Uplift IC 95% sup": columnas["uplift_ci_sup"],
+            "Pérdida esperada A": columnas["perdida_a"],
+            "Pérdida esperada B": columnas["perdida_b"],
+            "Valor restante": columnas["valor_restante"],
+        })
+
+    def mostrar_historial_completo(self):
+        """
+        Imprime el historial paso a paso (acumulados, posteriores y comparación
+        B vs A), como CalculadoraConversionesBayesiana.mostrar_historial_completo.
+        """
+        for paso in self.historial:
+            print(f"\n🗓️  {paso['dia']}")
+            for grupo in ("A", "B"):
+                acumulados = paso["acumulados"][grupo]
+                print(f"Grupo {grupo}: {acumulados['Usuarios']:.0f} usuarios, "
+                      f"{acumulados['Positivos']:.0f} con valor > 0, suma {acumulados['Suma']:.2f}")
+
+            if "posterior" in paso:
+                for grupo in ("A", "B"):
+                    posterior = paso["posterior"][grupo]
+                    print(f"Posterior Grupo {grupo}:")
+                    print(f"  Media esperada: {posterior['media']:.4f}")
+                    print(f"  IC 95%: [{posterior['ci'][0]:.4f}, {posterior['ci'][1]:.4f}]")
+
+            if "comparacion" in paso:
+                comp = paso["comparacion"]
+                print("Comparación B vs A:")
+                print(f"  Uplift medio: {comp['uplift_media']:.4f}")
+                print(f"  IC 95% uplift: [{comp['uplift_ci'][0]:.4f}, {comp['uplift_ci'][1]:.4f}]")
+                print(f"  Probabilidad de que B > A: {comp['prob_b_mejor']:.2%}")
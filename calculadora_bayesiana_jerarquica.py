@@ -0,0 +1,297 @@
+# calculadora_bayesiana_jerarquica.py
+#
+# Modelo jerárquico sobre los segmentos de un CSV en formato largo (país,
+# dispositivo...). En vez de un prior fijo por segmento, las tasas de cada grupo
+# salen de una distribución poblacional común cuyos parámetros también se estiman:
+#
+#   beta_binomial   tasa_s ~ Beta(media * k, (1 - media) * k),  conv_s ~ Binomial(visitas_s, tasa_s)
+#   gamma_poisson   tasa_s ~ Gamma(k, k / media),               clicks_s ~ Poisson(visitas_s * tasa_s)
+#
+# con media ~ Beta(alpha_prior, beta_prior) (o Gamma) y k ~ Pareto(1.5, 1) para cada
+# grupo A y B. Los segmentos con pocos datos se acercan a la media común y los que
+# tienen muchos apenas se mueven.
+#
+# Las tasas de los segmentos se integran analíticamente (BetaBinomial /
+# NegativeBinomial), así que PyMC solo ajusta 4 parámetros por muchos segmentos
+# que haya. Dados (media, k), la posterior de cada segmento vuelve a ser
+# conjugada y sus muestras se sacan con NumPy, una por muestra de (media, k).
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+from analisis_segmentos import preparar_segmentos
+from calculadora_bayesiana import validar_sampler_nuts
+from decision import decidir_arrays, decidir_ganador
+from ingesta import COLUMNAS_CONTEOS
+from muestreo import generador_dia, resumir_comparacion
+
+FAMILIAS_JERARQUICAS = {"beta_binomial": "Jerárquico Beta–Binomial", "gamma_poisson": "Jerárquico Gamma–Poisson"}
+
+# "advi" / "fullrank_advi" (pm.fit) y "pathfinder" (pymc_experimental) son
+# aproximaciones variacionales de unos segundos; "nuts" es el ajuste exacto
+INFERENCIAS = ("advi", "fullrank_advi", "pathfinder", "nuts")
+
+
+class CalculadoraJerarquicaBayesiana:
+    """
+    Calculadora jerárquica Beta-Binomial o Gamma-Poisson para todos los segmentos
+    (combinaciones de las columnas `claves`) de un experimento A/B.
+
+    Cada actualizar_con_lote(df) suma los conteos del lote a los acumulados de
+    cada segmento, reajusta el modelo con todos ellos y añade un paso al historial.
+    Con "Día" entre las claves cada día de cada segmento es una unidad más, así
+    que la tasa puede variar de un día a otro alrededor de la media común.
+
+    inferencia="advi" (por defecto), "fullrank_advi" o "pathfinder" aproximan la
+    posterior en unos segundos; "nuts" la muestrea con PyMC (`cadenas`, `nucleos`,
+    `sampler_nuts` como en CalculadoraClicksBayesiana), bastante más lento.
+
+    La interfaz sigue a las demás calculadoras: .historial, .resumen_decision(),
+    .detectar_ganador() y .historial_dataframe(), para la media poblacional o
+    para un segmento concreto; segmentos_dataframe() da la tabla de
+    analisis_segmentos.analizar_segmentos con este modelo.
+    """
+
+    def __init__(self, claves, familia="beta_binomial", inferencia="advi", alpha_prior=1, beta_prior=1,
+                 num_samples=4000, iteraciones=10_000, semilla=None, cadenas=2, nucleos=1,
+                 sampler_nuts="pymc"):
+        if familia not in FAMILIAS_JERARQUICAS:
+            raise ValueError(f"familia debe ser una de {tuple(FAMILIAS_JERARQUICAS)}, no {familia!r}")
+        if inferencia not in INFERENCIAS:
+            raise ValueError(f"inferencia debe ser una de {INFERENCIAS}, no {inferencia!r}")
+        if inferencia == "pathfinder" and find_spec("pymc_experimental") is None:
+            raise ValueError("inferencia='pathfinder' necesita tener instalado el paquete pymc_experimental")
+        validar_sampler_nuts(sampler_nuts)
+        self.claves = [claves] if isinstance(claves, str) else list(claves)
+        self.familia = familia
+        self.inferencia = inferencia
+        self.priors = (alpha_prior, beta_prior)
+        self.num_samples = num_samples
+        self.iteraciones = iteraciones
+        self.cadenas = cadenas
+        self.nucleos = nucleos
+        self.sampler_nuts = sampler_nuts
+        self.semilla = np.random.SeedSequence().entropy if semilla is None else semilla
+        # Conteos acumulados por segmento (preparar_segmentos)
+        self.totales = None
+        self.historial = []
+
+    def _modelo(self, conversiones, visitas):
+        """
+        Modelo PyMC con las tasas de los segmentos integradas: conversiones y
+        visitas son arrays (segmentos, 2) con las columnas A y B.
+        """
+        import pymc as pm
+
+        alpha_prior, beta_prior = self.priors
+        with pm.Model() as modelo:
+            concentracion = pm.Pareto('concentracion', alpha=1.5, m=1, shape=2)
+            if self.familia == "beta_binomial":
+                media = pm.Beta('media', alpha=alpha_prior, beta=beta_prior, shape=2)
+                pm.BetaBinomial('obs', n=visitas, alpha=media * concentracion,
+                                beta=(1 - media) * concentracion, observed=conversiones)
+            else:
+                media = pm.Gamma('media', alpha=alpha_prior, beta=beta_prior, shape=2)
+                # Poisson con tasa Gamma(k, k / media) => binomial negativa de media visitas * media
+                pm.NegativeBinomial('obs', mu=visitas * media, alpha=concentracion, observed=conversiones)
+        return modelo
+
+    def _ajustar(self, modelo, rng, progreso=None):
+        """
+        Muestras de (media, concentracion), arrays (num_samples, 2), con la
+        inferencia elegida.
+        """
+        import pymc as pm
+
+        with modelo:
+            if self.inferencia == "nuts":
+                trace = pm.sample(-(-self.num_samples // self.cadenas), tune=1000, chains=self.cadenas,
+                                  cores=self.nucleos, progressbar=False, random_seed=rng,
+                                  compute_convergence_checks=False, nuts_sampler=self.sampler_nuts)
+            elif self.inferencia == "pathfinder":
+                import pymc_experimental as pmx
+
+                trace = pmx.fit(method="pathfinder", samples=self.num_samples,
+                                random_seed=int(rng.integers(2**31)))
+            else:
+                callbacks = []
+                if progreso is not None:
+                    callbacks.append(lambda aproximacion, perdidas, i: (
+                        progreso(i, self.iteraciones) if i % 500 == 0 else None
+                    ))
+                # Con el paso por defecto (1e-3) la concentración tarda decenas de
+                # miles de iteraciones en llegar a su sitio; con 0.05 bastan unos miles
+                aproximacion = pm.fit(self.iteraciones, method=self.inferencia,
+                                      obj_optimizer=pm.adam(learning_rate=0.05), callbacks=callbacks,
+                                      random_seed=int(rng.integers(2**31)), progressbar=False)
+                trace = aproximacion.sample(self.num_samples, random_seed=int(rng.integers(2**31)))
+
+        posterior = trace.posterior
+        return (posterior['media'].values.reshape(-1, 2)[:self.num_samples],
+                posterior['concentracion'].values.reshape(-1, 2)[:self.num_samples])
+
+    def _muestrear_segmentos(self, rng, conversiones, visitas, media, concentracion):
+        """
+        Una muestra de la tasa de cada segmento por muestra de (media, concentracion),
+        de su posterior conjugada condicionada: array (segmentos, 2, num_samples).
+        """
+        conversiones = conversiones[..., np.newaxis]
+        visitas = visitas[..., np.newaxis]
+        media = media.T[np.newaxis]
+        concentracion = concentracion.T[np.newaxis]
+        if self.familia == "beta_binomial":
+            return rng.beta(media * concentracion + conversiones,
+                            (1 - media) * concentracion + visitas - conversiones)
+        return rng.gamma(concentracion + conversiones, 1 / (concentracion / media + visitas))
+
+    def actualizar_con_lote(self, df, progreso=None):
+        """
+        Suma un DataFrame en formato largo (columnas de conteos más las claves,
+        ver analisis_segmentos.preparar_segmentos) a los conteos de cada segmento
+        y reajusta el modelo. progreso(hechos, total) se llama durante el ajuste
+        variacional (en iteraciones).
+        """
+        nuevos = preparar_segmentos(df, self.claves)
+        if self.totales is not None:
+            nuevos = (pd.concat([self.totales, nuevos], ignore_index=True)
+                      .groupby(self.claves, sort=True, observed=True, as_index=False).sum())
+        self.totales = nuevos
+
+        conv_a, visitas_a, conv_b, visitas_b = (nuevos[c].to_numpy(dtype=np.int64) for c in COLUMNAS_CONTEOS)
+        conversiones = np.column_stack([conv_a, conv_b])
+        visitas = np.column_stack([visitas_a, visitas_b])
+
+        rng = generador_dia(self.semilla, len(self.historial))
+        media, concentracion = self._ajustar(self._modelo(conversiones, visitas), rng, progreso)
+        tasas = self._muestrear_segmentos(rng, conversiones, visitas, media, concentracion)
+
+        if "Día" in df.columns and len(df):
+            dia = str(df["Día"].iloc[-1])
+        else:
+            dia = f"Ajuste {len(self.historial) + 1}"
+        self.historial.append({
+            "dia": dia,
+            "datos": {
+                "conversiones_a": int(conv_a.sum()),
+                "visitas_a": int(visitas_a.sum()),
+                "conversiones_b": int(conv_b.sum()),
+                "visitas_b": int(visitas_b.sum()),
+                "segmentos": len(nuevos),
+            },
+            "hiperparametros": {
+                "media_a": float(media[:, 0].mean()),
+                "media_b": float(media[:, 1].mean()),
+                "concentracion_a": float(concentracion[:, 0].mean()),
+                "concentracion_b": float(concentracion[:, 1].mean()),
+            },
+            # Comparación de las medias poblacionales y de cada segmento
+            "poblacion": resumir_comparacion(media[:, 0], media[:, 1]),
+            "segmentos": resumir_comparacion(tasas[:, 0], tasas[:, 1]),
+            "tasas": tasas.mean(axis=-1),
+        })
+        if progreso is not None:
+            progreso(1, 1)
+
+    def _indice_segmento(self, segmento):
+        claves = segmento if isinstance(segmento, tuple) else (segmento,)
+        if len(claves) != len(self.claves):
+            raise ValueError(f"El segmento debe dar un valor por clave ({', '.join(self.claves)})")
+        coincide = np.ones(len(self.totales), dtype=bool)
+        for clave, valor in zip(self.claves, claves):
+            coincide &= (self.totales[clave] == valor).to_numpy()
+        if not coincide.any():
+            raise KeyError(f"Segmento desconocido {segmento!r}")
+        return int(np.argmax(coincide))
+
+    def resumen_decision(self, segmento=None):
+        """
+        prob_b_mejor, mejora_relativa, perdida_a, perdida_b y valor_restante del
+        último ajuste: de las medias poblacionales o, con segmento (un valor o una
+        tupla con uno por clave), de ese segmento. None si todavía no hay datos.
+        """
+        if not self.historial:
+            return None
+        ultimo = self.historial[-1]
+        if segmento is None:
+            resumen = ultimo["poblacion"]
+            indice = ()
+        else:
+            resumen = ultimo["segmentos"]
+            indice = self._indice_segmento(segmento)
+        return {
+            clave: float(resumen[clave][indice])
+            for clave in ("prob_b_mejor", "mejora_relativa", "perdida_a", "perdida_b", "valor_restante")
+        }
+
+    def detectar_ganador(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01,
+                         criterio="probabilidad", umbral_perdida=0.001, umbral_valor_restante=0.01,
+                         segmento=None):
+        """
+        criterio: "probabilidad" (por defecto), "perdida_esperada" o "valor_restante";
+        ver decision.decidir_ganador. Sin segmento decide sobre las medias poblacionales.
+        """
+        if not self.historial:
+            return {
+                "ganador": None,
+                "decision": "Continuar prueba",
+                "razon": "No hay datos suficientes"
+            }
+
+        return decidir_ganador(self.resumen_decision(segmento), umbral_probabilidad, umbral_mejora_minima,
+                               criterio, umbral_perdida, umbral_valor_restante)
+
+    def segmentos_dataframe(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
+        """
+        Resultados del último ajuste por segmento, con las columnas de
+        analisis_segmentos.analizar_segmentos (modelo "Jerárquico ...").
+        """
+        if not self.historial:
+            return None
+        ultimo = self.historial[-1]
+        resumen = ultimo["segmentos"]
+        tabla = self.totales.copy()
+        tabla.insert(len(self.claves), 'modelo', FAMILIAS_JERARQUICAS[self.familia])
+        tabla['tasa_a'] = ultimo["tasas"][:, 0]
+        tabla['tasa_b'] = ultimo["tasas"][:, 1]
+        tabla['prob_b_mejor'] = resumen["prob_b_mejor"]
+        tabla['mejora_relativa'] = resumen["mejora_relativa"]
+        tabla['ic_inf'] = resumen["uplift"]["ic_95"][:, 0]
+        tabla['ic_sup'] = resumen["uplift"]["ic_95"][:, 1]
+        tabla['perdida_a'] = resumen["perdida_a"]
+        tabla['perdida_b'] = resumen["perdida_b"]
+        tabla['valor_restante'] = resumen["valor_restante"]
+        tabla['ganador'] = decidir_arrays(resumen["prob_b_mejor"], resumen["mejora_relativa"],
+                                          umbral_probabilidad, umbral_mejora_minima)
+        return tabla
+
+    def historial_dataframe(self):
+        """
+        Una fila por ajuste con los totales, los hiperparámetros y la comparación
+        de las medias poblacionales.
+        """
+        filas = []
+        for paso in self.historial:
+            datos = paso["datos"]
+            hiper = paso["hiperparametros"]
+            poblacion = paso["poblacion"]
+            filas.append({
+                'Día': paso["dia"],
+                'Segmentos': datos["segmentos"],
+                'Conversiones A': datos["conversiones_a"],
+                'Visitas A': datos["visitas_a"],
+                'Conversiones B': datos["conversiones_b"],
+                'Visitas B': datos["visitas_b"],
+                'Media A': hiper["media_a"],
+                'Media B': hiper["media_b"],
+                'Concentración A': hiper["concentracion_a"],
+                'Concentración B': hiper["concentracion_b"],
+                'Prob. B > A': poblacion["prob_b_mejor"],
+                'Uplift medio': poblacion["uplift"]["media"],
+                'Uplift IC 95% inf': poblacion["uplift"]["ic_95"][0],
+                'Uplift IC 95% sup': poblacion["uplift"]["ic_95"][1],
+                'Pérdida esperada A': poblacion["perdida_a"],
+                'Pérdida esperada B': poblacion["perdida_b"],
+                'Valor restante': poblacion["valor_restante"],
+            })
+        return pd.DataFrame(filas)
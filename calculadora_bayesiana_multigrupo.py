@@ -0,0 +1,276 @@
+# calculadora_bayesiana_multigrupo.py
+import numpy as np
+import pandas as pd
+
+from decision import decidir_ganador_multigrupo
+from ingesta import series_multigrupo_desde_dataframe
+from muestreo import generador_dia, muestrear_posteriores, validar_muestreo
+from posteriores_conjugadas import comparar_grupos, resumen_uplift_beta, resumen_uplift_gamma
+
+METODOS = ("muestreo", "exacto")
+
+
+def comparar_muestras(muestras):
+    """
+    Los mismos resúmenes que posteriores_conjugadas.comparar_grupos, sacados de
+    una única matriz de muestras (grupos x muestras).
+    """
+    k, n = muestras.shape
+    prob_mayor = np.mean(muestras[:, np.newaxis, :] > muestras[np.newaxis, :, :], axis=-1)
+    np.fill_diagonal(prob_mayor, np.nan)
+    return {
+        "media": muestras.mean(axis=1),
+        "prob_mejor": np.bincount(np.argmax(muestras, axis=0), minlength=k) / n,
+        "prob_mayor": prob_mayor,
+        "perdida": np.mean(muestras.max(axis=0) - muestras, axis=1),
+    }
+
+
+class _CalculadoraMultiGrupo:
+    """
+    Base de las calculadoras bayesianas con N grupos (A/B/C/...), el primero de
+    ellos el control. Los parámetros posteriores son arrays con un valor por grupo
+    (self.alpha, self.beta) y cada paso del historial guarda los de ese día junto
+    con P(cada grupo es el mejor), la matriz P(fila > columna) y la pérdida
+    esperada de elegir cada grupo.
+
+    - metodo="exacto": integración numérica (comparar_grupos), vectorizada sobre
+      todos los días de una serie
+    - metodo="muestreo": una única matriz (grupos x num_samples) por día, de un
+      generador sembrado con (semilla, día) como en las calculadoras A/B, con el
+      generador y el esquema ("aleatorio", "antitetico", "sobol") de muestreo.py
+    """
+
+    FAMILIA = None
+
+    def __init__(self, grupos=("A", "B", "C"), alpha_prior=1, beta_prior=1,
+                 num_samples=100_000, metodo="exacto", semilla=None,
+                 generador="pcg64", esquema="aleatorio"):
+        if metodo not in METODOS:
+            raise ValueError(f"metodo debe ser uno de {METODOS}, no {metodo!r}")
+        validar_muestreo(generador, esquema)
+        self.generador = generador
+        self.esquema = esquema
+        self.grupos = list(grupos)
+        if len(self.grupos) < 2:
+            raise ValueError("Hacen falta al menos dos grupos")
+        self.metodo = metodo
+        self.num_samples = num_samples
+        self.semilla = np.random.SeedSequence().entropy if semilla is None else semilla
+
+        # Priors (un valor común o uno por grupo)
+        k = len(self.grupos)
+        self.alpha = np.broadcast_to(np.asarray(alpha_prior, dtype=float), (k,)).copy()
+        self.beta = np.broadcast_to(np.asarray(beta_prior, dtype=float), (k,)).copy()
+        self.priors = (self.alpha.copy(), self.beta.copy())
+
+        self.historial = [{"dia": "A priori", "alpha": self.alpha.copy(), "beta": self.beta.copy()}]
+
+    def _incrementos(self, conversiones, visitas):
+        """
+        Incrementos de (alpha, beta) que aportan unos conteos.
+        """
+        raise NotImplementedError
+
+    def _muestrear_dia(self, indice, alpha, beta):
+        rng = generador_dia(self.semilla, indice, self.generador)
+        return muestrear_posteriores(self.FAMILIA, alpha, beta, self.num_samples, rng, self.esquema)
+
+    def _resumen_uplift(self, alpha_control, beta_control, alpha, beta):
+        raise NotImplementedError
+
+    def actualizar_con_datos(self, conversiones, visitas, dia=None):
+        """
+        Actualiza los priors con los datos de un día: conversiones y visitas
+        son secuencias con un valor por grupo (en el orden de self.grupos).
+        """
+        self.procesar_serie([conversiones], [visitas], dias=[dia])
+
+    def actualizar_con_lote(self, df, progreso=None):
+        """
+        Procesa de una vez un DataFrame con 'Día' y las columnas
+        'Conversiones X' / 'Visitas X' de cada grupo.
+        """
+        dias, conversiones, visitas = series_multigrupo_desde_dataframe(df, self.grupos)
+        self.procesar_serie(conversiones, visitas, dias=dias, progreso=progreso)
+
+    def procesar_serie(self, conversiones, visitas, dias=None, progreso=None):
+        """
+        Versión vectorizada de actualizar_con_datos: conversiones y visitas son
+        matrices (dias, grupos). Los parámetros de todos los días salen de sumas
+        acumuladas; progreso(hechos, total) se llama al terminar.
+        """
+        conversiones = np.asarray(conversiones, dtype=np.int64).reshape(-1, len(self.grupos))
+        visitas = np.asarray(visitas, dtype=np.int64).reshape(-1, len(self.grupos))
+        if conversiones.shape != visitas.shape:
+            raise ValueError("conversiones y visitas deben tener la misma forma (dias, grupos)")
+        n_dias = len(conversiones)
+        if n_dias == 0:
+            return
+
+        n_previos = len(self.historial)
+        if dias is None:
+            dias = [None] * n_dias
+        dias = [dia or f"Día {n_previos + i}" for i, dia in enumerate(dias)]
+
+        incremento_alpha, incremento_beta = self._incrementos(conversiones, visitas)
+        alpha = self.alpha + np.cumsum(incremento_alpha, axis=0)
+        beta = self.beta + np.cumsum(incremento_beta, axis=0)
+
+        if self.metodo == "exacto":
+            resumen = comparar_grupos(self.FAMILIA, alpha, beta)
+        else:
+            por_dia = [
+                comparar_muestras(self._muestrear_dia(n_previos + i, alpha[i], beta[i]))
+                for i in range(n_dias)
+            ]
+            resumen = {clave: np.stack([r[clave] for r in por_dia]) for clave in por_dia[0]}
+
+        for i, dia in enumerate(dias):
+            self.historial.append({
+                "dia": dia,
+                "alpha": alpha[i],
+                "beta": beta[i],
+                "datos": {"conversiones": conversiones[i], "visitas": visitas[i]},
+                **{clave: valores[i] for clave, valores in resumen.items()},
+            })
+        if progreso is not None:
+            progreso(n_dias, n_dias)
+
+        # Guardamos como nuevos priors para la siguiente iteración
+        self.alpha, self.beta = alpha[-1].copy(), beta[-1].copy()
+
+    def obtener_muestras(self, indice=-1):
+        """
+        Matriz (grupos x num_samples) de muestras posteriores del paso indice,
+        regenerada con el generador sembrado de ese día.
+        """
+        indice = indice % len(self.historial)
+        paso = self.historial[indice]
+        return self._muestrear_dia(indice, paso["alpha"], paso["beta"])
+
+    def resumen_decision(self):
+        """
+        (media, prob_mejor, perdida) por grupo del último paso, o None si
+        todavía no hay datos.
+        """
+        if len(self.historial) < 2:
+            return None
+        ultimo = self.historial[-1]
+        return ultimo["media"], ultimo["prob_mejor"], ultimo["perdida"]
+
+    def detectar_ganador(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01,
+                         criterio="probabilidad", umbral_perdida=0.001):
+        """
+        Ganador entre todos los grupos (ver decision.decidir_ganador_multigrupo):
+        - ganador: nombre del grupo o None
+        - decision, razon
+        - probabilidad (si hay ganador) o probabilidad_mejor (si no), del líder
+        - mejora_relativa del líder sobre el siguiente mejor grupo
+        - lider, prob_mejor ({grupo: P(mejor)}) y perdida_esperada ({grupo: pérdida})
+        """
+        resumen = self.resumen_decision()
+        if resumen is None:
+            return {
+                "ganador": None,
+                "decision": "Continuar prueba",
+                "razon": "No hay datos suficientes para declarar un ganador",
+                "probabilidad_mejor": None,
+                "mejora_relativa": None
+            }
+        media, prob_mejor, perdida = resumen
+        return decidir_ganador_multigrupo(self.grupos, prob_mejor, media, perdida, umbral_probabilidad,
+                                          umbral_mejora_minima, criterio, umbral_perdida)
+
+    def matriz(self, indice=-1):
+        """
+        P(fila > columna) del paso indice como DataFrame (grupos x grupos).
+        """
+        paso = self.historial[indice]
+        if "prob_mayor" not in paso:
+            return None
+        return pd.DataFrame(paso["prob_mayor"], index=self.grupos, columns=self.grupos)
+
+    def grupos_dataframe(self, control=None):
+        """
+        Una fila por grupo con el estado actual: media posterior, probabilidad de ser
+        el mejor, pérdida esperada y, frente al control (por defecto el primer
+        grupo), probabilidad de superarlo y uplift medio con su IC 95%.
+        """
+        if len(self.historial) < 2:
+            return None
+        ultimo = self.historial[-1]
+        i = self.grupos.index(self.grupos[0] if control is None else control)
+
+        if self.metodo == "exacto":
+            uplift = self._resumen_uplift(ultimo["alpha"][i], ultimo["beta"][i], ultimo["alpha"], ultimo["beta"])
+            uplift_media, uplift_ic = uplift["media"], uplift["ic_95"]
+        else:
+            muestras = self.obtener_muestras(-1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                relativo = muestras / muestras[i] - 1
+            uplift_media = np.mean(relativo, axis=1)
+            uplift_ic = np.percentile(relativo, [2.5, 97.5], axis=1).T
+        uplift_media = np.where(np.arange(len(self.grupos)) == i, np.nan, uplift_media)
+        uplift_ic = np.where((np.arange(len(self.grupos)) == i)[:, np.newaxis], np.nan, uplift_ic)
+
+        return pd.DataFrame({
+            "Grupo": self.grupos,
+            "Conversiones": np.sum([p["datos"]["conversiones"] for p in self.historial[1:]], axis=0),
+            "Visitas": np.sum([p["datos"]["visitas"] for p in self.historial[1:]], axis=0),
+            "Media": ultimo["media"],
+            "Prob. mejor": ultimo["prob_mejor"],
+            "Pérdida esperada": ultimo["perdida"],
+            "Prob. > control": ultimo["prob_mayor"][:, i],
+            "Uplift medio": uplift_media,
+            "Uplift IC 95% inf": uplift_ic[:, 0],
+            "Uplift IC 95% sup": uplift_ic[:, 1],
+        })
+
+    def historial_dataframe(self):
+        """
+        Una fila por día con datos: conteos, media y probabilidad de ser el mejor
+        de cada grupo (lo que se dibuja en la evolución).
+        """
+        pasos = self.historial[1:]
+        por_campo = {
+            "Conversiones": [paso["datos"]["conversiones"] for paso in pasos],
+            "Visitas": [paso["datos"]["visitas"] for paso in pasos],
+            "Media": [paso["media"] for paso in pasos],
+            "Prob. mejor": [paso["prob_mejor"] for paso in pasos],
+            "Pérdida esperada": [paso["perdida"] for paso in pasos],
+        }
+        columnas = {"Día": [paso["dia"] for paso in pasos]}
+        for nombre, valores in por_campo.items():
+            valores = np.reshape(valores, (len(pasos), len(self.grupos)))
+            for j, grupo in enumerate(self.grupos):
+                columnas[f"{nombre} {grupo}"] = valores[:, j]
+        return pd.DataFrame(columnas)
+
+
+class CalculadoraConversionesMultiGrupo(_CalculadoraMultiGrupo):
+    """
+    Beta-Binomial con N grupos: conversiones 0/1 sobre visitas.
+    """
+
+    FAMILIA = "beta"
+
+    def _incrementos(self, conversiones, visitas):
+        return conversiones, visitas - conversiones
+
+    def _resumen_uplift(self, alpha_control, beta_control, alpha, beta):
+        return resumen_uplift_beta(np.full_like(alpha, alpha_control), np.full_like(beta, beta_control), alpha, beta)
+
+
+class CalculadoraClicksMultiGrupo(_CalculadoraMultiGrupo):
+    """
+    Gamma-Poisson con N grupos: clicks (conteos sin tope) por visita.
+    """
+
+    FAMILIA = "gamma"
+
+    def _incrementos(self, conversiones, visitas):
+        return conversiones, visitas
+
+    def _resumen_uplift(self, alpha_control, beta_control, alpha, beta):
+        return resumen_uplift_gamma(alpha_control, beta_control, alpha, beta)
@@ -1,13 +1,86 @@
 # calculadora_frecuentista.py
+from collections.abc import Mapping
+
 import numpy as np
-from itertools import combinations
-from collections import defaultdict
+import pandas as pd
 from scipy.stats import norm  # IMPORTANTE
 
+
+def comparar_proporciones(visitas_1, conv_1, visitas_2, conv_2):
+    """
+    Test z de dos proporciones (g1 vs g2), vectorizado: acepta escalares o arrays
+    que se combinan por broadcasting (por ejemplo, columna contra fila para obtener
+    todas las parejas, o dos vectores paralelos para muchos segmentos A/B).
+    """
+    visitas_1 = np.asarray(visitas_1, dtype=float)
+    visitas_2 = np.asarray(visitas_2, dtype=float)
+    z_score = norm.ppf(0.975)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p1 = np.where(visitas_1 > 0, np.asarray(conv_1, dtype=float) / visitas_1, 0.0)
+        p2 = np.where(visitas_2 > 0, np.asarray(conv_2, dtype=float) / visitas_2, 0.0)
+        # Sin visitas la varianza es infinita (z = 0, probabilidad 0.5)
+        var_1 = np.where(visitas_1 > 0, p1 * (1 - p1) / visitas_1, np.inf)
+        var_2 = np.where(visitas_2 > 0, p2 * (1 - p2) / visitas_2, np.inf)
+
+        diff_prop = p1 - p2
+        se_diff = np.sqrt(var_1 + var_2)
+        z_diff = np.where(se_diff > 0, diff_prop / se_diff, np.nan)
+        uplift_mean = np.where(p2 > 0, diff_prop / p2, np.inf)
+
+    # Probabilidad de que g1 sea mejor que g2 (0.5 si no hay varianza):
+    # Phi(z) con z = (p1 - p2) / se, que crece cuando g1 convierte más
+    prob_g1_mejor = np.where(np.isnan(z_diff), 0.5, norm.cdf(z_diff))
+    p_valor = np.where(np.isnan(z_diff), 1.0, 2 * norm.sf(np.abs(z_diff)))
+
+    return {
+        'diff_mean': diff_prop,
+        'se_diff': se_diff,
+        'z': z_diff,
+        'p_valor': p_valor,
+        'prob_g1_mejor': prob_g1_mejor,
+        'uplift_mean': uplift_mean,
+        'ci_diff_inf': diff_prop - z_score * se_diff,
+        'ci_diff_sup': diff_prop + z_score * se_diff,
+    }
+
+
+class _ComparacionesPerezosas(Mapping):
+    """
+    Vista de compatibilidad {"A_vs_B": {...}} sobre las matrices K x K.
+    Los dicts de cada pareja solo se construyen la primera vez que se accede.
+    """
+
+    def __init__(self, calculadora):
+        self._calculadora = calculadora
+        self._dict = None
+
+    def _construir(self):
+        if self._dict is None:
+            self._dict = self._calculadora._comparaciones_como_dict()
+        return self._dict
+
+    def __getitem__(self, clave):
+        return self._construir()[clave]
+
+    def __iter__(self):
+        return iter(self._construir())
+
+    def __len__(self):
+        k = len(self._calculadora.matrices['grupos'])
+        return k * (k - 1)
+
+
 class ConversionFrecuentistaMultiGrupo:
-    def __init__(self):
+    # Matrices K x K que se calculan en analizar_arrays (fila = g1, columna = g2)
+    MATRICES = ('diff_mean', 'se_diff', 'z', 'p_valor', 'prob_g1_mejor',
+                'uplift_mean', 'ci_diff_inf', 'ci_diff_sup')
+
+    def __init__(self, umbral_probabilidad=0.95):
+        self.umbral_probabilidad = umbral_probabilidad
         # Aquí guardaremos todo lo que luego pintará la interfaz
         self.resultados = {}
+        self.matrices = {}
 
     def analizar_datos(self, datos_totales):
         """
@@ -20,119 +93,178 @@ class ConversionFrecuentistaMultiGrupo:
         }
         """
         grupos = list(datos_totales.keys())
-        self.resultados['grupos'] = {}
+        self.analizar_arrays(
+            grupos,
+            [datos_totales[grupo]['visitas'] for grupo in grupos],
+            [datos_totales[grupo]['conv'] for grupo in grupos],
+        )
 
+    def analizar_arrays(self, grupos, visitas, conversiones):
+        """
+        Igual que analizar_datos pero con arrays paralelos. Todas las comparaciones
+        por parejas (z, IC, p-valores...) se calculan de una vez como matrices K x K
+        en self.matrices; resultados['comparaciones'] se construye solo si se pide.
+        """
+        grupos = list(grupos)
+        visitas_originales, conv_originales = list(visitas), list(conversiones)
+        visitas = np.asarray(visitas, dtype=float)
+        conv = np.asarray(conversiones, dtype=float)
         z_score = norm.ppf(0.975)
 
         # 1) Resultados por grupo
-        for grupo in grupos:
-            visitas = datos_totales[grupo]['visitas']
-            conv = datos_totales[grupo]['conv']
-            tasa_conversion = conv / visitas if visitas > 0 else 0.0
-
-            se = np.sqrt(
-                (tasa_conversion * (1 - tasa_conversion)) / visitas
-            ) if visitas > 0 else 0.0
-
-            ci_lower = max(0,  tasa_conversion - z_score * se)
-            ci_upper = min(1,  tasa_conversion + z_score * se)
-
-            self.resultados['grupos'][grupo] = {
-                'visitas': visitas,
-                'conv': conv,
-                'tasa_conversion': tasa_conversion,
-                'std_error': se,
-                'ci': (ci_lower, ci_upper),
-            }
+        con_visitas = visitas > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tasa = np.where(con_visitas, conv / visitas, 0.0)
+            se = np.where(con_visitas, np.sqrt(tasa * (1 - tasa) / visitas), 0.0)
+        ci_lower = np.maximum(0, tasa - z_score * se)
+        ci_upper = np.minimum(1, tasa + z_score * se)
 
-        # 2) Comparaciones por parejas (A vs B, A vs C, etc.)
-        self.resultados['comparaciones'] = {}
-        for g1, g2 in combinations(grupos, 2):
-            data1 = self.resultados['grupos'][g1]
-            data2 = self.resultados['grupos'][g2]
-
-            p1, n1 = data1['tasa_conversion'], data1['visitas']
-            p2, n2 = data2['tasa_conversion'], data2['visitas']
-
-            diff_prop = p1 - p2
-            se_diff = np.sqrt(
-                (p1 * (1 - p1) / n1) + (p2 * (1 - p2) / n2)
-            ) if n1 > 0 and n2 > 0 else np.inf
-
-            if se_diff > 0:
-                z_diff = diff_prop / se_diff
-                # Probabilidad de que g1 sea mejor que g2
-                prob_g1_mejor = 1 - norm.cdf(z_diff)
-            else:
-                z_diff = np.nan
-                prob_g1_mejor = 0.5
-
-            uplift_mean = (p1 - p2) / p2 if p2 > 0 else np.inf
-            ci_diff_lower = diff_prop - z_score * se_diff
-            ci_diff_upper = diff_prop + z_score * se_diff
-
-            self.resultados['comparaciones'][f"{g1}_vs_{g2}"] = {
-                'diff_mean': diff_prop,
-                'diff_ci': (ci_diff_lower, ci_diff_upper),
-                'uplift_mean': uplift_mean,
-                'prob_g1_mejor': prob_g1_mejor,
-                'ganador': (
-                    g1 if prob_g1_mejor >= 0.95
-                    else (g2 if (1 - prob_g1_mejor) >= 0.95 else None)
-                ),
+        self.resultados['grupos'] = {
+            grupo: {
+                'visitas': visitas_originales[i],
+                'conv': conv_originales[i],
+                'tasa_conversion': tasa[i].item(),
+                'std_error': se[i].item(),
+                'ci': (ci_lower[i].item(), ci_upper[i].item()),
             }
+            for i, grupo in enumerate(grupos)
+        }
+
+        # 2) Comparaciones por parejas como matrices (fila g1, columna g2)
+        matrices = comparar_proporciones(
+            visitas[:, np.newaxis], conv[:, np.newaxis],
+            visitas[np.newaxis, :], conv[np.newaxis, :],
+        )
+        prob_g1_mejor = matrices['prob_g1_mejor']
+        # La diagonal (un grupo contra sí mismo) no tiene sentido
+        for matriz in matrices.values():
+            np.fill_diagonal(matriz, np.nan)
+
+        # ganador[i, j]: índice del ganador de i vs j, o -1 si no hay
+        k = len(grupos)
+        fila, columna = np.indices((k, k))
+        ganador = np.where(prob_g1_mejor >= self.umbral_probabilidad, fila,
+                           np.where(1 - prob_g1_mejor >= self.umbral_probabilidad, columna, -1))
+        np.fill_diagonal(ganador, -1)
+
+        matrices['ganador'] = ganador
+        matrices['grupos'] = grupos
+        matrices['tasa_conversion'] = tasa
+        self.matrices = matrices
+
+        self.resultados['comparaciones'] = _ComparacionesPerezosas(self)
 
-            # Versión inversa (g2_vs_g1), igual que en el original
-            self.resultados['comparaciones'][f"{g2}_vs_{g1}"] = {
-                'diff_mean': -diff_prop,
-                'diff_ci': (-ci_diff_upper, -ci_diff_lower),
-                'uplift_mean': (p2 - p1) / p1 if p1 > 0 else np.inf,
-                'prob_g1_mejor': 1 - prob_g1_mejor,
-                'ganador': (
-                    g2 if (1 - prob_g1_mejor) >= 0.95
-                    else (g1 if prob_g1_mejor >= 0.95 else None)
-                ),
+    def matriz(self, nombre):
+        """
+        Una de las matrices K x K (ver MATRICES) como DataFrame con los grupos
+        como índice (g1) y columnas (g2).
+        """
+        grupos = self.matrices['grupos']
+        return pd.DataFrame(self.matrices[nombre], index=grupos, columns=grupos)
+
+    def comparaciones_dataframe(self):
+        """
+        Todas las comparaciones g1 vs g2 (g1 != g2) en formato largo: una fila por
+        pareja ordenada y una columna por estadístico.
+        """
+        grupos = np.array(self.matrices['grupos'], dtype=object)
+        i, j = np.nonzero(~np.eye(len(grupos), dtype=bool))
+        df = pd.DataFrame({'g1': grupos[i], 'g2': grupos[j]})
+        for nombre in self.MATRICES:
+            df[nombre] = self.matrices[nombre][i, j]
+        ganador = self.matrices['ganador'][i, j]
+        df['ganador'] = np.where(ganador >= 0, grupos[np.maximum(ganador, 0)], None)
+        return df
+
+    def _comparaciones_como_dict(self):
+        """
+        Reconstruye el formato original {"g1_vs_g2": {...}} a partir de las matrices.
+        """
+        m = self.matrices
+        grupos = m['grupos']
+        comparaciones = {}
+        # Mismo orden que el original: A_vs_B, B_vs_A, A_vs_C, C_vs_A...
+        for i, j in zip(*np.triu_indices(len(grupos), 1)):
+            for g1, g2, f, c in ((grupos[i], grupos[j], i, j), (grupos[j], grupos[i], j, i)):
+                ganador = m['ganador'][f, c]
+                comparaciones[f"{g1}_vs_{g2}"] = {
+                    'diff_mean': m['diff_mean'][f, c].item(),
+                    'diff_ci': (m['ci_diff_inf'][f, c].item(), m['ci_diff_sup'][f, c].item()),
+                    'uplift_mean': m['uplift_mean'][f, c].item(),
+                    'prob_g1_mejor': m['prob_g1_mejor'][f, c].item(),
+                    'p_valor': m['p_valor'][f, c].item(),
+                    'ganador': grupos[ganador] if ganador >= 0 else None,
+                }
+        return comparaciones
+
+    def evaluar_secuencial(self, diseno, mirada, control=None, anteriores=None):
+        """
+        Evalúa cada grupo contra el control (por defecto, el primero) con un
+        DisenoSecuencial de regla "msprt" o "gasto_alfa", usando los totales
+        acumulados analizados hasta la mirada (1, 2, ...).
+
+        anteriores es el resultado de la mirada previa ({grupo: resultado}); con él
+        cada evaluación es O(1). Devuelve {grupo: resultado} con ganador/lider
+        traducidos a nombres de grupo.
+        """
+        if diseno.regla == "perdida_esperada":
+            raise ValueError("La regla 'perdida_esperada' solo está disponible en las calculadoras bayesianas")
+        grupos = self.matrices['grupos']
+        control = grupos[0] if control is None else control
+        i = grupos.index(control)
+        anteriores = anteriores or {}
+        resultados = {}
+        for j, grupo in enumerate(grupos):
+            anterior = anteriores.get(grupo)
+            if j == i:
+                continue
+            if anterior is not None and anterior['parar']:
+                resultados[grupo] = anterior  # una parada es definitiva
+                continue
+            resumen = {
+                'diferencia': self.matrices['diff_mean'][j, i],
+                'error_estandar': self.matrices['se_diff'][j, i],
             }
+            resultado = diseno.evaluar(resumen, mirada, anterior)
+            nombres = {"A": control, "B": grupo, None: None}
+            resultado['ganador'] = nombres[resultado['ganador']]
+            resultado['lider'] = nombres[resultado['lider']]
+            resultados[grupo] = resultado
+        return resultados
 
     def obtener_ganador_global(self):
         """
-        Copiado del código original:
-        decide el ganador global a partir de las comparaciones.
+        Decide el ganador global a partir de las comparaciones: el grupo que gana
+        más comparaciones (a igualdad, el que gana antes en el orden de las parejas)
+        o, si nadie gana ninguna, el de mayor tasa de conversión.
         """
-        from collections import defaultdict as ddict
-
         if 'comparaciones' not in self.resultados:
             return "No hay comparaciones calculadas."
 
-        victorias = ddict(int)
-        grupos_participantes = set()
-
-        for clave, stats in self.resultados['comparaciones'].items():
-            if "_vs_" in clave:
-                g1, g2 = clave.split("_vs_")
-                grupos_participantes.add(g1)
-                grupos_participantes.add(g2)
+        grupos = self.matrices['grupos']
+        k = len(grupos)
+        ganador = self.matrices['ganador']
 
-                if stats['ganador']:
-                    victorias[stats['ganador']] += 1
+        # Victorias de cada grupo contando cada pareja una vez (i < j)
+        i, j = np.triu_indices(k, 1)
+        ganadores_parejas = ganador[i, j]
+        con_ganador = ganadores_parejas >= 0
+        victorias = np.bincount(ganadores_parejas[con_ganador], minlength=k)
 
-        if victorias:
-            ganador_global = max(victorias, key=victorias.get)
-            return ganador_global
+        if victorias.any():
+            # Desempate: primera pareja (en orden de combinaciones) en la que ganó cada grupo
+            primera_victoria = np.full(k, len(ganadores_parejas))
+            posiciones = np.nonzero(con_ganador)[0]
+            np.minimum.at(primera_victoria, ganadores_parejas[con_ganador], posiciones)
+            candidatos = np.nonzero(victorias == victorias.max())[0]
+            return grupos[candidatos[np.argmin(primera_victoria[candidatos])]]
 
-        elif grupos_participantes:
+        elif k >= 2:
             # Si nadie gana claramente, coge el de mayor tasa
-            mejor_tasa = -1
-            ganador_global = None
-            for grupo in grupos_participantes:
-                tasa = self.resultados['grupos'][grupo]['tasa_conversion']
-                if tasa > mejor_tasa:
-                    mejor_tasa = tasa
-                    ganador_global = grupo
-            if ganador_global:
-                return (
-                    "No hay un ganador estadísticamente significativo en todas las "
-                    f"comparaciones, pero '{ganador_global}' tiene la tasa de conversión más alta."
-                )
+            ganador_global = grupos[int(np.argmax(self.matrices['tasa_conversion']))]
+            return (
+                "No hay un ganador estadísticamente significativo en todas las "
+                f"comparaciones, pero '{ganador_global}' tiene la tasa de conversión más alta."
+            )
 
         return "No hay un ganador claro entre todos los grupos."
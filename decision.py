@@ -0,0 +1,153 @@
+# decision.py
+import numpy as np
+
+
+CRITERIOS = ("probabilidad", "perdida_esperada", "valor_restante")
+
+
+def decidir_ganador(resumen, umbral_probabilidad=0.95, umbral_mejora_minima=0.01,
+                    criterio="probabilidad", umbral_perdida=0.001, umbral_valor_restante=0.01):
+    """
+    Regla de decisión de detectar_ganador a partir del resumen_decision() de una
+    calculadora: prob_b_mejor, mejora_relativa, perdida_a, perdida_b y valor_restante.
+
+    criterio:
+    - "probabilidad": P(B > A) (o P(A > B)) por encima de umbral_probabilidad y
+      mejora relativa de al menos umbral_mejora_minima
+    - "perdida_esperada": gana el grupo con menor pérdida esperada si esta es
+      menor que umbral_perdida (en unidades de la tasa)
+    - "valor_restante": gana el grupo que va delante si el valor potencial
+      restante (relativo) es menor que umbral_valor_restante
+
+    No toca el historial, así que cambiar los umbrales solo cuesta esta llamada.
+    """
+    if criterio not in CRITERIOS:
+        raise ValueError(f"criterio debe ser uno de {CRITERIOS}, no {criterio!r}")
+    prob_b_mejor = resumen["prob_b_mejor"]
+    mejora_relativa = resumen["mejora_relativa"]
+    prob_a_mejor = 1 - prob_b_mejor
+    metricas = {
+        "perdida_esperada": {"A": resumen.get("perdida_a"), "B": resumen.get("perdida_b")},
+        "valor_restante": resumen.get("valor_restante"),
+    }
+
+    ganador = None
+    if criterio == "probabilidad":
+        if prob_b_mejor >= umbral_probabilidad and mejora_relativa >= umbral_mejora_minima:
+            ganador = "B"
+            razon = f"B es mejor con {prob_b_mejor:.1%} de probabilidad y {mejora_relativa:.1%} de mejora"
+        elif prob_a_mejor >= umbral_probabilidad and mejora_relativa <= -umbral_mejora_minima:
+            ganador = "A"
+            razon = f"A es mejor con {prob_a_mejor:.1%} de probabilidad y {abs(mejora_relativa):.1%} de mejora"
+    elif criterio == "perdida_esperada":
+        perdida_a, perdida_b = resumen["perdida_a"], resumen["perdida_b"]
+        candidato, perdida = ("B", perdida_b) if perdida_b <= perdida_a else ("A", perdida_a)
+        if perdida < umbral_perdida:
+            ganador = candidato
+            razon = f"Elegir {candidato} tiene una pérdida esperada de {perdida:.5f} (umbral {umbral_perdida:.5f})"
+    else:
+        candidato = "B" if prob_b_mejor >= 0.5 else "A"
+        valor_restante = resumen["valor_restante"]
+        if valor_restante < umbral_valor_restante:
+            ganador = candidato
+            razon = (f"{candidato} va delante y el valor restante es {valor_restante:.2%} "
+                     f"(umbral {umbral_valor_restante:.2%})")
+
+    # B gana
+    if ganador == "B":
+        return {
+            "ganador": "B",
+            "decision": "Implementar B",
+            "razon": razon,
+            "probabilidad": prob_b_mejor,
+            "mejora_relativa": mejora_relativa,
+            **metricas
+        }
+    # A gana
+    elif ganador == "A":
+        return {
+            "ganador": "A",
+            "decision": "Mantener A",
+            "razon": razon,
+            "probabilidad": prob_a_mejor,
+            "mejora_relativa": mejora_relativa,
+            **metricas
+        }
+    # Nadie gana todavía
+    else:
+        return {
+            "ganador": None,
+            "decision": "Continuar prueba",
+            "razon": "No hay evidencia suficiente para declarar un ganador",
+            "probabilidad_b_mejor": prob_b_mejor,
+            "mejora_relativa": mejora_relativa,
+            **metricas
+        }
+
+
+def decidir_arrays(prob_b_mejor, mejora, umbral_probabilidad, umbral_mejora_minima):
+    """
+    La misma regla aplicada a arrays: "B", "A" o None por elemento.
+    """
+    gana_b = (prob_b_mejor >= umbral_probabilidad) & (mejora >= umbral_mejora_minima)
+    gana_a = (1 - prob_b_mejor >= umbral_probabilidad) & (mejora <= -umbral_mejora_minima)
+    return np.where(gana_b, "B", np.where(gana_a, "A", None))
+
+
+CRITERIOS_MULTIGRUPO = ("probabilidad", "perdida_esperada")
+
+
+def decidir_ganador_multigrupo(grupos, prob_mejor, media, perdida, umbral_probabilidad=0.95,
+                               umbral_mejora_minima=0.01, criterio="probabilidad", umbral_perdida=0.001):
+    """
+    Regla de decisión con N grupos (el primero es el control) a partir de
+    P(cada grupo es el mejor), la media posterior y la pérdida esperada de cada uno.
+
+    criterio:
+    - "probabilidad": gana el grupo con más probabilidad de ser el mejor si esta
+      supera umbral_probabilidad y su media mejora al menos umbral_mejora_minima
+      (en relativo) a la del siguiente mejor grupo
+    - "perdida_esperada": gana el grupo con menor pérdida esperada si esta es
+      menor que umbral_perdida
+    """
+    if criterio not in CRITERIOS_MULTIGRUPO:
+        raise ValueError(f"criterio debe ser uno de {CRITERIOS_MULTIGRUPO}, no {criterio!r}")
+    prob_mejor = np.asarray(prob_mejor, dtype=float)
+    media = np.asarray(media, dtype=float)
+    perdida = np.asarray(perdida, dtype=float)
+
+    lider = int(np.argmax(prob_mejor) if criterio == "probabilidad" else np.argmin(perdida))
+    mejora_relativa = media[lider] / np.max(np.delete(media, lider)) - 1
+    metricas = {
+        "lider": grupos[lider],
+        "prob_mejor": dict(zip(grupos, prob_mejor.tolist())),
+        "perdida_esperada": dict(zip(grupos, perdida.tolist())),
+    }
+
+    ganador = None
+    if criterio == "probabilidad":
+        if prob_mejor[lider] >= umbral_probabilidad and mejora_relativa >= umbral_mejora_minima:
+            ganador = grupos[lider]
+            razon = (f"{ganador} es el mejor con {prob_mejor[lider]:.1%} de probabilidad y "
+                     f"{mejora_relativa:.1%} de mejora sobre el siguiente")
+    elif perdida[lider] < umbral_perdida:
+        ganador = grupos[lider]
+        razon = f"Elegir {ganador} tiene una pérdida esperada de {perdida[lider]:.5f} (umbral {umbral_perdida:.5f})"
+
+    if ganador is None:
+        return {
+            "ganador": None,
+            "decision": "Continuar prueba",
+            "razon": "No hay evidencia suficiente para declarar un ganador",
+            "probabilidad_mejor": prob_mejor[lider].item(),
+            "mejora_relativa": mejora_relativa.item(),
+            **metricas
+        }
+    return {
+        "ganador": ganador,
+        "decision": f"Mantener {ganador}" if lider == 0 else f"Implementar {ganador}",
+        "razon": razon,
+        "probabilidad": prob_mejor[lider].item(),
+        "mejora_relativa": mejora_relativa.item(),
+        **metricas
+    }
@@ -0,0 +1,129 @@
+# graficos.py
+import io
+from functools import lru_cache
+
+import numpy as np
+from scipy import stats
+from scipy.signal import fftconvolve
+
+# Puntos de la rejilla sobre la que se evalúan las densidades
+PUNTOS_REJILLA = 2048
+
+
+def _distribuciones(modelo, alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Posteriores congeladas de scipy para A y B: Beta(alpha, beta) en el modelo
+    de conversiones y Gamma(alpha, tasa=beta) en el de clicks.
+    """
+    if modelo == "beta":
+        return stats.beta(alpha_a, beta_a), stats.beta(alpha_b, beta_b)
+    return stats.gamma(alpha_a, scale=1 / beta_a), stats.gamma(alpha_b, scale=1 / beta_b)
+
+
+def curvas_posteriores(modelo, alpha_a, beta_a, alpha_b, beta_b, puntos=PUNTOS_REJILLA):
+    """
+    Densidades posteriores de A, B y de la diferencia B - A evaluadas en rejillas,
+    sin muestras ni KDE.
+
+    Las de A y B son la pdf analítica; la de la diferencia es la correlación de
+    ambas pdf en una rejilla común (vía FFT): f_D(d) = ∫ f_B(a + d) f_A(a) da.
+    """
+    dist_a, dist_b = _distribuciones(modelo, alpha_a, beta_a, alpha_b, beta_b)
+    cola = 1e-6
+    lo = min(dist_a.ppf(cola), dist_b.ppf(cola))
+    hi = max(dist_a.ppf(1 - cola), dist_b.ppf(1 - cola))
+    x = np.linspace(lo, hi, puntos)
+    pdf_a = dist_a.pdf(x)
+    pdf_b = dist_b.pdf(x)
+
+    paso = x[1] - x[0]
+    pdf_diff = np.clip(fftconvolve(pdf_b, pdf_a[::-1], mode="full") * paso, 0, None)
+    d = np.arange(-(puntos - 1), puntos) * paso
+
+    # Recortamos la diferencia a la zona con masa (media ± 6 desviaciones)
+    media_d = dist_b.mean() - dist_a.mean()
+    std_d = np.sqrt(dist_a.var() + dist_b.var())
+    visible = np.abs(d - media_d) <= 6 * std_d
+    return {
+        "x": x,
+        "pdf_a": pdf_a,
+        "pdf_b": pdf_b,
+        "d": d[visible],
+        "pdf_diff": pdf_diff[visible],
+    }
+
+
+@lru_cache(maxsize=None)
+def _pyplot():
+    """
+    matplotlib.pyplot con el estilo "whitegrid" de seaborn. Se importan al dibujar
+    la primera figura y no con el módulo: juntos tardan más de un segundo y la
+    app no los necesita hasta que hay resultados.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set(style="whitegrid")
+    return plt
+
+
+def _a_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100, bbox_inches="tight")
+    _pyplot().close(fig)
+    return buffer.getvalue()
+
+
+def png_posteriores(modelo, dia, alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Figuras de un día como PNG: (distribuciones posteriores, diferencia B - A).
+    """
+    curvas = curvas_posteriores(modelo, alpha_a, beta_a, alpha_b, beta_b)
+    if modelo == "beta":
+        titulo_post = f"{dia} - Distribuciones posteriores (Beta–Binomial)"
+        eje_post = "Tasa de conversión"
+        titulo_diff = f"{dia} - Diferencia de tasa de conversión"
+        eje_diff = "Diferencia en tasa de conversión"
+    else:
+        titulo_post = f"{dia} - Distribuciones posteriores (Gamma–Poisson)"
+        eje_post = "Tasa de clicks por visita"
+        titulo_diff = f"{dia} - Diferencia de tasa de clicks"
+        eje_diff = "Diferencia en clicks por visita"
+
+    plt = _pyplot()
+    fig1, ax1 = plt.subplots(figsize=(10, 5))
+    for pdf, etiqueta in ((curvas["pdf_a"], "Grupo A"), (curvas["pdf_b"], "Grupo B")):
+        linea, = ax1.plot(curvas["x"], pdf, label=etiqueta)
+        ax1.fill_between(curvas["x"], pdf, alpha=0.25, color=linea.get_color())
+    ax1.set_title(titulo_post)
+    ax1.set_xlabel(eje_post)
+    ax1.set_ylabel("Densidad")
+    ax1.legend()
+
+    fig2, ax2 = plt.subplots(figsize=(10, 4))
+    linea, = ax2.plot(curvas["d"], curvas["pdf_diff"], label="Diferencia (B - A)")
+    ax2.fill_between(curvas["d"], curvas["pdf_diff"], alpha=0.25, color=linea.get_color())
+    ax2.axvline(0, color="black", linestyle="--")
+    ax2.set_title(titulo_diff)
+    ax2.set_xlabel(eje_diff)
+    ax2.set_ylabel("Densidad")
+    ax2.legend()
+
+    return _a_png(fig1), _a_png(fig2)
+
+
+def png_evolucion(dias, tasas_a, tasas_b):
+    """
+    Evolución de las tasas esperadas de A y B a lo largo de los días, como PNG.
+    """
+    fig, ax = _pyplot().subplots(figsize=(10, 5))
+    ax.plot(dias, tasas_a, 'o-', label="Grupo A")
+    ax.plot(dias, tasas_b, 'o-', label="Grupo B")
+    ax.set_title("Evolución de tasas")
+    ax.set_xlabel("Día")
+    ax.set_ylabel("Tasa")
+    ax.legend()
+    ax.grid(True)
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    return _a_png(fig)
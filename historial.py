@@ -0,0 +1,88 @@
+# historial.py
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class HistorialCompacto(Sequence):
+    """
+    Historial respaldado por arrays: por cada día guarda solo los estadísticos
+    suficientes y los resúmenes numéricos (una columna float64 por campo), nunca
+    muestras posteriores.
+
+    Se usa igual que la lista de pasos de siempre (len, índices, slices, iteración):
+    cada acceso construye al vuelo el dict del paso con construir_paso(dia, fila),
+    donde fila es {columna: valor} y vale NaN en los campos que el paso no tiene
+    (por ejemplo, los resúmenes del paso "A priori").
+    """
+
+    __slots__ = ("_columnas", "_dias", "_n", "_construir_paso")
+
+    def __init__(self, columnas, construir_paso, capacidad=32):
+        self._columnas = {nombre: np.full(capacidad, np.nan) for nombre in columnas}
+        self._dias = []
+        self._n = 0
+        self._construir_paso = construir_paso
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(self._n))]
+        if indice < 0:
+            indice += self._n
+        if not 0 <= indice < self._n:
+            raise IndexError("índice fuera del historial")
+        fila = {nombre: valores[indice].item() for nombre, valores in self._columnas.items()}
+        return self._construir_paso(self._dias[indice], fila)
+
+    def agregar(self, dia, **valores):
+        self.extender([dia], valores)
+
+    def extender(self, dias, valores):
+        """
+        Añade varios días de golpe; valores es {columna: array o escalar}.
+        """
+        n_nuevos = len(dias)
+        self._reservar(self._n + n_nuevos)
+        for nombre, columna in self._columnas.items():
+            if nombre in valores:
+                columna[self._n:self._n + n_nuevos] = valores[nombre]
+        self._dias.extend(dias)
+        self._n += n_nuevos
+
+    def columna(self, nombre):
+        """
+        Vista de solo lectura de una columna completa (un valor por paso).
+        """
+        vista = self._columnas[nombre][:self._n]
+        vista.flags.writeable = False
+        return vista
+
+    @property
+    def dias(self):
+        return list(self._dias)
+
+    def _reservar(self, n):
+        capacidad = len(next(iter(self._columnas.values())))
+        if n <= capacidad:
+            return
+        nueva_capacidad = max(n, 2 * capacidad)
+        for nombre, columna in self._columnas.items():
+            ampliada = np.full(nueva_capacidad, np.nan)
+            ampliada[:capacidad] = columna
+            self._columnas[nombre] = ampliada
+
+
+def columnas_historial(historial, columnas, fila_desde_paso):
+    """
+    {columna: array float64} con un valor por paso, tanto de un HistorialCompacto
+    (vistas de sus columnas, sin copiar) como de una lista de pasos, para la que
+    fila_desde_paso(paso) devuelve los valores escalares de cada uno. Los campos
+    que un paso no tiene quedan como NaN.
+    """
+    if isinstance(historial, HistorialCompacto):
+        return {nombre: historial.columna(nombre) for nombre in columnas}
+    filas = [fila_desde_paso(paso) for paso in historial]
+    return {nombre: np.array([fila.get(nombre, np.nan) for fila in filas], dtype=float) for nombre in columnas}
@@ -0,0 +1,247 @@
+# ingesta.py
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_REQUERIDAS = ['Día', 'Conversiones A', 'Visitas A', 'Conversiones B', 'Visitas B']
+COLUMNAS_CONTEOS = COLUMNAS_REQUERIDAS[1:]
+
+# Con más de dos grupos, cada grupo X aporta el par de columnas "Conversiones X" / "Visitas X"
+PREFIJO_CONVERSIONES = 'Conversiones '
+PREFIJO_VISITAS = 'Visitas '
+
+# Valores continuos (ingresos...): una fila por usuario y los estadísticos suficientes
+# que se acumulan de ellos por día y grupo. Los log solo cuentan los valores positivos.
+COLUMNAS_VALORES = ['Día', 'Grupo', 'Valor']
+ESTADISTICOS_VALORES = ('Usuarios', 'Positivos', 'Suma', 'Suma cuadrados', 'Suma log', 'Suma log cuadrados')
+
+# Filas por bloque al leer archivos grandes
+TAM_BLOQUE = 500_000
+
+
+def formato_archivo(nombre):
+    """
+    "parquet" para .parquet/.pq y "csv" para todo lo demás.
+    """
+    return "parquet" if str(nombre).lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def _rebobinar(fuente):
+    # Los buffers (p. ej. el archivo subido en Streamlit) se leen varias veces
+    if hasattr(fuente, "seek"):
+        fuente.seek(0)
+
+
+def columnas_disponibles(fuente, formato="csv"):
+    """
+    Nombres de columna del archivo leyendo solo la cabecera (o el esquema en Parquet).
+    """
+    _rebobinar(fuente)
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        columnas = pq.read_schema(fuente).names
+    else:
+        columnas = list(pd.read_csv(fuente, nrows=0).columns)
+    _rebobinar(fuente)
+    return columnas
+
+
+def leer_bloques(fuente, columnas, formato="csv", tam_bloque=TAM_BLOQUE):
+    """
+    Recorre el archivo por bloques de tam_bloque filas, leyendo solo las columnas
+    pedidas (usecols en CSV, proyección de columnas en Parquet). Genera DataFrames.
+    """
+    _rebobinar(fuente)
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(fuente).iter_batches(batch_size=tam_bloque, columns=list(columnas)):
+            yield lote.to_pandas()
+    else:
+        # Con una ruta, el archivo se mapea en memoria en vez de copiarse a un buffer
+        memory_map = isinstance(fuente, (str, os.PathLike))
+        yield from pd.read_csv(fuente, usecols=list(columnas), chunksize=tam_bloque, memory_map=memory_map)
+
+
+def grupos_disponibles(columnas):
+    """
+    Grupos (A, B, C...) que tienen su par de columnas "Conversiones X" y
+    "Visitas X", en el orden en que aparecen en el archivo.
+    """
+    columnas = list(columnas)
+    return [
+        col[len(PREFIJO_CONVERSIONES):] for col in columnas
+        if col.startswith(PREFIJO_CONVERSIONES) and PREFIJO_VISITAS + col[len(PREFIJO_CONVERSIONES):] in columnas
+    ]
+
+
+def columnas_conteos(grupos):
+    """
+    Columnas de conteos de los grupos: ['Conversiones A', 'Visitas A', 'Conversiones B', ...].
+    """
+    return [col for grupo in grupos for col in (PREFIJO_CONVERSIONES + grupo, PREFIJO_VISITAS + grupo)]
+
+
+def totales_conteos(df, columnas=COLUMNAS_CONTEOS):
+    """
+    Suma de cada columna de conteos: {'Conversiones A': int, ...}.
+    """
+    return {col: int(df[col].sum()) for col in columnas}
+
+
+def leer_conteos(fuente, formato="csv", columnas_extra=(), tam_bloque=TAM_BLOQUE, progreso=None, grupos=None):
+    """
+    Lee un export diario por bloques cargando solo las cinco columnas requeridas
+    (más columnas_extra si se piden) y calcula los totales en la misma pasada.
+    Con grupos (p. ej. ["A", "B", "C"]) se leen 'Día' y los pares de columnas de
+    esos grupos en lugar de los de A y B.
+
+    Los conteos se guardan con el entero sin signo más pequeño que los admite
+    (pd.to_numeric(downcast="unsigned")); al concatenar, pandas usa el tipo común.
+    Devuelve (df, totales). progreso(filas_leidas) se llama tras cada bloque.
+    """
+    conteos = COLUMNAS_CONTEOS if grupos is None else columnas_conteos(grupos)
+    requeridas = ['Día'] + conteos
+    columnas = requeridas + [c for c in columnas_extra if c not in requeridas]
+    bloques = []
+    totales = dict.fromkeys(conteos, 0)
+    filas = 0
+    for bloque in leer_bloques(fuente, columnas, formato, tam_bloque):
+        for col, total in totales_conteos(bloque, conteos).items():
+            totales[col] += total
+        for col in conteos:
+            bloque[col] = pd.to_numeric(bloque[col], downcast="unsigned")
+        bloques.append(bloque)
+        filas += len(bloque)
+        if progreso is not None:
+            progreso(filas)
+
+    if not bloques:
+        return pd.DataFrame(columns=columnas), totales
+    return pd.concat(bloques, ignore_index=True), totales
+
+
+def etiqueta_dia(valor):
+    """
+    "Día 3" para identificadores numéricos y el propio texto ("Lunes") para el resto.
+    """
+    try:
+        return f"Día {int(valor)}"
+    except (TypeError, ValueError):
+        return str(valor)
+
+
+def series_desde_dataframe(df):
+    """
+    Extrae del DataFrame del CSV las etiquetas de día y las cuatro series de conteos
+    como arrays de NumPy, listas para CalculadoraX.procesar_serie().
+    """
+    dias = [etiqueta_dia(valor) for valor in df['Día']]
+    conv_a = df['Conversiones A'].to_numpy(dtype=np.int64)
+    visitas_a = df['Visitas A'].to_numpy(dtype=np.int64)
+    conv_b = df['Conversiones B'].to_numpy(dtype=np.int64)
+    visitas_b = df['Visitas B'].to_numpy(dtype=np.int64)
+    return dias, conv_a, visitas_a, conv_b, visitas_b
+
+
+def series_multigrupo_desde_dataframe(df, grupos):
+    """
+    Como series_desde_dataframe para N grupos: etiquetas de día y dos matrices
+    (dias, grupos) de conversiones y visitas, listas para procesar_serie() de las
+    calculadoras multigrupo.
+    """
+    dias = [etiqueta_dia(valor) for valor in df['Día']]
+    conversiones = df[[PREFIJO_CONVERSIONES + grupo for grupo in grupos]].to_numpy(dtype=np.int64)
+    visitas = df[[PREFIJO_VISITAS + grupo for grupo in grupos]].to_numpy(dtype=np.int64)
+    return dias, conversiones, visitas
+
+
+def estadisticos_valores(valores):
+    """
+    Estadísticos suficientes (ESTADISTICOS_VALORES, en ese orden) de un array de
+    valores >= 0: array de 6 floats.
+    """
+    valores = np.asarray(valores, dtype=float)
+    positivos = valores[valores > 0]
+    logs = np.log(positivos)
+    return np.array([valores.size, positivos.size, valores.sum(), np.square(valores).sum(),
+                     logs.sum(), np.square(logs).sum()])
+
+
+def _sumas_valores(bloque):
+    """
+    Estadísticos de un bloque de filas por usuario, sumados por (Día, Grupo).
+    """
+    valores = bloque['Valor'].to_numpy(dtype=float)
+    if (valores < 0).any():
+        raise ValueError("La columna Valor no admite valores negativos")
+    positivo = valores > 0
+    logs = np.log(np.where(positivo, valores, 1.0))
+    sumandos = pd.DataFrame({
+        'Día': bloque['Día'].to_numpy(),
+        'Grupo': bloque['Grupo'].astype(str).to_numpy(),
+        'Usuarios': 1.0,
+        'Positivos': positivo.astype(float),
+        'Suma': valores,
+        'Suma cuadrados': valores ** 2,
+        'Suma log': logs,
+        'Suma log cuadrados': logs ** 2,
+    })
+    return sumandos.groupby(['Día', 'Grupo'], sort=False).sum()
+
+
+def _estadisticos_por_dia(parciales, grupos):
+    columnas = ['Día'] + columnas_valores(grupos)
+    if not parciales:
+        return pd.DataFrame(columns=columnas)
+    totales = pd.concat(parciales).groupby(level=['Día', 'Grupo'], sort=False).sum()
+    # unstack ordena los días: se vuelve al orden del archivo
+    ancho = totales.unstack('Grupo', fill_value=0.0).reindex(totales.index.get_level_values('Día').unique())
+    faltantes = [grupo for grupo in grupos if grupo not in ancho.columns.get_level_values('Grupo')]
+    if faltantes:
+        raise ValueError(f"No hay filas del grupo {', '.join(faltantes)}")
+    ancho.columns = [f"{estadistico} {grupo}" for estadistico, grupo in ancho.columns]
+    return ancho.reset_index()[columnas]
+
+
+def estadisticos_por_dia(df, grupos=("A", "B")):
+    """
+    Estadísticos por día de un DataFrame con una fila por usuario (Día, Grupo,
+    Valor): una fila por día (en el orden en que aparecen) con 'Día' y las
+    columnas "<estadístico> <grupo>" de ESTADISTICOS_VALORES.
+    """
+    return _estadisticos_por_dia([_sumas_valores(df)], list(grupos))
+
+
+def leer_valores(fuente, formato="csv", grupos=("A", "B"), tam_bloque=TAM_BLOQUE, progreso=None):
+    """
+    estadisticos_por_dia leyendo el archivo por bloques: los valores no se guardan,
+    cada bloque se reduce a sus sumas por día y grupo, así que el tamaño del
+    archivo no limita la memoria. progreso(filas_leidas) se llama tras cada bloque.
+    """
+    parciales = []
+    filas = 0
+    for bloque in leer_bloques(fuente, COLUMNAS_VALORES, formato, tam_bloque):
+        parciales.append(_sumas_valores(bloque))
+        filas += len(bloque)
+        if progreso is not None:
+            progreso(filas)
+    return _estadisticos_por_dia(parciales, list(grupos))
+
+
+def columnas_valores(grupos=("A", "B")):
+    """
+    Columnas de estadísticos de los grupos: ['Usuarios A', 'Positivos A', ..., 'Usuarios B', ...].
+    """
+    return [f"{estadistico} {grupo}" for grupo in grupos for estadistico in ESTADISTICOS_VALORES]
+
+
+def series_valores_desde_dataframe(df):
+    """
+    Etiquetas de día y dos matrices (dias, 6) con los estadísticos de A y B
+    (ESTADISTICOS_VALORES), listas para CalculadoraIngresosBayesiana.procesar_serie().
+    """
+    dias = [etiqueta_dia(valor) for valor in df['Día']]
+    estadisticos_a = df[columnas_valores(["A"])].to_numpy(dtype=float)
+    estadisticos_b = df[columnas_valores(["B"])].to_numpy(dtype=float)
+    return dias, estadisticos_a, estadisticos_b
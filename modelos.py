@@ -0,0 +1,48 @@
+# modelos.py
+from importlib import import_module
+
+# Modelo -> (módulo, clase, parámetros por defecto). Sin muestras en el historial:
+# solo estadísticos suficientes y resúmenes exactos, que es lo que necesitan el
+# servicio y el almacén persistente.
+#
+# Las clases se importan la primera vez que se piden (clase_modelo), así que cargar
+# este módulo no arrastra ninguna calculadora y cada una trae solo sus dependencias.
+MODELOS = {
+    "beta_binomial": ("calculadora_bayesiana_conversiones", "CalculadoraConversionesBayesiana",
+                      {"metodo": "exacto", "historial_compacto": True}),
+    "gamma_poisson": ("calculadora_bayesiana", "CalculadoraClicksBayesiana",
+                      {"metodo": "conjugado", "historial_compacto": True}),
+    "ingresos": ("calculadora_bayesiana_ingresos", "CalculadoraIngresosBayesiana", {}),
+}
+
+# Modelos de conteos (conversiones o clicks y visitas por día): los únicos que
+# admiten el servicio y el almacén, que guardan y reciben esos cuatro campos
+MODELOS_CONTEOS = ("beta_binomial", "gamma_poisson")
+
+
+def clase_modelo(modelo):
+    """
+    Clase de la calculadora de un modelo, importando su módulo si hace falta.
+    """
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo desconocido '{modelo}'. Opciones: {', '.join(MODELOS)}")
+    modulo, clase, _ = MODELOS[modelo]
+    return getattr(import_module(modulo), clase)
+
+
+def crear_calculadora(modelo, **parametros):
+    clase = clase_modelo(modelo)
+    return clase(**{**MODELOS[modelo][2], **parametros})
+
+
+def modelo_de(calculadora):
+    """
+    Nombre del modelo ("beta_binomial", "gamma_poisson", "ingresos") de una calculadora.
+    Compara módulo y nombre de su clase (o de sus bases) sin importar el resto de
+    modelos.
+    """
+    for clase in type(calculadora).__mro__:
+        for modelo, (modulo, nombre, _) in MODELOS.items():
+            if clase.__module__ == modulo and clase.__name__ == nombre:
+                return modelo
+    raise ValueError(f"{type(calculadora).__name__} no es un modelo registrado")
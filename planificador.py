@@ -0,0 +1,222 @@
+# planificador.py
+#
+# Planificación de un test antes de lanzarlo: tamaño de muestra, potencia y
+# duración esperada con una tasa base, un efecto mínimo a detectar y un tráfico
+# diario dados.
+#
+#   frecuentista  fórmulas cerradas del test z bilateral (proporciones o tasas Poisson)
+#   bayesiano     miles de experimentos simulados como arrays (simulaciones x días),
+#                 a los que se aplica cada día la regla de detectar_ganador
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from decision import decidir_arrays
+from posteriores_conjugadas import prob_beta_b_mejor, prob_gamma_b_mejor, uplift_medio_beta
+
+MODELOS = ("beta_binomial", "gamma_poisson")
+
+# Celdas (simulaciones x días) por bloque: acota la memoria y es la unidad de reparto entre procesos
+CELDAS_BLOQUE = 100_000
+
+# Con la aproximación normal de P(B > A) a menos de este margen de un umbral (o con
+# conteos pequeños) se usa la probabilidad exacta; lejos de los umbrales la decisión
+# no cambia y la cuadratura Beta es lo más caro de la simulación
+MARGEN_EXACTO = 0.02
+CONTEO_MINIMO_NORMAL = 30
+
+
+def _varianza_unitaria(modelo, tasa):
+    # Varianza de una visita: Bernoulli (conversiones 0/1) o Poisson (clicks por visita)
+    if modelo not in MODELOS:
+        raise ValueError(f"modelo debe ser uno de {MODELOS}, no {modelo!r}")
+    tasa = np.asarray(tasa, dtype=float)
+    return tasa * (1 - tasa) if modelo == "beta_binomial" else tasa
+
+
+def tamano_muestra_frecuentista(tasa_base, mejora_relativa, alpha=0.05, potencia=0.8, modelo="beta_binomial"):
+    """
+    Visitas por grupo para detectar una mejora relativa con un test z bilateral
+    de nivel alpha y la potencia pedida (varianza combinada bajo H0).
+    """
+    tasa_b = tasa_base * (1 + mejora_relativa)
+    z_alpha = norm.isf(alpha / 2)
+    z_beta = norm.ppf(potencia)
+    varianza_h0 = 2 * _varianza_unitaria(modelo, (tasa_base + tasa_b) / 2)
+    varianza_h1 = _varianza_unitaria(modelo, tasa_base) + _varianza_unitaria(modelo, tasa_b)
+    n = (z_alpha * np.sqrt(varianza_h0) + z_beta * np.sqrt(varianza_h1)) ** 2 / (tasa_b - tasa_base) ** 2
+    return int(np.ceil(n))
+
+
+def potencia_frecuentista(tasa_base, mejora_relativa, visitas_por_grupo, alpha=0.05, modelo="beta_binomial"):
+    """
+    Potencia del mismo test con visitas_por_grupo visitas en cada grupo
+    (acepta un array, por ejemplo las visitas acumuladas de cada día).
+    """
+    tasa_b = tasa_base * (1 + mejora_relativa)
+    visitas = np.asarray(visitas_por_grupo, dtype=float)
+    varianza_h0 = 2 * _varianza_unitaria(modelo, (tasa_base + tasa_b) / 2)
+    varianza_h1 = _varianza_unitaria(modelo, tasa_base) + _varianza_unitaria(modelo, tasa_b)
+    z = (abs(tasa_b - tasa_base) * np.sqrt(visitas) - norm.isf(alpha / 2) * np.sqrt(varianza_h0)) / np.sqrt(varianza_h1)
+    return norm.cdf(z)
+
+
+def _prob_b_mejor_beta(alpha_a, beta_a, alpha_b, beta_b, umbrales, relevante):
+    """
+    P(B > A) con posteriores Beta para la simulación: aproximación normal y, en
+    las celdas relevantes cerca de algún umbral o con pocos conteos, la exacta.
+    """
+    media_a = alpha_a / (alpha_a + beta_a)
+    media_b = alpha_b / (alpha_b + beta_b)
+    var_a = media_a * (1 - media_a) / (alpha_a + beta_a + 1)
+    var_b = media_b * (1 - media_b) / (alpha_b + beta_b + 1)
+    prob = norm.cdf((media_b - media_a) / np.sqrt(var_a + var_b))
+
+    cerca = np.zeros(prob.shape, dtype=bool)
+    for umbral in umbrales:
+        cerca |= np.abs(prob - umbral) < MARGEN_EXACTO
+    cerca |= np.minimum.reduce([alpha_a, beta_a, alpha_b, beta_b]) < CONTEO_MINIMO_NORMAL
+    exacta = cerca & relevante
+    if exacta.any():
+        prob[exacta] = prob_beta_b_mejor(alpha_a[exacta], beta_a[exacta], alpha_b[exacta], beta_b[exacta])
+    return prob
+
+
+def _simular_bloque(modelo, tasa_a, tasa_b, visitas_dia, n_dias, n_simulaciones, alpha_prior, beta_prior,
+                    umbral_probabilidad, umbral_mejora_minima, semilla):
+    """
+    n_simulaciones experimentos de n_dias días. Devuelve, por experimento, el
+    primer día en que la regla declara ganador (0 si nunca) y el ganador
+    (1 = B, -1 = A, 0 = ninguno).
+    """
+    rng = np.random.default_rng(semilla)
+    forma = (n_simulaciones, n_dias)
+    visitas = visitas_dia * np.arange(1, n_dias + 1, dtype=float)
+    if modelo == "beta_binomial":
+        conv_a = np.cumsum(rng.binomial(visitas_dia, tasa_a, forma), axis=1)
+        conv_b = np.cumsum(rng.binomial(visitas_dia, tasa_b, forma), axis=1)
+        alpha_a, beta_a = alpha_prior + conv_a, beta_prior + visitas - conv_a
+        alpha_b, beta_b = alpha_prior + conv_b, beta_prior + visitas - conv_b
+        # La misma mejora que CalculadoraConversionesBayesiana: uplift medio exacto
+        mejora = uplift_medio_beta(alpha_a.ravel(), beta_a.ravel(), alpha_b.ravel(), beta_b.ravel()).reshape(forma)
+        relevante = np.abs(mejora) >= umbral_mejora_minima
+        prob = _prob_b_mejor_beta(alpha_a, beta_a, alpha_b, beta_b,
+                                  (umbral_probabilidad, 1 - umbral_probabilidad), relevante)
+    else:
+        conv_a = np.cumsum(rng.poisson(visitas_dia * tasa_a, forma), axis=1)
+        conv_b = np.cumsum(rng.poisson(visitas_dia * tasa_b, forma), axis=1)
+        alpha_a, beta_a = alpha_prior + conv_a, beta_prior + visitas
+        alpha_b, beta_b = alpha_prior + conv_b, beta_prior + visitas
+        # Como CalculadoraClicksBayesiana: mejora sobre las medias
+        mejora = (alpha_b / beta_b) / (alpha_a / beta_a) - 1
+        prob = prob_gamma_b_mejor(alpha_a, beta_a, alpha_b, beta_b)
+
+    ganador = decidir_arrays(prob, mejora, umbral_probabilidad, umbral_mejora_minima)
+    decide = ganador.astype(bool)  # "B" / "A" frente a None
+    primero = np.argmax(decide, axis=1)
+    alguno = decide.any(axis=1)
+    ganador_final = ganador[np.arange(n_simulaciones), primero]
+    codigo = np.where(~alguno, 0, np.where(ganador_final == "B", 1, -1))
+    return np.where(alguno, primero + 1, 0), codigo
+
+
+def simular_decisiones(tasa_a, tasa_b, visitas_dia, n_dias, n_simulaciones=2_000, modelo="beta_binomial",
+                       umbral_probabilidad=0.95, umbral_mejora_minima=0.01, alpha_prior=1, beta_prior=1,
+                       semilla=None, procesos=1):
+    """
+    Simula n_simulaciones experimentos con las tasas reales dadas y visitas_dia
+    visitas diarias por grupo, mirando el resultado cada día como haría la app.
+    Devuelve (dia_decision, ganador): arrays con el primer día con ganador (0 si
+    no lo hay en n_dias) y el ganador (1 = B, -1 = A, 0 = ninguno).
+
+    Los experimentos se simulan por bloques de arrays; con procesos > 1 los
+    bloques se reparten entre varios procesos. Cada bloque tiene su propia semilla
+    derivada de `semilla`, así que el resultado no depende de procesos.
+    """
+    por_bloque = max(1, CELDAS_BLOQUE // n_dias)
+    tamanos = [min(por_bloque, n_simulaciones - inicio) for inicio in range(0, n_simulaciones, por_bloque)]
+    if not isinstance(semilla, np.random.SeedSequence):
+        semilla = np.random.SeedSequence(semilla)
+    semillas = semilla.spawn(len(tamanos))
+    argumentos = [
+        (modelo, tasa_a, tasa_b, visitas_dia, n_dias, tamano, alpha_prior, beta_prior,
+         umbral_probabilidad, umbral_mejora_minima, semilla_bloque)
+        for tamano, semilla_bloque in zip(tamanos, semillas)
+    ]
+    if procesos > 1 and len(argumentos) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = list(pool.map(_simular_bloque, *zip(*argumentos)))
+    else:
+        resultados = [_simular_bloque(*args) for args in argumentos]
+    dia_decision, ganador = zip(*resultados)
+    return np.concatenate(dia_decision), np.concatenate(ganador)
+
+
+def planificar(tasa_base, mejora_relativa, visitas_por_dia, modelo="beta_binomial", alpha=0.05, potencia=0.8,
+               umbral_probabilidad=0.95, umbral_mejora_minima=0.01, n_simulaciones=2_000, max_dias=None,
+               alpha_prior=1, beta_prior=1, semilla=None, procesos=1):
+    """
+    Plan de un test A/B con visitas_por_dia visitas diarias en total, repartidas
+    al 50% entre A y B, para detectar una mejora_relativa sobre tasa_base.
+
+    Devuelve un dict con:
+    - frecuentista: visitas por grupo y días para la potencia pedida (fórmula cerrada)
+    - bayesiano: con la regla de detectar_ganador evaluada cada día hasta max_dias
+      (por defecto, el doble de los días frecuentistas): ganador_esperado ("B" si
+      mejora_relativa > 0, "A" si es negativa), potencia (P(declararlo)),
+      falsos_positivos (P(declarar algún ganador) sin efecto real), prob_error_signo
+      (P(declarar el otro) con el efecto) y días medio / mediana hasta declararlo
+    - curva: DataFrame por día con visitas por grupo, potencia frecuentista y
+      probabilidad acumulada de haber declarado el ganador esperado (con efecto) o
+      un ganador (sin él)
+    """
+    visitas_dia = visitas_por_dia // 2
+    if visitas_dia < 1:
+        raise ValueError("visitas_por_dia debe ser al menos 2 (una visita por grupo)")
+    n_frecuentista = tamano_muestra_frecuentista(tasa_base, mejora_relativa, alpha, potencia, modelo)
+    dias_frecuentista = int(np.ceil(n_frecuentista / visitas_dia))
+    if max_dias is None:
+        max_dias = max(2 * dias_frecuentista, 7)
+    max_dias = int(max_dias)
+
+    comun = dict(n_dias=max_dias, n_simulaciones=n_simulaciones, modelo=modelo,
+                 umbral_probabilidad=umbral_probabilidad, umbral_mejora_minima=umbral_mejora_minima,
+                 alpha_prior=alpha_prior, beta_prior=beta_prior, procesos=procesos)
+    semilla_efecto, semilla_nulo = np.random.SeedSequence(semilla).spawn(2)
+    dia_efecto, ganador_efecto = simular_decisiones(tasa_base, tasa_base * (1 + mejora_relativa), visitas_dia,
+                                                    semilla=semilla_efecto, **comun)
+    dia_nulo, _ = simular_decisiones(tasa_base, tasa_base, visitas_dia, semilla=semilla_nulo, **comun)
+
+    dias = np.arange(1, max_dias + 1)
+    # Con una mejora negativa lo correcto es declarar A (-1 en ganador)
+    esperado = 1 if mejora_relativa > 0 else -1
+    acierta = ganador_efecto == esperado
+    decididos = dia_efecto[acierta]
+    curva = pd.DataFrame({
+        "dia": dias,
+        "visitas_por_grupo": dias * visitas_dia,
+        "potencia_frecuentista": potencia_frecuentista(tasa_base, mejora_relativa, dias * visitas_dia, alpha, modelo),
+        "potencia_bayesiana": np.searchsorted(np.sort(decididos), dias, side="right") / n_simulaciones,
+        "falsos_positivos_bayesianos": np.searchsorted(np.sort(dia_nulo[dia_nulo > 0]), dias, side="right")
+        / n_simulaciones,
+    })
+    return {
+        "frecuentista": {
+            "visitas_por_grupo": n_frecuentista,
+            "dias": dias_frecuentista,
+            "potencia": float(potencia_frecuentista(tasa_base, mejora_relativa, dias_frecuentista * visitas_dia,
+                                                    alpha, modelo)),
+        },
+        "bayesiano": {
+            "max_dias": max_dias,
+            "ganador_esperado": "B" if esperado == 1 else "A",
+            "potencia": float(acierta.mean()),
+            "falsos_positivos": float(np.mean(dia_nulo > 0)),
+            "prob_error_signo": float(np.mean(ganador_efecto == -esperado)),
+            "dias_medio": float(decididos.mean()) if len(decididos) else None,
+            "dias_mediana": float(np.median(decididos)) if len(decididos) else None,
+        },
+        "curva": curva,
+    }
@@ -0,0 +1,392 @@
+# posteriores_conjugadas.py
+import numpy as np
+from scipy import stats
+from scipy.special import betainc, betaincinv, gammainc, gammaincinv
+
+
+def prob_gamma_b_mejor(alpha_a, beta_a, alpha_b, beta_b):
+    """
+    P(tasa_B > tasa_A) exacta para dos posteriores Gamma independientes
+    (beta es la tasa, igual que en pm.Gamma).
+
+    Si U ~ Gamma(alpha_a, 1) y V ~ Gamma(alpha_b, 1), entonces U / (U + V) ~ Beta(alpha_a, alpha_b)
+    y la probabilidad se reduce a la función beta incompleta regularizada.
+    Acepta escalares o arrays (se evalúa elemento a elemento).
+    """
+    alpha_a, beta_a, alpha_b, beta_b = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (alpha_a, beta_a, alpha_b, beta_b))
+    )
+    return betainc(alpha_a, alpha_b, beta_a / (beta_a + beta_b))
+
+
+def distribucion_uplift_gamma(alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Distribución exacta del uplift (tasa_B - tasa_A) / tasa_A con posteriores Gamma.
+
+    tasa_B / tasa_A = (beta_a * alpha_b) / (beta_b * alpha_a) * F(2 * alpha_b, 2 * alpha_a),
+    así que el uplift es una F desplazada en -1 y escalada.
+    """
+    alpha_a = np.asarray(alpha_a, dtype=float)
+    alpha_b = np.asarray(alpha_b, dtype=float)
+    escala = (np.asarray(beta_a, dtype=float) * alpha_b) / (np.asarray(beta_b, dtype=float) * alpha_a)
+    return stats.f(2 * alpha_b, 2 * alpha_a, loc=-1.0, scale=escala)
+
+
+def resumen_uplift_gamma(alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Media, desviación estándar e IC 95% del uplift, con el mismo formato
+    que el dict "uplift" del historial de CalculadoraClicksBayesiana.
+
+    La media de la F solo existe con alpha_a > 1 y su desviación con alpha_a > 2
+    (p. ej. no existen el primer día sin clicks en A con el prior por defecto).
+    Sin ellas se dan la mediana y la semianchura del intervalo central del 68%,
+    que siempre son finitas.
+    """
+    alpha_a = np.asarray(alpha_a, dtype=float)
+    dist = distribucion_uplift_gamma(alpha_a, beta_a, alpha_b, beta_b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media = np.where(alpha_a > 1, dist.mean(), dist.median())
+        std = np.where(alpha_a > 2, dist.std(), (dist.ppf(0.8413) - dist.ppf(0.1587)) / 2)
+    return {
+        "media": media,
+        "std": std,
+        "ic_95": np.stack([dist.ppf(0.025), dist.ppf(0.975)], axis=-1),
+    }
+
+
+# Nodos de Gauss-Legendre para las integrales sobre el soporte de una posterior.
+# El soporte se parte en tramos por los soportes de las otras posteriores de la
+# integral, con NODOS_CUADRATURA nodos en cada tramo: si una posterior es mucho más
+# estrecha que otra, toda su subida cae en un tramo propio en lugar de entre dos
+# nodos de la más ancha.
+NODOS_CUADRATURA = 32
+COLA_CUADRATURA = 1e-12
+_NODOS_GL, _PESOS_GL = np.polynomial.legendre.leggauss(NODOS_CUADRATURA)
+
+
+def _reglas_tramo():
+    """
+    Posiciones (en fracción del ancho) y pesos de los nodos de un tramo según toque
+    un extremo del soporte donde la densidad es singular (alpha < 1, o beta < 1 en
+    la Beta): (ninguno, izquierdo, derecho, ambos).
+
+    Junto a una singularidad Gauss-Legendre converge muy despacio; el cambio de
+    variable u = 1 - cos(pi s / 2) acumula nodos allí y la suaviza.
+    """
+    s = (_NODOS_GL + 1) / 2
+    interior = (s, _PESOS_GL / 2)
+    izquierdo = (1 - np.cos(np.pi * s / 2), np.pi / 4 * np.sin(np.pi * s / 2) * _PESOS_GL)
+    derecho = (1 - izquierdo[0][::-1], izquierdo[1][::-1])
+    ambos = ((1 - np.cos(np.pi * s)) / 2, np.pi / 4 * np.sin(np.pi * s) * _PESOS_GL)
+    return interior, izquierdo, derecho, ambos
+
+
+_REGLAS_TRAMO = _reglas_tramo()
+
+
+def _nodos_tramos(lo, hi, cortes=None, singular_lo=False, singular_hi=False):
+    """
+    Nodos x y pesos (sin densidad) para integrar en [lo, hi] (..., 1), partido por
+    los cortes (..., m) que caigan dentro. singular_lo / singular_hi (..., 1) indican
+    si la densidad es singular en cada extremo. Devuelve arrays (..., (m + 1) * n).
+    """
+    if cortes is None:
+        extremos = np.concatenate([lo, hi], axis=-1)
+    else:
+        extremos = np.sort(np.concatenate([lo, np.clip(cortes, lo, hi), hi], axis=-1), axis=-1)
+    inicio = extremos[..., :-1, np.newaxis]
+    fin = extremos[..., 1:, np.newaxis]
+    toca_lo = (inicio == lo[..., np.newaxis]) & np.asarray(singular_lo)[..., np.newaxis]
+    toca_hi = (fin == hi[..., np.newaxis]) & np.asarray(singular_hi)[..., np.newaxis]
+    (fraccion, pesos), *extremas = _REGLAS_TRAMO
+    for mascara, (fraccion_extremo, pesos_extremo) in zip(
+            (toca_lo & ~toca_hi, toca_hi & ~toca_lo, toca_lo & toca_hi), extremas):
+        fraccion = np.where(mascara, fraccion_extremo, fraccion)
+        pesos = np.where(mascara, pesos_extremo, pesos)
+    forma = extremos.shape[:-1] + (-1,)
+    ancho = fin - inicio
+    return (inicio + ancho * fraccion).reshape(forma), (ancho * pesos).reshape(forma)
+
+
+def _soporte_beta(alpha, beta, cola=COLA_CUADRATURA):
+    # [ppf(cola), ppf(1 - cola)], donde está prácticamente toda la masa, dentro de
+    # (0, 1) estricto para que la densidad sea finita en los nodos
+    lo = np.maximum(betaincinv(alpha, beta, cola), np.finfo(float).tiny)
+    hi = np.minimum(betaincinv(alpha, beta, 1 - cola), 1 - np.finfo(float).epsneg)
+    return lo, hi
+
+
+def _soporte_gamma(alpha, beta, cola=COLA_CUADRATURA):
+    lo = np.maximum(gammaincinv(alpha, cola) / beta, np.finfo(float).tiny)
+    return lo, gammaincinv(alpha, 1 - cola) / beta
+
+
+def _cuadratura_beta(alpha, beta, cortes=None):
+    """
+    Nodos x (dias, n) y pesos w * pdf(x) para integrar E[g(X)] con X ~ Beta(alpha, beta).
+
+    La cuadratura se restringe al intervalo donde está prácticamente toda la masa,
+    para que sea precisa también con alphas muy grandes, y se parte por cortes
+    (dias, m): los extremos de los soportes de las otras posteriores que aparecen en g.
+    """
+    alpha = np.atleast_1d(np.asarray(alpha, dtype=float))[..., np.newaxis]
+    beta = np.atleast_1d(np.asarray(beta, dtype=float))[..., np.newaxis]
+    x, pesos = _nodos_tramos(*_soporte_beta(alpha, beta), cortes, alpha < 1, beta < 1)
+    return x, pesos * stats.beta.pdf(x, alpha, beta)
+
+
+def _cuadratura_gamma(alpha, beta, cortes=None):
+    """
+    Igual que _cuadratura_beta para X ~ Gamma(alpha, beta) (beta es la tasa).
+    """
+    alpha = np.atleast_1d(np.asarray(alpha, dtype=float))[..., np.newaxis]
+    beta = np.atleast_1d(np.asarray(beta, dtype=float))[..., np.newaxis]
+    x, pesos = _nodos_tramos(*_soporte_gamma(alpha, beta), cortes, alpha < 1)
+    return x, pesos * stats.gamma.pdf(x, alpha, scale=1 / beta)
+
+
+def prob_beta_mayor(alpha_x, beta_x, alpha_y, beta_y):
+    """
+    P(Y > X) para X ~ Beta(alpha_x, beta_x) e Y ~ Beta(alpha_y, beta_y) independientes,
+    integrando numéricamente E[1 - F_Y(X)]. Vectorizada sobre arrays de parámetros.
+    """
+    alpha_y = np.atleast_1d(np.asarray(alpha_y, dtype=float))[:, np.newaxis]
+    beta_y = np.atleast_1d(np.asarray(beta_y, dtype=float))[:, np.newaxis]
+    x, pesos = _cuadratura_beta(alpha_x, beta_x, np.concatenate(_soporte_beta(alpha_y, beta_y), axis=-1))
+    return np.clip(np.sum(pesos * (1 - betainc(alpha_y, beta_y, x)), axis=1), 0.0, 1.0)
+
+
+def prob_beta_b_mejor(alpha_a, beta_a, alpha_b, beta_b):
+    """
+    P(tasa_B > tasa_A) exacta (hasta la precisión de la cuadratura) para posteriores Beta.
+    """
+    return prob_beta_mayor(alpha_a, beta_a, alpha_b, beta_b)
+
+
+def perdida_esperada_beta(alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Pérdida esperada de elegir cada grupo: E[max(A - B, 0)] si se elige B y
+    E[max(B - A, 0)] si se elige A.
+
+    Usa E[A * 1{A > B}] = E[A] * P(A' > B) con A' ~ Beta(alpha_a + 1, beta_a), de modo
+    que todo se reduce a probabilidades P(Y > X) sin muestreo.
+    """
+    alpha_a, beta_a, alpha_b, beta_b = (
+        np.atleast_1d(np.asarray(x, dtype=float)) for x in (alpha_a, beta_a, alpha_b, beta_b)
+    )
+    media_a = alpha_a / (alpha_a + beta_a)
+    media_b = alpha_b / (alpha_b + beta_b)
+
+    # E[max(A - B, 0)] = E[A 1{A>B}] - E[B 1{A>B}]
+    perdida_b = (media_a * prob_beta_mayor(alpha_b, beta_b, alpha_a + 1, beta_a)
+                 - media_b * prob_beta_mayor(alpha_b + 1, beta_b, alpha_a, beta_a))
+    # E[max(B - A, 0)] = E[max(A - B, 0)] + E[B] - E[A]
+    perdida_a = perdida_b + media_b - media_a
+    return {"A": np.maximum(perdida_a, 0.0), "B": np.maximum(perdida_b, 0.0)}
+
+
+def _cdf_pdf_ratio_beta(r, soporte_a, soporte_b, alpha_a, beta_a, alpha_b, beta_b):
+    """
+    CDF y densidad de R = B / A en r integrando sobre A, con la cuadratura partida
+    donde B / r recorre el soporte de B (ahí cambian F_B(r A) y f_B(r A)).
+    """
+    r = r[:, np.newaxis]
+    x, pesos = _nodos_tramos(*soporte_a, np.concatenate(soporte_b, axis=-1) / r, alpha_a < 1, beta_a < 1)
+    pesos = pesos * stats.beta.pdf(x, alpha_a, beta_a)
+    y = r * x
+    cdf = np.sum(pesos * betainc(alpha_b, beta_b, np.minimum(y, 1.0)), axis=1)
+    pdf = np.sum(pesos * x * stats.beta.pdf(y, alpha_b, beta_b), axis=1)
+    return cdf, pdf
+
+
+def cuantiles_uplift_beta(alpha_a, beta_a, alpha_b, beta_b, probabilidades=(0.025, 0.975),
+                          tolerancia=1e-8, max_iter=60):
+    """
+    Cuantiles del uplift (B - A) / A con posteriores Beta, sin muestreo.
+
+    Invierte la CDF de B / A, obtenida por cuadratura, con Newton protegido por
+    bisección (vectorizado sobre todos los días). Devuelve un array (dias, len(probabilidades)).
+    """
+    alpha_a, beta_a, alpha_b, beta_b = (
+        np.atleast_1d(np.asarray(x, dtype=float)) for x in (alpha_a, beta_a, alpha_b, beta_b)
+    )
+    aa, ba = alpha_a[:, np.newaxis], beta_a[:, np.newaxis]
+    ab, bb = alpha_b[:, np.newaxis], beta_b[:, np.newaxis]
+    soporte_a, soporte_b = _soporte_beta(aa, ba), _soporte_beta(ab, bb)
+
+    # Intervalo que seguro contiene el cuantil y punto de partida log-normal
+    lo_inicial = soporte_b[0][:, 0] / soporte_a[1][:, 0]
+    hi_inicial = soporte_b[1][:, 0] / soporte_a[0][:, 0]
+    media_log = (np.log(alpha_b / (alpha_b + beta_b)) - np.log(alpha_a / (alpha_a + beta_a)))
+    var_log = (beta_a / (alpha_a * (alpha_a + beta_a + 1)) + beta_b / (alpha_b * (alpha_b + beta_b + 1)))
+
+    resultado = np.empty((len(alpha_a), len(probabilidades)))
+    for k, p in enumerate(probabilidades):
+        lo, hi = lo_inicial.copy(), hi_inicial.copy()
+        r = np.clip(np.exp(media_log + stats.norm.ppf(p) * np.sqrt(var_log)), lo, hi)
+        for _ in range(max_iter):
+            cdf, pdf = _cdf_pdf_ratio_beta(r, soporte_a, soporte_b, aa, ba, ab, bb)
+            exceso = cdf - p
+            hi = np.where(exceso > 0, r, hi)
+            lo = np.where(exceso <= 0, r, lo)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                r_nuevo = r - exceso / pdf
+            fuera = ~np.isfinite(r_nuevo) | (r_nuevo < lo) | (r_nuevo > hi)
+            r_nuevo = np.where(fuera, (lo + hi) / 2, r_nuevo)
+            convergido = np.abs(r_nuevo - r) <= tolerancia * np.abs(r)
+            r = r_nuevo
+            if np.all(convergido):
+                break
+        resultado[:, k] = r - 1.0
+    return resultado
+
+
+def uplift_medio_beta(alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Media exacta del uplift con posteriores Beta, cerrada:
+    E[B / A] = E[B] * E[1 / A] = E[B] * (alpha_a + beta_a - 1) / (alpha_a - 1).
+
+    Con alpha_a <= 1 E[1 / A] diverge (p. ej. el primer día sin conversiones en A
+    con el prior Beta(1, 1)); esos días se da la mediana del uplift, que es finita.
+    """
+    alpha_a, beta_a, alpha_b, beta_b = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (alpha_a, beta_a, alpha_b, beta_b))
+    )
+    media_b = alpha_b / (alpha_b + beta_b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media = media_b * (alpha_a + beta_a - 1) / (alpha_a - 1) - 1
+    sin_media = alpha_a <= 1
+    if np.any(sin_media):
+        media[sin_media] = cuantiles_uplift_beta(alpha_a[sin_media], beta_a[sin_media], alpha_b[sin_media],
+                                                 beta_b[sin_media], probabilidades=(0.5,))[:, 0]
+    return media
+
+
+def resumen_uplift_beta(alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Media (uplift_medio_beta) e IC 95% exactos del uplift con posteriores Beta.
+    """
+    return {
+        "media": uplift_medio_beta(alpha_a, beta_a, alpha_b, beta_b),
+        "ic_95": cuantiles_uplift_beta(alpha_a, beta_a, alpha_b, beta_b),
+    }
+
+
+def perdida_esperada_gamma(alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Pérdida esperada de elegir cada grupo con posteriores Gamma: E[max(A - B, 0)]
+    si se elige B y E[max(B - A, 0)] si se elige A.
+
+    Mismo razonamiento que perdida_esperada_beta: E[A * 1{A > B}] = E[A] * P(A' > B)
+    con A' ~ Gamma(alpha_a + 1, beta_a), y esas probabilidades son cerradas
+    (prob_gamma_b_mejor), así que no hace falta cuadratura.
+    """
+    alpha_a, beta_a, alpha_b, beta_b = (
+        np.atleast_1d(np.asarray(x, dtype=float)) for x in (alpha_a, beta_a, alpha_b, beta_b)
+    )
+    media_a = alpha_a / beta_a
+    media_b = alpha_b / beta_b
+
+    # E[max(A - B, 0)] = E[A 1{A>B}] - E[B 1{A>B}]
+    perdida_b = (media_a * prob_gamma_b_mejor(alpha_b, beta_b, alpha_a + 1, beta_a)
+                 - media_b * prob_gamma_b_mejor(alpha_b + 1, beta_b, alpha_a, beta_a))
+    perdida_a = perdida_b + media_b - media_a
+    return {"A": np.maximum(perdida_a, 0.0), "B": np.maximum(perdida_b, 0.0)}
+
+
+def _lider_y_otro(alpha_a, beta_a, alpha_b, beta_b, b_mejor):
+    """
+    Parámetros del grupo que lidera y del otro en cada día, en ese orden.
+    """
+    return (np.where(b_mejor, alpha_b, alpha_a), np.where(b_mejor, beta_b, beta_a),
+            np.where(b_mejor, alpha_a, alpha_b), np.where(b_mejor, beta_a, beta_b))
+
+
+def valor_restante_beta(alpha_a, beta_a, alpha_b, beta_b, prob_b_mejor=None, nivel=0.95):
+    """
+    Valor potencial restante con posteriores Beta: percentil nivel de
+    (max(A, B) - L) / L, donde L es el grupo con más probabilidad de ser el mejor.
+    Mide cuánto (en relativo) se podría estar dejando de ganar si se eligiera L ya.
+
+    Es el cuantil nivel del uplift del otro grupo sobre L, así que reutiliza
+    cuantiles_uplift_beta (cuadratura vectorizada) con L en el papel de A. Sacarlo
+    directamente, y no invirtiendo el cuantil 1 - nivel de B / A, lo mantiene
+    finito también cuando ese cuantil es casi -1.
+    """
+    alpha_a, beta_a, alpha_b, beta_b = (
+        np.atleast_1d(np.asarray(x, dtype=float)) for x in (alpha_a, beta_a, alpha_b, beta_b)
+    )
+    if prob_b_mejor is None:
+        prob_b_mejor = prob_beta_b_mejor(alpha_a, beta_a, alpha_b, beta_b)
+    b_mejor = np.broadcast_to(np.asarray(prob_b_mejor) >= 0.5, alpha_a.shape)
+    cuantil = cuantiles_uplift_beta(*_lider_y_otro(alpha_a, beta_a, alpha_b, beta_b, b_mejor),
+                                    probabilidades=(nivel,))[:, 0]
+    return np.maximum(cuantil, 0.0)
+
+
+def valor_restante_gamma(alpha_a, beta_a, alpha_b, beta_b, prob_b_mejor=None, nivel=0.95):
+    """
+    Valor potencial restante con posteriores Gamma (ver valor_restante_beta).
+    El cuantil del uplift es cerrado: la ppf de la F de distribucion_uplift_gamma.
+    """
+    alpha_a, beta_a, alpha_b, beta_b = (
+        np.atleast_1d(np.asarray(x, dtype=float)) for x in (alpha_a, beta_a, alpha_b, beta_b)
+    )
+    if prob_b_mejor is None:
+        prob_b_mejor = prob_gamma_b_mejor(alpha_a, beta_a, alpha_b, beta_b)
+    b_mejor = np.broadcast_to(np.asarray(prob_b_mejor) >= 0.5, alpha_a.shape)
+    cuantil = distribucion_uplift_gamma(*_lider_y_otro(alpha_a, beta_a, alpha_b, beta_b, b_mejor)).ppf(nivel)
+    return np.maximum(cuantil, 0.0)
+
+
+FAMILIAS = ("beta", "gamma")
+
+
+def comparar_grupos(familia, alpha, beta):
+    """
+    Comparación de K posteriores independientes de la misma familia ("beta" o
+    "gamma") sin muestreo. alpha y beta son arrays (..., K), por ejemplo (dias, K).
+
+    Con la cuadratura de cada grupo k (partida por los soportes de los demás) se
+    integra a la vez:
+    - prob_mejor (..., K): P(k es el mejor) = E_k[prod_{j != k} F_j(X_k)]
+    - prob_mayor (..., K, K): P(X_i > X_j) = E_i[F_j(X_i)] en [i, j] (NaN en la diagonal)
+    - perdida (..., K): pérdida esperada de elegir k, E[max_j X_j] - E[X_k], con
+      E[max] = sum_k E_k[X_k prod_{j != k} F_j(X_k)]
+    """
+    if familia not in FAMILIAS:
+        raise ValueError(f"familia debe ser una de {FAMILIAS}, no {familia!r}")
+    alpha, beta = np.broadcast_arrays(np.asarray(alpha, dtype=float), np.asarray(beta, dtype=float))
+    k = alpha.shape[-1]
+    # Cortes de la cuadratura de cada grupo: los soportes de los demás (..., K, 2 (K - 1))
+    otros = np.array([[j for j in range(k) if j != i] for i in range(k)], dtype=int).reshape(k, k - 1)
+    if familia == "beta":
+        lo, hi = _soporte_beta(alpha, beta)
+        x, pesos = _cuadratura_beta(alpha, beta, np.concatenate([lo[..., otros], hi[..., otros]], axis=-1))
+        media = alpha / (alpha + beta)
+    else:
+        lo, hi = _soporte_gamma(alpha, beta)
+        x, pesos = _cuadratura_gamma(alpha, beta, np.concatenate([lo[..., otros], hi[..., otros]], axis=-1))
+        media = alpha / beta
+
+    # cdf[..., j, k, :] = F_j en los nodos del grupo k
+    alpha_j = alpha[..., :, np.newaxis, np.newaxis]
+    beta_j = beta[..., :, np.newaxis, np.newaxis]
+    nodos = x[..., np.newaxis, :, :]
+    if familia == "beta":
+        cdf = betainc(alpha_j, beta_j, nodos)
+    else:
+        cdf = gammainc(alpha_j, beta_j * nodos)
+
+    diagonal = np.eye(k, dtype=bool)
+    producto = np.prod(np.where(diagonal[:, :, np.newaxis], 1.0, cdf), axis=-3)
+    prob_mejor = np.clip(np.sum(pesos * producto, axis=-1), 0.0, 1.0)
+    prob_mayor = np.clip(np.swapaxes(np.sum(pesos[..., np.newaxis, :, :] * cdf, axis=-1), -1, -2), 0.0, 1.0)
+    prob_mayor = np.where(diagonal, np.nan, prob_mayor)
+    maximo = np.sum(pesos * x * producto, axis=(-2, -1))
+    return {
+        "media": media,
+        "prob_mejor": prob_mejor,
+        "prob_mayor": prob_mayor,
+        "perdida": np.maximum(maximo[..., np.newaxis] - media, 0.0),
+    }
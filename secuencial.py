@@ -0,0 +1,211 @@
+# secuencial.py
+#
+# Tests secuenciales: reglas de parada que siguen siendo válidas aunque se mire
+# el experimento todos los días.
+#
+#   "msprt"             mixture SPRT con p-valor siempre válido (Johari et al.)
+#   "gasto_alfa"        fronteras de grupo secuencial con función de gasto de alfa
+#                       (Lan-DeMets, tipo O'Brien-Fleming o Pocock)
+#   "perdida_esperada"  parada bayesiana cuando la pérdida esperada del mejor
+#                       grupo baja de un umbral
+#
+# Las fronteras de "gasto_alfa" se calculan una vez por diseño (lru_cache), así que
+# evaluar un día nuevo es O(1): un estadístico y una comparación.
+from functools import lru_cache
+
+import numpy as np
+from scipy import stats
+from scipy.optimize import brentq
+
+REGLAS = ("msprt", "gasto_alfa", "perdida_esperada")
+FUNCIONES_GASTO = ("obrien_fleming", "pocock")
+
+# Nodos de Gauss-Legendre para integrar la densidad del estadístico entre miradas
+NODOS_FRONTERAS = 200
+_NODOS_GL, _PESOS_GL = np.polynomial.legendre.leggauss(NODOS_FRONTERAS)
+
+# Frontera (en z) que se usa cuando a una mirada no le corresponde alfa gastado
+Z_MAXIMO = 8.0
+
+
+def alfa_gastado(t, alpha=0.05, gasto="obrien_fleming"):
+    """
+    Alfa acumulado (bilateral) que se ha gastado con una fracción de información
+    t en (0, 1]. En el tipo O'Brien-Fleming cada cola gasta alpha / 2 con la
+    función de Lan-DeMets 2 - 2 * Phi(z_{alpha/4} / sqrt(t)).
+    """
+    t = np.asarray(t, dtype=float)
+    if gasto == "obrien_fleming":
+        return 4 * stats.norm.sf(stats.norm.isf(alpha / 4) / np.sqrt(t))
+    if gasto == "pocock":
+        return alpha * np.log1p((np.e - 1) * t)
+    raise ValueError(f"gasto debe ser uno de {FUNCIONES_GASTO}, no {gasto!r}")
+
+
+@lru_cache(maxsize=64)
+def fronteras_gasto_alfa(n_miradas, alpha=0.05, gasto="obrien_fleming"):
+    """
+    Fronteras z bilaterales de un diseño de grupo secuencial con n_miradas
+    equiespaciadas: se rechaza en la mirada k si |z_k| >= fronteras[k - 1].
+
+    Se resuelven mirada a mirada para que la probabilidad de cruzar por primera
+    vez en k bajo H0 sea el alfa que gasta esa mirada. La densidad del proceso
+    (B(t) = z * sqrt(t)) en la región de continuación se propaga con cuadratura
+    de Gauss-Legendre. Se cachea por diseño y devuelve una tupla.
+    """
+    if n_miradas < 1:
+        raise ValueError("n_miradas debe ser al menos 1")
+    t = np.arange(1, n_miradas + 1) / n_miradas
+    gastos = np.diff(alfa_gastado(t, alpha, gasto), prepend=0.0)
+    delta = 1.0 / n_miradas
+    desviacion = np.sqrt(delta)
+
+    fronteras = []
+    x = pesos = densidad = None
+    for k in range(n_miradas):
+        limite = Z_MAXIMO * np.sqrt(t[k])
+        if k == 0:
+            def exceso(b):
+                return 2 * stats.norm.sf(b / desviacion) - gastos[0]
+        else:
+            def exceso(b):
+                cola = stats.norm.sf((b - x) / desviacion) + stats.norm.cdf((-b - x) / desviacion)
+                return np.sum(pesos * densidad * cola) - gastos[k]
+
+        b = limite if exceso(limite) >= 0 else brentq(exceso, 1e-9, limite, xtol=1e-10)
+        fronteras.append(float(b / np.sqrt(t[k])))
+
+        # Densidad de B(t_k) en (-b, b), sin la masa que ya ha cruzado
+        y = b * _NODOS_GL
+        if k == 0:
+            densidad_nueva = stats.norm.pdf(y, scale=desviacion)
+        else:
+            nucleo = stats.norm.pdf((y[:, np.newaxis] - x[np.newaxis, :]) / desviacion) / desviacion
+            densidad_nueva = nucleo @ (pesos * densidad)
+        x, pesos, densidad = y, b * _PESOS_GL, densidad_nueva
+    return tuple(fronteras)
+
+
+def log_razon_msprt(diferencia, varianza, tau):
+    """
+    log del mixture likelihood ratio de H0: diferencia = 0 con mezcla normal
+    N(0, tau²) sobre el efecto y estimador aproximadamente normal con esa varianza.
+    """
+    diferencia = np.asarray(diferencia, dtype=float)
+    varianza = np.asarray(varianza, dtype=float)
+    tau2 = tau ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (0.5 * np.log(varianza / (varianza + tau2))
+                + tau2 * diferencia ** 2 / (2 * varianza * (varianza + tau2)))
+
+
+class DisenoSecuencial:
+    """
+    Regla de parada secuencial. Trabaja sobre resúmenes acumulados que da cada
+    calculadora (resumen_secuencial):
+    - diferencia: estimación de B - A con los datos acumulados
+    - error_estandar: su error estándar
+    - perdida_a / perdida_b: pérdidas esperadas de elegir A / B (solo bayesianas)
+
+    evaluar() decide una mirada en O(1) a partir del resultado de la anterior;
+    evaluar_serie() aplica la regla a todas las miradas de un historial a la vez.
+    """
+
+    def __init__(self, regla="msprt", alpha=0.05, n_miradas=None, gasto="obrien_fleming",
+                 tau=0.01, umbral_perdida=0.001):
+        if regla not in REGLAS:
+            raise ValueError(f"regla debe ser una de {REGLAS}, no {regla!r}")
+        self.regla = regla
+        self.alpha = alpha
+        self.tau = tau
+        self.umbral_perdida = umbral_perdida
+        self.n_miradas = n_miradas
+        self.gasto = gasto
+        self.fronteras = None
+        if regla == "gasto_alfa":
+            if not n_miradas:
+                raise ValueError("La regla 'gasto_alfa' necesita n_miradas (miradas planificadas)")
+            self.fronteras = np.array(fronteras_gasto_alfa(int(n_miradas), alpha, gasto))
+
+    def frontera(self, mirada):
+        """
+        Frontera de la mirada (1, 2, ...) en la escala del estadístico de la regla:
+        |z| para "gasto_alfa", p-valor para "msprt" y pérdida para "perdida_esperada".
+        """
+        if self.regla == "gasto_alfa":
+            return self.fronteras[min(mirada, self.n_miradas) - 1]
+        if self.regla == "msprt":
+            return self.alpha
+        return self.umbral_perdida
+
+    def _estadistico(self, resumenes):
+        """
+        Estadístico de la regla en cada mirada (sin acumular) y grupo que va delante.
+        """
+        if self.regla == "perdida_esperada":
+            perdida_a = np.asarray(resumenes["perdida_a"], dtype=float)
+            perdida_b = np.asarray(resumenes["perdida_b"], dtype=float)
+            return np.minimum(perdida_a, perdida_b), np.where(perdida_b <= perdida_a, "B", "A")
+
+        diferencia = np.asarray(resumenes["diferencia"], dtype=float)
+        error = np.asarray(resumenes["error_estandar"], dtype=float)
+        lider = np.where(diferencia >= 0, "B", "A")
+        if self.regla == "msprt":
+            razon = np.exp(-log_razon_msprt(diferencia, error ** 2, self.tau))
+            return np.minimum(np.nan_to_num(razon, nan=1.0), 1.0), lider
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.abs(np.where(error > 0, diferencia / error, 0.0)), lider
+
+    def _cruza(self, estadistico, frontera, mirada):
+        if self.regla == "gasto_alfa":
+            return (estadistico >= frontera) & (mirada <= self.n_miradas)
+        return estadistico <= frontera
+
+    def evaluar_serie(self, resumenes, primera_mirada=1):
+        """
+        resumenes: {campo: array} con una posición por mirada, empezando en
+        primera_mirada (más de 1 si el historial no contiene los primeros días). Devuelve
+        {estadistico, frontera, cruza} por mirada y la decisión con los datos
+        de todas ellas: la primera mirada que cruza la frontera detiene el test
+        (aunque las siguientes ya no la crucen); sin cruces, no se para.
+        """
+        estadistico, lider = self._estadistico(resumenes)
+        if self.regla == "msprt":
+            # p-valor siempre válido: mínimo acumulado de 1 / razón
+            estadistico = np.minimum.accumulate(estadistico)
+        miradas = np.arange(primera_mirada, primera_mirada + len(estadistico))
+        frontera = np.array([self.frontera(m) for m in miradas], dtype=float)
+        cruza = self._cruza(estadistico, frontera, miradas)
+
+        decision = {"parar": False, "mirada_parada": None, "ganador": None,
+                    "lider": str(lider[-1]) if len(lider) else None}
+        cruces = np.nonzero(cruza)[0]
+        if len(cruces):
+            k = cruces[0]
+            decision = {"parar": True, "mirada_parada": int(miradas[k]), "ganador": str(lider[k]),
+                        "lider": str(lider[k])}
+        return {"estadistico": estadistico, "frontera": frontera, "cruza": cruza, **decision}
+
+    def evaluar(self, resumen, mirada, anterior=None):
+        """
+        Decisión en la mirada (1, 2, ...) con los resúmenes acumulados hasta ella
+        ({campo: escalar}). anterior es el resultado de la mirada previa: con él la
+        evaluación es O(1), porque el p-valor del mSPRT es un mínimo acumulado y
+        una parada es definitiva.
+        """
+        if anterior is not None and anterior["parar"]:
+            return anterior
+        estadistico, lider = self._estadistico({campo: [valor] for campo, valor in resumen.items()})
+        estadistico, lider = float(estadistico[0]), str(lider[0])
+        if self.regla == "msprt" and anterior is not None:
+            estadistico = min(estadistico, anterior["estadistico"])
+        frontera = float(self.frontera(mirada))
+        cruza = bool(self._cruza(estadistico, frontera, mirada))
+        return {
+            "estadistico": estadistico,
+            "frontera": frontera,
+            "parar": cruza,
+            "mirada_parada": mirada if cruza else None,
+            "ganador": lider if cruza else None,
+            "lider": lider,
+        }
@@ -0,0 +1,318 @@
+# servicio.py
+#
+# Capa sin Streamlit: las calculadoras como operaciones JSON sobre un pool de
+# experimentos, servidas por HTTP o ejecutadas por lotes desde un JSONL.
+#
+#   python servicio.py servir --puerto 8000
+#   python servicio.py lote operaciones.jsonl > resultados.jsonl
+#   python servicio.py lote --almacen experimentos.sqlite nuevos_dias.jsonl   # estado persistente
+#
+# Rutas HTTP:
+#   GET    /experimentos                      -> experimentos del pool
+#   POST   /experimentos/{id}                 -> crear ({"modelo": ..., "parametros": {...}})
+#   POST   /experimentos/{id}/datos           -> actualizar_con_datos / procesar_serie
+#   GET    /experimentos/{id}/ganador         -> detectar_ganador (?umbral_probabilidad=&umbral_mejora_minima=
+#                                                  &criterio=&umbral_perdida=&umbral_valor_restante=)
+#   DELETE /experimentos/{id}                 -> eliminar
+#   POST   /frecuentista                      -> ConversionFrecuentistaMultiGrupo (sin estado)
+import argparse
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from calculadora_frecuentista import ConversionFrecuentistaMultiGrupo
+from almacen import AlmacenExperimentos
+from modelos import MODELOS_CONTEOS, crear_calculadora, modelo_de
+
+CAMPOS_DATOS = ("conv_a", "visitas_a", "conv_b", "visitas_b")
+
+
+def dias_procesados(calculadora):
+    # Sin contar el paso "A priori"; incluye los pasos que no están en memoria
+    return calculadora.pasos_previos + len(calculadora.historial) - 1
+
+
+class PoolCalculadoras:
+    """
+    Calculadoras vivas indexadas por ID de experimento.
+
+    Cada experimento tiene su propio lock, así que peticiones a experimentos
+    distintos no se bloquean entre sí y las de uno mismo se serializan.
+
+    Con un AlmacenExperimentos, los experimentos que no están en memoria se
+    restauran desde él (solo su último paso) y cada paso nuevo se persiste.
+    """
+
+    def __init__(self, almacen=None):
+        self._experimentos = {}     # id -> (modelo, calculadora, lock)
+        self._lock = threading.Lock()
+        self.almacen = almacen
+
+    def __contains__(self, experimento):
+        return experimento in self._experimentos
+
+    def __len__(self):
+        return len(self._experimentos)
+
+    def crear(self, experimento, modelo, **parametros):
+        if modelo not in MODELOS_CONTEOS:
+            # Los datos del servicio son conv/visitas por día (CAMPOS_DATOS)
+            raise ValueError(f"El servicio solo admite modelos de conteos ({', '.join(MODELOS_CONTEOS)})")
+        with self._lock:
+            if experimento in self._experimentos or (self.almacen is not None and experimento in self.almacen):
+                raise ValueError(f"El experimento '{experimento}' ya existe")
+            if self.almacen is not None:
+                calculadora = self.almacen.crear(experimento, modelo, **parametros)
+            else:
+                calculadora = crear_calculadora(modelo, **parametros)
+            self._experimentos[experimento] = (modelo, calculadora, threading.Lock())
+        return calculadora
+
+    def eliminar(self, experimento):
+        with self._lock:
+            en_memoria = self._experimentos.pop(experimento, None) is not None
+            if self.almacen is not None and experimento in self.almacen:
+                self.almacen.eliminar(experimento)
+            elif not en_memoria:
+                raise KeyError(experimento)
+
+    def listar(self):
+        if self.almacen is not None:
+            return self.almacen.listar()
+        with self._lock:
+            elementos = list(self._experimentos.items())
+        return [
+            {"experimento": experimento, "modelo": modelo, "dias": dias_procesados(calculadora)}
+            for experimento, (modelo, calculadora, _) in elementos
+        ]
+
+    def _obtener(self, experimento):
+        with self._lock:
+            if experimento not in self._experimentos:
+                if self.almacen is None or experimento not in self.almacen:
+                    raise KeyError(experimento)
+                calculadora = self.almacen.restaurar(experimento)
+                self._experimentos[experimento] = (modelo_de(calculadora), calculadora, threading.Lock())
+            return self._experimentos[experimento]
+
+    def usar(self, experimento, funcion):
+        """
+        Ejecuta funcion(calculadora) con el lock del experimento y, si hay almacén,
+        guarda los pasos que haya añadido.
+        """
+        _, calculadora, lock = self._obtener(experimento)
+        with lock:
+            resultado = funcion(calculadora)
+            if self.almacen is not None:
+                self.almacen.guardar(experimento, calculadora)
+            return resultado
+
+
+
+def _actualizar(calculadora, datos):
+    """
+    Un día (escalares) con actualizar_con_datos o varios (listas) con procesar_serie.
+    """
+    faltantes = [campo for campo in CAMPOS_DATOS if campo not in datos]
+    if faltantes:
+        raise ValueError(f"Faltan campos: {', '.join(faltantes)}")
+    valores = [datos[campo] for campo in CAMPOS_DATOS]
+    if isinstance(valores[0], (list, tuple)):
+        calculadora.procesar_serie(*(np.asarray(v, dtype=np.int64) for v in valores), dias=datos.get("dias"))
+    else:
+        calculadora.actualizar_con_datos(*(int(v) for v in valores), dia=datos.get("dia"))
+
+
+def _umbrales(argumentos):
+    return {
+        clave: float(argumentos[clave])
+        for clave in ("umbral_probabilidad", "umbral_mejora_minima") if clave in argumentos
+    }
+
+
+def _criterio(argumentos):
+    # Criterio de decisión de las calculadoras bayesianas y sus umbrales
+    parametros = {
+        clave: float(argumentos[clave])
+        for clave in ("umbral_perdida", "umbral_valor_restante") if clave in argumentos
+    }
+    if "criterio" in argumentos:
+        parametros["criterio"] = argumentos["criterio"]
+    return {**_umbrales(argumentos), **parametros}
+
+
+def _frecuentista(argumentos):
+    grupos = argumentos.get("grupos")
+    if not isinstance(grupos, dict) or len(grupos) < 2:
+        raise ValueError("'grupos' debe ser un objeto con al menos dos grupos {'A': {'visitas': .., 'conv': ..}}")
+    calculadora = ConversionFrecuentistaMultiGrupo(**_umbrales(argumentos))
+    calculadora.analizar_datos(grupos)
+    return {
+        "grupos": calculadora.resultados["grupos"],
+        "comparaciones": calculadora.comparaciones_dataframe().to_dict(orient="records"),
+        "ganador_global": calculadora.obtener_ganador_global(),
+    }
+
+
+def ejecutar_operacion(pool, operacion, argumentos):
+    """
+    Punto de entrada común de HTTP y del modo por lotes. Devuelve un dict
+    serializable (con _a_json); KeyError si el experimento no existe y
+    ValueError si la petición no es válida.
+    """
+    experimento = argumentos.get("experimento")
+    if operacion == "listar":
+        return {"experimentos": pool.listar()}
+    if operacion == "frecuentista":
+        return _frecuentista(argumentos)
+    if experimento is None:
+        raise ValueError(f"La operación '{operacion}' necesita 'experimento'")
+
+    if operacion == "crear":
+        pool.crear(experimento, argumentos.get("modelo", "beta_binomial"), **argumentos.get("parametros", {}))
+        return {"experimento": experimento, "creado": True}
+    if operacion == "actualizar":
+        def actualizar(calculadora):
+            _actualizar(calculadora, argumentos)
+            return {
+                "experimento": experimento,
+                "dias": dias_procesados(calculadora),
+                "resultado": calculadora.detectar_ganador(**_criterio(argumentos)),
+            }
+        return pool.usar(experimento, actualizar)
+    if operacion == "ganador":
+        return pool.usar(experimento, lambda calculadora: {
+            "experimento": experimento,
+            "dias": dias_procesados(calculadora),
+            "resultado": calculadora.detectar_ganador(**_criterio(argumentos)),
+        })
+    if operacion == "eliminar":
+        pool.eliminar(experimento)
+        return {"experimento": experimento, "eliminado": True}
+    raise ValueError(f"Operación desconocida '{operacion}'")
+
+
+def _a_json(valor):
+    # Escalares y arrays de NumPy que devuelven las calculadoras
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    raise TypeError(f"{type(valor).__name__} no es serializable")
+
+
+def _ruta_a_operacion(metodo, ruta):
+    """
+    (operación, experimento) para una ruta HTTP, o None si no existe.
+    """
+    partes = [p for p in ruta.split("/") if p]
+    if metodo == "GET" and partes == ["experimentos"]:
+        return "listar", None
+    if metodo == "POST" and partes == ["frecuentista"]:
+        return "frecuentista", None
+    if len(partes) == 2 and partes[0] == "experimentos":
+        return {"POST": "crear", "DELETE": "eliminar"}.get(metodo), partes[1]
+    if len(partes) == 3 and partes[0] == "experimentos":
+        if metodo == "POST" and partes[2] == "datos":
+            return "actualizar", partes[1]
+        if metodo == "GET" and partes[2] == "ganador":
+            return "ganador", partes[1]
+    return None, None
+
+
+def crear_manejador(pool):
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, estado, cuerpo):
+            contenido = json.dumps(cuerpo, default=_a_json, ensure_ascii=False).encode("utf-8")
+            self.send_response(estado)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(contenido)))
+            self.end_headers()
+            self.wfile.write(contenido)
+
+        def _atender(self):
+            url = urlsplit(self.path)
+            operacion, experimento = _ruta_a_operacion(self.command, url.path)
+            if operacion is None:
+                self._responder(404, {"error": f"Ruta no encontrada: {self.command} {url.path}"})
+                return
+            try:
+                longitud = int(self.headers.get("Content-Length") or 0)
+                argumentos = json.loads(self.rfile.read(longitud) or b"{}") if longitud else {}
+                argumentos.update(parse_qsl(url.query))
+                if experimento is not None:
+                    argumentos["experimento"] = experimento
+                self._responder(200, ejecutar_operacion(pool, operacion, argumentos))
+            except KeyError as e:
+                self._responder(404, {"error": f"Experimento no encontrado: {e.args[0]}"})
+            except (ValueError, TypeError) as e:
+                self._responder(400, {"error": str(e)})
+
+        do_GET = do_POST = do_DELETE = _atender
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Manejador
+
+
+def servir(host="127.0.0.1", puerto=8000, pool=None):
+    servidor = ThreadingHTTPServer((host, puerto), crear_manejador(PoolCalculadoras() if pool is None else pool))
+    print(f"Servicio de calculadoras en http://{host}:{servidor.server_port}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+def procesar_lote(lineas, salida, pool=None):
+    """
+    Modo por lotes: cada línea es {"operacion": ..., "experimento": ..., ...} y por
+    cada una se escribe {"ok": true, "resultado": ...} o {"ok": false, "error": ...}.
+    """
+    if pool is None:
+        pool = PoolCalculadoras()
+    for linea in lineas:
+        if not linea.strip():
+            continue
+        try:
+            peticion = json.loads(linea)
+            respuesta = {"ok": True, "resultado": ejecutar_operacion(pool, peticion.pop("operacion", None), peticion)}
+        except KeyError as e:
+            respuesta = {"ok": False, "error": f"Experimento no encontrado: {e.args[0]}"}
+        except (ValueError, TypeError) as e:
+            respuesta = {"ok": False, "error": str(e)}
+        salida.write(json.dumps(respuesta, default=_a_json, ensure_ascii=False) + "\n")
+    return pool
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculadoras A/B sin interfaz")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    p_servir = subparsers.add_parser("servir", help="servidor HTTP con API JSON")
+    p_servir.add_argument("--host", default="127.0.0.1")
+    p_servir.add_argument("--puerto", type=int, default=8000)
+    p_lote = subparsers.add_parser("lote", help="ejecuta las operaciones de un JSONL")
+    p_lote.add_argument("archivo", nargs="?", default="-", help="JSONL de operaciones ('-' = stdin)")
+    for p in (p_servir, p_lote):
+        p.add_argument("--almacen", help="SQLite donde persistir los experimentos entre ejecuciones")
+    args = parser.parse_args(argv)
+
+    pool = PoolCalculadoras(AlmacenExperimentos(args.almacen) if args.almacen else None)
+    if args.comando == "servir":
+        servir(args.host, args.puerto, pool)
+    elif args.archivo == "-":
+        procesar_lote(sys.stdin, sys.stdout, pool)
+    else:
+        with open(args.archivo, encoding="utf-8") as f:
+            procesar_lote(f, sys.stdout, pool)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# sesiones.py
+import numpy as np
+import pandas as pd
+
+from ingesta import COLUMNAS_REQUERIDAS, estadisticos_por_dia, leer_bloques
+
+# Columnas del log de eventos a nivel de sesión
+COLUMNAS_EVENTOS = ['session_id', 'group', 'timestamp', 'value']
+
+# Filas leídas por bloque al recorrer el log
+TAM_BLOQUE = 1_000_000
+
+# Sesiones parciales acumuladas antes de fusionarlas con el estado
+MIN_PENDIENTES = 2_000_000
+
+_NS_POR_DIA = 86_400 * 10**9
+_AGREGACION = {'grupo_min': 'min', 'grupo_max': 'max', 'inicio': 'min', 'valor': 'sum', 'eventos': 'sum'}
+
+
+class AgregadorSesiones:
+    """
+    Agrega un log de eventos (session_id, group, timestamp, value) por sesión,
+    bloque a bloque, sin cargar nunca el log completo.
+
+    Por cada sesión solo se guardan sus estadísticos suficientes: grupo, inicio
+    (primer timestamp), suma de valores y número de eventos. La memoria crece con
+    el número de sesiones distintas, no con el de eventos. Las sesiones repetidas
+    en varios bloques se fusionan; las que aparecen en más de un grupo se cuentan
+    como contaminadas y se excluyen del análisis.
+    """
+
+    def __init__(self, columnas=COLUMNAS_EVENTOS):
+        self.columna_sesion, self.columna_grupo, self.columna_tiempo, self.columna_valor = columnas
+        self._codigos = {}          # etiqueta de grupo -> código entero
+        self._estado = None         # DataFrame indexado por sesión
+        self._parciales = []
+        self._pendientes = 0
+        self.eventos = 0
+
+    @property
+    def grupos(self):
+        return list(self._codigos)
+
+    def agregar_bloque(self, df):
+        """
+        Incorpora un bloque de eventos (un DataFrame con las columnas del log).
+        """
+        faltantes = [c for c in (self.columna_sesion, self.columna_grupo,
+                                 self.columna_tiempo, self.columna_valor) if c not in df.columns]
+        if faltantes:
+            raise ValueError(f"Faltan columnas: {', '.join(faltantes)}")
+        if len(df) == 0:
+            return
+
+        etiquetas = df[self.columna_grupo].astype(str)
+        for etiqueta in pd.unique(etiquetas):
+            self._codigos.setdefault(etiqueta, len(self._codigos))
+        codigos = pd.Categorical(etiquetas, categories=list(self._codigos)).codes
+
+        marcas = pd.to_datetime(df[self.columna_tiempo])
+        if marcas.dt.tz is not None:
+            marcas = marcas.dt.tz_convert(None)
+
+        parcial = pd.DataFrame({
+            'sesion': df[self.columna_sesion].to_numpy(),
+            'grupo_min': codigos,
+            'grupo_max': codigos,
+            'inicio': marcas.to_numpy(dtype='datetime64[ns]').view(np.int64),
+            'valor': pd.to_numeric(df[self.columna_valor], errors='coerce').fillna(0).to_numpy(dtype=float),
+            'eventos': np.ones(len(df), dtype=np.int64),
+        }).groupby('sesion', sort=False).agg(_AGREGACION)
+
+        self.eventos += len(df)
+        self._parciales.append(parcial)
+        self._pendientes += len(parcial)
+        tam_estado = 0 if self._estado is None else len(self._estado)
+        if self._pendientes >= max(MIN_PENDIENTES, tam_estado):
+            self._compactar()
+
+    def agregar_archivo(self, fuente, formato="csv", tam_bloque=TAM_BLOQUE, progreso=None):
+        """
+        Recorre un CSV o Parquet (ruta o buffer) en bloques de tam_bloque filas.
+        progreso(eventos_leidos) se llama tras cada bloque.
+        """
+        columnas = [self.columna_sesion, self.columna_grupo, self.columna_tiempo, self.columna_valor]
+        for bloque in leer_bloques(fuente, columnas, formato, tam_bloque):
+            self.agregar_bloque(bloque)
+            if progreso is not None:
+                progreso(self.eventos)
+        return self
+
+    def _compactar(self):
+        if not self._parciales:
+            return
+        partes = self._parciales if self._estado is None else [self._estado] + self._parciales
+        self._estado = pd.concat(partes).groupby(level=0, sort=False).agg(_AGREGACION)
+        self._parciales = []
+        self._pendientes = 0
+
+    def sesiones(self):
+        """
+        Una fila por sesión: grupo, dia (fecha del primer evento), valor, eventos.
+        Excluye las sesiones contaminadas (ver sesiones_contaminadas).
+        """
+        self._compactar()
+        if self._estado is None:
+            return pd.DataFrame(columns=['grupo', 'dia', 'valor', 'eventos'])
+        estado = self._estado[self._estado['grupo_min'] == self._estado['grupo_max']]
+        return pd.DataFrame({
+            'grupo': pd.Categorical.from_codes(estado['grupo_min'].to_numpy(), categories=self.grupos),
+            'dia': (estado['inicio'].to_numpy() // _NS_POR_DIA).astype('datetime64[D]'),
+            'valor': estado['valor'].to_numpy(),
+            'eventos': estado['eventos'].to_numpy(),
+        }, index=estado.index)
+
+    @property
+    def sesiones_contaminadas(self):
+        """
+        Sesiones que aparecen en más de un grupo.
+        """
+        self._compactar()
+        if self._estado is None:
+            return 0
+        return int((self._estado['grupo_min'] != self._estado['grupo_max']).sum())
+
+    def _conversiones(self, sesiones, tipo_valores):
+        # 0/1: la sesión convierte si suma algún valor; 0-inf: se suman los valores,
+        # que son conteos (clicks) para el modelo Gamma–Poisson
+        if tipo_valores == "0_1":
+            return (sesiones['valor'] > 0).astype(np.int64)
+        valores = sesiones['valor'].to_numpy(dtype=float)
+        if not np.all(valores == np.round(valores)):
+            raise ValueError("Con tipo_valores='0_inf' los valores de las sesiones tienen que ser "
+                             "conteos enteros (Gamma–Poisson)")
+        return sesiones['valor'].astype(np.int64)
+
+    def _pareja_grupos(self, grupos):
+        if grupos is None:
+            if len(self._codigos) != 2:
+                raise ValueError(f"Se esperaban 2 grupos y el log tiene {len(self._codigos)}: {self.grupos}")
+            grupos = sorted(self._codigos)
+        return grupos
+
+    def resumen_diario(self, tipo_valores="0_1", grupos=None):
+        """
+        Conteos diarios en el formato del CSV agregado (Día, Conversiones A, Visitas A,
+        Conversiones B, Visitas B), listos para actualizar_con_lote().
+
+        Cada sesión cuenta una visita el día de su primer evento. grupos es la pareja
+        de etiquetas (A, B) del log; por defecto, las dos únicas que haya.
+        """
+        grupos = self._pareja_grupos(grupos)
+        sesiones = self.sesiones()
+        sesiones = sesiones.assign(conv=self._conversiones(sesiones, tipo_valores))
+
+        por_dia = sesiones.groupby(['dia', 'grupo'], observed=False).agg(
+            visitas=('conv', 'size'), conversiones=('conv', 'sum'))
+        ancho = por_dia.unstack('grupo', fill_value=0)
+        etiqueta_a, etiqueta_b = grupos
+        resumen = pd.DataFrame({
+            'Día': [str(dia.date()) for dia in pd.to_datetime(ancho.index)],
+            'Conversiones A': ancho[('conversiones', etiqueta_a)].to_numpy(),
+            'Visitas A': ancho[('visitas', etiqueta_a)].to_numpy(),
+            'Conversiones B': ancho[('conversiones', etiqueta_b)].to_numpy(),
+            'Visitas B': ancho[('visitas', etiqueta_b)].to_numpy(),
+        })
+        return resumen[COLUMNAS_REQUERIDAS]
+
+    def estadisticos_diarios(self, grupos=None):
+        """
+        Estadísticos suficientes por día de los valores de las sesiones
+        (ingesta.estadisticos_por_dia), listos para CalculadoraIngresosBayesiana:
+        cada sesión es un usuario con la suma de sus valores, el día de su primer
+        evento. grupos como en resumen_diario; pasan a llamarse A y B.
+        """
+        etiqueta_a, etiqueta_b = self._pareja_grupos(grupos)
+        sesiones = self.sesiones().sort_values('dia', kind='stable')
+        grupo = sesiones['grupo'].astype(str).to_numpy()
+        en_pareja = np.isin(grupo, [etiqueta_a, etiqueta_b])
+        sesiones, grupo = sesiones[en_pareja], grupo[en_pareja]
+        return estadisticos_por_dia(pd.DataFrame({
+            'Día': pd.to_datetime(sesiones['dia']).dt.strftime('%Y-%m-%d').to_numpy(),
+            'Grupo': np.where(grupo == etiqueta_a, 'A', 'B'),
+            'Valor': sesiones['valor'].to_numpy(dtype=float),
+        }))
+
+    def totales(self, tipo_valores="0_1"):
+        """
+        Totales por grupo en el formato de ConversionFrecuentistaMultiGrupo.analizar_datos:
+        {grupo: {'visitas': sesiones, 'conv': conversiones}}.
+        """
+        sesiones = self.sesiones()
+        sesiones = sesiones.assign(conv=self._conversiones(sesiones, tipo_valores))
+        por_grupo = sesiones.groupby('grupo', observed=False)['conv'].agg(['size', 'sum'])
+        return {
+            grupo: {'visitas': int(por_grupo.loc[grupo, 'size']), 'conv': por_grupo.loc[grupo, 'sum'].item()}
+            for grupo in sorted(por_grupo.index)
+        }
@@ -0,0 +1,63 @@
+# tests/test_almacen.py
+import numpy as np
+import pytest
+
+from almacen import AlmacenExperimentos
+from secuencial import DisenoSecuencial
+
+CONV_A, VISITAS_A = [30, 42, 35], [1_000, 1_200, 1_100]
+CONV_B, VISITAS_B = [38, 51, 40], [1_000, 1_150, 1_050]
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = AlmacenExperimentos(str(tmp_path / "experimentos.sqlite"))
+    yield almacen
+    almacen.cerrar()
+
+
+@pytest.mark.parametrize("modelo", ["beta_binomial", "gamma_poisson"])
+def test_ida_y_vuelta_con_prior_no_por_defecto(almacen, modelo):
+    priors = {"alpha_prior_a": 3, "beta_prior_a": 50, "alpha_prior_b": 2, "beta_prior_b": 40}
+    original = almacen.crear("exp", modelo, semilla=7, **priors)
+    original.procesar_serie(CONV_A, VISITAS_A, CONV_B, VISITAS_B)
+    almacen.guardar("exp", original)
+
+    for cargada in (almacen.cargar("exp"), almacen.restaurar("exp")):
+        assert cargada.priors == original.priors
+        assert cargada.semilla == original.semilla
+    cargada = almacen.cargar("exp")
+    esperado, obtenido = original.resumen_secuencial(), cargada.resumen_secuencial()
+    for clave in ("diferencia", "error_estandar", "perdida_a", "perdida_b"):
+        np.testing.assert_allclose(obtenido[clave], esperado[clave])
+
+
+def test_guarda_los_ajustes_mcmc(almacen):
+    almacen.crear("mcmc", "gamma_poisson", metodo="mcmc", cadenas=4, nucleos=2)
+    cargada = almacen.cargar("mcmc")
+    assert (cargada.metodo, cargada.cadenas, cargada.nucleos, cargada.sampler_nuts) == ("mcmc", 4, 2, "pymc")
+
+
+@pytest.mark.parametrize("modelo", ["beta_binomial", "gamma_poisson"])
+def test_restaurar_mantiene_el_veredicto(almacen, modelo):
+    almacen.crear("exp", modelo)
+    almacen.actualizar_dia("exp", 300, 10_000, 420, 10_000, dia="d1")
+    restaurada = almacen.restaurar("exp")
+    assert len(restaurada.historial) == 1
+    veredicto = restaurada.detectar_ganador()
+    assert veredicto["ganador"] == "B"
+    assert veredicto == almacen.cargar("exp").detectar_ganador()
+
+
+@pytest.mark.parametrize("modelo", ["beta_binomial", "gamma_poisson"])
+def test_secuencial_necesita_el_historial_completo(almacen, modelo):
+    original = almacen.crear("exp", modelo)
+    original.procesar_serie(CONV_A, VISITAS_A, CONV_B, VISITAS_B)
+    almacen.guardar("exp", original)
+    diseno = DisenoSecuencial("gasto_alfa", n_miradas=5)
+
+    with pytest.raises(ValueError, match="historial completo"):
+        almacen.restaurar("exp").evaluar_secuencial(diseno)
+    esperado, obtenido = original.evaluar_secuencial(diseno), almacen.cargar("exp").evaluar_secuencial(diseno)
+    np.testing.assert_allclose(obtenido["estadistico"], esperado["estadistico"])
+    assert obtenido["parar"] == esperado["parar"]
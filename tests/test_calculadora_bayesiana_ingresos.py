@@ -0,0 +1,54 @@
+# tests/test_calculadora_bayesiana_ingresos.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculadora_bayesiana_ingresos import CalculadoraIngresosBayesiana
+from ingesta import estadisticos_por_dia
+
+# 3 días de ingresos por visitante: 5% (A) y 6% (B) compran, importe lognormal(3, 1),
+# así que la media real es 0.05 * exp(3.5) = 1.656 en A y 1.987 en B
+RNG = np.random.default_rng(2024)
+MEDIA_A, MEDIA_B = 0.05 * np.exp(3.5), 0.06 * np.exp(3.5)
+
+
+def _valores(n, prob_compra):
+    return np.where(RNG.random(n) < prob_compra, RNG.lognormal(3.0, 1.0, n), 0.0)
+
+
+DF = pd.concat([
+    pd.DataFrame({"Día": dia, "Grupo": grupo, "Valor": _valores(100_000, prob_compra)})
+    for dia in ("d1", "d2", "d3") for grupo, prob_compra in (("A", 0.05), ("B", 0.06))
+], ignore_index=True)
+
+
+@pytest.mark.parametrize("distribucion", ["normal", "cero_inflado"])
+def test_recupera_las_medias_y_el_ganador(distribucion):
+    calculadora = CalculadoraIngresosBayesiana(distribucion, semilla=0, num_samples=20_000)
+    calculadora.actualizar_con_lote(DF)
+    ultimo = calculadora.historial[-1]
+    for grupo, media in (("A", MEDIA_A), ("B", MEDIA_B)):
+        inf, sup = ultimo["posterior"][grupo]["ci"]
+        # Margen por el ruido de la simulación (IC de ~4% de anchura relativa)
+        assert inf * 0.97 < media < sup * 1.03
+    assert calculadora.detectar_ganador()["ganador"] == "B"
+
+
+def test_filas_por_usuario_y_estadisticos_dan_lo_mismo():
+    por_usuario = CalculadoraIngresosBayesiana("cero_inflado", semilla=3, num_samples=4_096)
+    por_usuario.actualizar_con_lote(DF)
+    por_dia = CalculadoraIngresosBayesiana("cero_inflado", semilla=3, num_samples=4_096)
+    por_dia.actualizar_con_lote(estadisticos_por_dia(DF))
+    pd.testing.assert_frame_equal(por_usuario.historial_dataframe(), por_dia.historial_dataframe())
+
+
+@pytest.mark.parametrize("esquema", ["antitetico", "sobol"])
+def test_esquemas_coinciden_con_el_aleatorio(esquema):
+    resumenes = {}
+    for nombre in ("aleatorio", esquema):
+        calculadora = CalculadoraIngresosBayesiana("cero_inflado", semilla=1, num_samples=2**16, esquema=nombre)
+        calculadora.actualizar_con_lote(DF)
+        resumenes[nombre] = calculadora.resumen_decision()
+    np.testing.assert_allclose(resumenes[esquema]["prob_b_mejor"], resumenes["aleatorio"]["prob_b_mejor"], atol=0.01)
+    np.testing.assert_allclose(resumenes[esquema]["mejora_relativa"], resumenes["aleatorio"]["mejora_relativa"],
+                               atol=0.01)
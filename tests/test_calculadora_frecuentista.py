@@ -0,0 +1,77 @@
+# tests/test_calculadora_frecuentista.py
+from itertools import combinations, permutations
+
+import numpy as np
+from scipy.stats import norm
+
+from calculadora_frecuentista import ConversionFrecuentistaMultiGrupo, comparar_proporciones
+
+# C convierte claramente más que los demás; D no tiene visitas todavía
+DATOS = {
+    "A": {"visitas": 10_000, "conv": 500},
+    "B": {"visitas": 9_500, "conv": 510},
+    "C": {"visitas": 10_200, "conv": 700},
+    "D": {"visitas": 0, "conv": 0},
+}
+
+
+def _pareja(datos_1, datos_2, umbral=0.95):
+    """
+    Fórmulas de la versión por parejas (un bucle por combinación) para g1 vs g2,
+    con prob_g1_mejor = Phi(z): P(g1 mejor que g2).
+    """
+    p1 = datos_1["conv"] / datos_1["visitas"] if datos_1["visitas"] > 0 else 0.0
+    p2 = datos_2["conv"] / datos_2["visitas"] if datos_2["visitas"] > 0 else 0.0
+    n1, n2 = datos_1["visitas"], datos_2["visitas"]
+    se_diff = np.sqrt(p1 * (1 - p1) / n1 + p2 * (1 - p2) / n2) if n1 > 0 and n2 > 0 else np.inf
+    z = (p1 - p2) / se_diff
+    prob_g1_mejor = norm.cdf(z)
+    z_score = norm.ppf(0.975)
+    return {
+        "diff_mean": p1 - p2,
+        "diff_ci": (p1 - p2 - z_score * se_diff, p1 - p2 + z_score * se_diff),
+        "uplift_mean": (p1 - p2) / p2 if p2 > 0 else np.inf,
+        "prob_g1_mejor": prob_g1_mejor,
+        "p_valor": 2 * norm.sf(abs(z)),
+        "ganador": "g1" if prob_g1_mejor >= umbral else ("g2" if 1 - prob_g1_mejor >= umbral else None),
+    }
+
+
+def test_matrices_coinciden_con_las_parejas():
+    calculadora = ConversionFrecuentistaMultiGrupo()
+    calculadora.analizar_datos(DATOS)
+    comparaciones = calculadora.resultados["comparaciones"]
+    # Mismo orden de claves que la versión por parejas: A_vs_B, B_vs_A, A_vs_C...
+    orden = [clave for g1, g2 in combinations(DATOS, 2) for clave in (f"{g1}_vs_{g2}", f"{g2}_vs_{g1}")]
+    assert list(comparaciones) == orden
+
+    for g1, g2 in permutations(DATOS, 2):
+        esperado = _pareja(DATOS[g1], DATOS[g2])
+        obtenido = comparaciones[f"{g1}_vs_{g2}"]
+        for clave in ("diff_mean", "uplift_mean", "prob_g1_mejor", "p_valor"):
+            np.testing.assert_allclose(obtenido[clave], esperado[clave], err_msg=f"{g1}_vs_{g2} {clave}")
+        np.testing.assert_allclose(obtenido["diff_ci"], esperado["diff_ci"])
+        assert obtenido["ganador"] == {"g1": g1, "g2": g2, None: None}[esperado["ganador"]]
+
+
+def test_prob_g1_mejor_crece_con_la_tasa_de_g1():
+    calculadora = ConversionFrecuentistaMultiGrupo()
+    calculadora.analizar_datos(DATOS)
+    comparaciones = calculadora.resultados["comparaciones"]
+    # C (6,9%) frente a A (5%): g1 es claramente mejor
+    assert comparaciones["C_vs_A"]["prob_g1_mejor"] > 0.99
+    assert comparaciones["A_vs_C"]["prob_g1_mejor"] < 0.01
+    assert comparaciones["C_vs_A"]["ganador"] == comparaciones["A_vs_C"]["ganador"] == "C"
+    assert comparaciones["A_vs_D"]["prob_g1_mejor"] == 0.5
+    assert calculadora.obtener_ganador_global() == "C"
+
+
+def test_comparar_proporciones_por_segmentos():
+    # Dos vectores paralelos (un A/B por segmento) dan lo mismo que cada pareja suelta
+    visitas_1, conv_1 = np.array([10_000, 9_500, 0]), np.array([500, 510, 0])
+    visitas_2, conv_2 = np.array([10_200, 10_000, 100]), np.array([700, 500, 5])
+    resultado = comparar_proporciones(visitas_1, conv_1, visitas_2, conv_2)
+    for s in range(3):
+        esperado = _pareja({"visitas": visitas_1[s], "conv": conv_1[s]}, {"visitas": visitas_2[s], "conv": conv_2[s]})
+        np.testing.assert_allclose(resultado["prob_g1_mejor"][s], esperado["prob_g1_mejor"])
+        np.testing.assert_allclose(resultado["diff_mean"][s], esperado["diff_mean"])
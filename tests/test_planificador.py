@@ -0,0 +1,22 @@
+# tests/test_planificador.py
+import numpy as np
+import pytest
+
+from planificador import planificar
+
+
+@pytest.mark.parametrize("modelo, tasa_base", [("beta_binomial", 0.05), ("gamma_poisson", 0.5)])
+def test_efecto_negativo_cuenta_como_acierto_declarar_a(modelo, tasa_base):
+    negativo = planificar(tasa_base, -0.1, 4_000, modelo=modelo, n_simulaciones=500, semilla=1)
+    positivo = planificar(tasa_base, 0.1, 4_000, modelo=modelo, n_simulaciones=500, semilla=1)
+
+    bayesiano = negativo["bayesiano"]
+    assert bayesiano["ganador_esperado"] == "A"
+    assert positivo["bayesiano"]["ganador_esperado"] == "B"
+    # La potencia frecuentista es simétrica; la bayesiana tiene que serlo también
+    assert negativo["frecuentista"]["potencia"] > 0.8
+    assert bayesiano["potencia"] > 0.8
+    assert bayesiano["prob_error_signo"] < 0.05
+    assert bayesiano["dias_mediana"] is not None
+    np.testing.assert_allclose(bayesiano["potencia"], positivo["bayesiano"]["potencia"], atol=0.05)
+    assert negativo["curva"]["potencia_bayesiana"].iloc[-1] == bayesiano["potencia"]
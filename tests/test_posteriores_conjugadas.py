@@ -0,0 +1,77 @@
+# tests/test_posteriores_conjugadas.py
+import numpy as np
+import pytest
+
+from calculadora_bayesiana_conversiones import CalculadoraConversionesBayesiana
+from posteriores_conjugadas import comparar_grupos, cuantiles_uplift_beta, uplift_medio_beta
+
+# Serie de 10 días con unas 2.000 visitas por grupo y día
+RNG = np.random.default_rng(12345)
+VISITAS_A = RNG.integers(1_500, 2_500, 10)
+VISITAS_B = RNG.integers(1_500, 2_500, 10)
+CONV_A = RNG.binomial(VISITAS_A, 0.050)
+CONV_B = RNG.binomial(VISITAS_B, 0.056)
+
+# Con 400.000 muestras el error de Monte Carlo de P(B > A) es < 0,001, el de la
+# media del uplift (desviación ~0,05) ~1e-4 y el de sus percentiles 2,5/97,5 ~5e-4;
+# las tolerancias dejan margen de sobra. Las pérdidas se comparan en relativo
+# (con un mínimo absoluto para las que son casi 0)
+NUM_SAMPLES = 400_000
+TOLERANCIA_PROB = 0.005
+TOLERANCIA_UPLIFT = 0.003
+TOLERANCIA_PERDIDA_REL = 0.05
+
+
+def _historial(metodo):
+    calculadora = CalculadoraConversionesBayesiana(num_samples=NUM_SAMPLES, metodo=metodo, semilla=0)
+    calculadora.procesar_serie(CONV_A, VISITAS_A, CONV_B, VISITAS_B)
+    return calculadora.historial_dataframe().iloc[1:]
+
+
+@pytest.fixture(scope="module")
+def historiales():
+    return _historial("muestreo"), _historial("exacto")
+
+
+def test_prob_b_mejor_coincide(historiales):
+    muestreo, exacto = historiales
+    np.testing.assert_allclose(exacto["Prob. B > A"], muestreo["Prob. B > A"], atol=TOLERANCIA_PROB)
+
+
+@pytest.mark.parametrize("columna", ["Pérdida esperada A", "Pérdida esperada B"])
+def test_perdidas_esperadas_coinciden(historiales, columna):
+    muestreo, exacto = historiales
+    np.testing.assert_allclose(exacto[columna], muestreo[columna], rtol=TOLERANCIA_PERDIDA_REL, atol=1e-5)
+
+
+@pytest.mark.parametrize("columna", ["Uplift medio", "Uplift IC 95% inf", "Uplift IC 95% sup"])
+def test_uplift_coincide(historiales, columna):
+    muestreo, exacto = historiales
+    np.testing.assert_allclose(exacto[columna], muestreo[columna], atol=TOLERANCIA_UPLIFT)
+
+
+def test_uplift_medio_sin_media_es_la_mediana():
+    # Primer día sin conversiones en A con el prior Beta(1, 1): E[1 / A] no existe
+    alpha_a, beta_a, alpha_b, beta_b = (np.array([x]) for x in (1.0, 11.0, 3.0, 9.0))
+    mediana = cuantiles_uplift_beta(alpha_a, beta_a, alpha_b, beta_b, probabilidades=(0.5,))[:, 0]
+    media = uplift_medio_beta(alpha_a, beta_a, alpha_b, beta_b)
+    assert np.all(np.isfinite(media))
+    np.testing.assert_allclose(media, mediana)
+
+
+def test_posteriores_muy_asimetricas():
+    # A casi sin datos y B muy concentrada: toda la subida de F_B cae en una zona
+    # pequeña del soporte de A. Con 2.000.000 de muestras el error de Monte Carlo del
+    # percentil 97,5 del uplift (cola larga por A cerca de 0) es ~0,03
+    alpha_a, beta_a, alpha_b, beta_b = 1.0, 2.0, 3_000.0, 27_000.0
+    rng = np.random.default_rng(0)
+    muestras_a = rng.beta(alpha_a, beta_a, 2_000_000)
+    muestras_b = rng.beta(alpha_b, beta_b, 2_000_000)
+    uplift = muestras_b / muestras_a - 1
+
+    inferior, superior = cuantiles_uplift_beta([alpha_a], [beta_a], [alpha_b], [beta_b])[0]
+    np.testing.assert_allclose(inferior, np.percentile(uplift, 2.5), atol=0.001)
+    np.testing.assert_allclose(superior, np.percentile(uplift, 97.5), atol=0.15)
+    comparacion = comparar_grupos("beta", np.array([alpha_a, alpha_b]), np.array([beta_a, beta_b]))
+    np.testing.assert_allclose(comparacion["prob_mejor"].sum(), 1.0, atol=1e-9)
+    np.testing.assert_allclose(comparacion["prob_mejor"][1], np.mean(muestras_b > muestras_a), atol=TOLERANCIA_PROB)
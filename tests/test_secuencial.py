@@ -0,0 +1,38 @@
+# tests/test_secuencial.py
+import numpy as np
+import pytest
+from scipy import stats
+
+from secuencial import DisenoSecuencial, fronteras_gasto_alfa
+
+# Fronteras z bilaterales publicadas (Lan-DeMets, alpha = 0.05, miradas equiespaciadas)
+FRONTERAS_PUBLICADAS = {
+    (3, "obrien_fleming"): (3.7103, 2.5114, 1.9930),
+    (5, "obrien_fleming"): (4.8769, 3.3569, 2.6803, 2.2898, 2.0310),
+    (5, "pocock"): (2.4380, 2.4268, 2.4101, 2.3966, 2.3859),
+}
+
+
+@pytest.mark.parametrize("n_miradas, gasto", list(FRONTERAS_PUBLICADAS))
+def test_fronteras_publicadas(n_miradas, gasto):
+    np.testing.assert_allclose(fronteras_gasto_alfa(n_miradas, 0.05, gasto),
+                               FRONTERAS_PUBLICADAS[n_miradas, gasto], atol=2e-4)
+
+
+def test_una_mirada_es_el_test_z():
+    np.testing.assert_allclose(fronteras_gasto_alfa(1), [stats.norm.isf(0.025)])
+
+
+def test_la_primera_mirada_que_cruza_detiene_el_test():
+    diseno = DisenoSecuencial("gasto_alfa", n_miradas=3)
+    # |z| = 1, 5 y 1.5: solo la segunda mirada cruza su frontera (2.51)
+    resumenes = {"diferencia": np.array([0.01, -0.05, -0.015]), "error_estandar": np.full(3, 0.01)}
+    serie = diseno.evaluar_serie(resumenes)
+    assert serie["cruza"].tolist() == [False, True, False]
+    assert (serie["parar"], serie["mirada_parada"], serie["ganador"]) == (True, 2, "A")
+
+    anterior = None
+    for mirada in range(1, 4):
+        resumen = {campo: valores[mirada - 1] for campo, valores in resumenes.items()}
+        anterior = diseno.evaluar(resumen, mirada, anterior)
+    assert (anterior["parar"], anterior["mirada_parada"], anterior["ganador"]) == (True, 2, "A")
@@ -0,0 +1,139 @@
+# tests/test_trabajos.py
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import trabajos
+from calculadora_bayesiana import CalculadoraClicksBayesiana
+from trabajos import ColaAjustes
+
+PRIOR = (1.0, 1.0, 1.0, 1.0)
+
+
+# Ajustes falsos en lugar de NUTS: muestras directas de las posteriores Gamma.
+# Tienen que ser funciones de módulo para poder ejecutarse en el pool de procesos.
+def _ajuste(priors, datos, rng, cadenas=2, nucleos=1, sampler_nuts="pymc", espera=0.0):
+    time.sleep(espera)
+    alpha_a, beta_a, alpha_b, beta_b = priors
+    clicks_a, visitas_a, clicks_b, visitas_b = datos
+    return CalculadoraClicksBayesiana._trace_desde_muestras(
+        rng.gamma(alpha_a + clicks_a, 1 / (beta_a + visitas_a), 500),
+        rng.gamma(alpha_b + clicks_b, 1 / (beta_b + visitas_b), 500),
+    )
+
+
+def _ajuste_rapido(*args):
+    return _ajuste(*args, espera=0.02)
+
+
+def _ajuste_primer_dia_lento(priors, *args):
+    # El primer día (el de priors iniciales) termina el último
+    return _ajuste(priors, *args, espera=0.5 if priors == PRIOR else 0.0)
+
+
+def _ajuste_lento(*args):
+    return _ajuste(*args, espera=0.5)
+
+
+def _ajuste_que_muere(*args):
+    os._exit(1)
+
+
+def _datos(n_dias):
+    rng = np.random.default_rng(n_dias)
+    return pd.DataFrame({
+        "Día": [f"d{i}" for i in range(n_dias)],
+        "Conversiones A": rng.poisson(50, n_dias), "Visitas A": np.full(n_dias, 100),
+        "Conversiones B": rng.poisson(60, n_dias), "Visitas B": np.full(n_dias, 100),
+    })
+
+
+def _esperar(cola, id_trabajo, estados=("terminado", "cancelado", "error"), limite=60):
+    inicio = time.monotonic()
+    while cola.estado(id_trabajo)["estado"] not in estados:
+        assert time.monotonic() - inicio < limite, cola.estado(id_trabajo)
+        time.sleep(0.01)
+    return cola.estado(id_trabajo)
+
+
+@pytest.fixture
+def cola():
+    cola = ColaAjustes(max_procesos=2)
+    yield cola
+    cola.cerrar()
+
+
+def _calculadora():
+    return CalculadoraClicksBayesiana(metodo="mcmc", semilla=5)
+
+
+def test_registra_los_dias_en_orden(cola, monkeypatch):
+    monkeypatch.setattr(trabajos, "ajustar_mcmc", _ajuste_primer_dia_lento)
+    df = _datos(4)
+    calculadora = _calculadora()
+    id_trabajo = cola.enviar(calculadora, df)
+    assert _esperar(cola, id_trabajo)["estado"] == "terminado"
+    resultado = cola.resultado(id_trabajo)
+
+    # Lo mismo que ajustar y registrar cada día en orden en este proceso
+    esperado = _calculadora()
+    for tarea in esperado.tareas_mcmc(*(df[c].to_numpy() for c in df.columns[1:]), dias=list(df["Día"])):
+        esperado.registrar_mcmc(tarea, _ajuste(tarea["priors"], tarea["datos"], tarea["rng"]))
+    assert [paso["dia"] for paso in resultado.historial] == [paso["dia"] for paso in esperado.historial]
+    assert resultado.resumen_decision() == esperado.resumen_decision()
+    # La calculadora enviada no cambia: el trabajo usa una copia
+    assert len(calculadora.historial) == 1
+
+
+def test_reparte_por_turnos(monkeypatch):
+    monkeypatch.setattr(trabajos, "ajustar_mcmc", _ajuste_rapido)
+    cola = ColaAjustes(max_procesos=1)
+    try:
+        largo = cola.enviar(_calculadora(), _datos(10))
+        corto = cola.enviar(_calculadora(), _datos(2))
+        assert _esperar(cola, corto)["estado"] == "terminado"
+        # Con turnos alternos el corto acaba tras unas 5 tareas, no tras las 10 del largo
+        assert cola.estado(largo)["hechos"] < 10
+        assert _esperar(cola, largo)["estado"] == "terminado"
+    finally:
+        cola.cerrar()
+
+
+def test_cancelar_con_tareas_en_vuelo(cola, monkeypatch):
+    monkeypatch.setattr(trabajos, "ajustar_mcmc", _ajuste_lento)
+    id_trabajo = cola.enviar(_calculadora(), _datos(6))
+    assert cola.estado(id_trabajo)["en_vuelo"] == 2
+    assert cola.cancelar(id_trabajo)
+    assert not cola.cancelar(id_trabajo)
+
+    # Las tareas en vuelo terminan pero no se registran, y dejan el hueco libre
+    inicio = time.monotonic()
+    while cola.estado(id_trabajo)["en_vuelo"]:
+        assert time.monotonic() - inicio < 60
+        time.sleep(0.01)
+    assert cola.estado(id_trabajo)["estado"] == "cancelado"
+    assert cola.estado(id_trabajo)["hechos"] == 0
+    assert cola.resultado(id_trabajo) is None
+
+    monkeypatch.setattr(trabajos, "ajustar_mcmc", _ajuste_rapido)
+    siguiente = cola.enviar(_calculadora(), _datos(3))
+    assert _esperar(cola, siguiente)["estado"] == "terminado"
+
+
+def test_se_recupera_de_un_pool_roto(cola, monkeypatch):
+    monkeypatch.setattr(trabajos, "ajustar_mcmc", _ajuste_que_muere)
+    roto = cola.enviar(_calculadora(), _datos(1))
+    estado = _esperar(cola, roto)
+    assert estado["estado"] == "error"
+    assert "BrokenProcessPool" in estado["error"]
+    with pytest.raises(RuntimeError):
+        cola.resultado(roto)
+
+    # El siguiente trabajo usa un pool nuevo
+    monkeypatch.setattr(trabajos, "ajustar_mcmc", _ajuste_rapido)
+    siguiente = cola.enviar(_calculadora(), _datos(3))
+    assert _esperar(cola, siguiente)["estado"] == "terminado"
+    assert len(cola.resultado(siguiente).historial) == 4
@@ -0,0 +1,206 @@
+# trabajos.py
+#
+# Cola de ajustes MCMC en segundo plano.
+#
+# Con metodo="mcmc" cada día de un CSV es un ajuste NUTS de varios segundos. En vez
+# de hacerlos en el hilo de la petición (la página queda congelada y frena a las
+# demás sesiones del servidor), ColaAjustes los reparte en un pool de procesos
+# común con concurrencia acotada:
+#
+#   cola = ColaAjustes(max_procesos=2)
+#   id_trabajo = cola.enviar(calculadora, df)
+#   cola.estado(id_trabajo)      # {"estado": "ejecutando", "hechos": 3, "total": 30, ...}
+#   cola.resultado(id_trabajo)   # calculadora con los días añadidos (al terminar)
+#   cola.cancelar(id_trabajo)
+#
+# Cada día es una tarea independiente (calculadora.tareas_mcmc). Las tareas de los
+# trabajos activos se lanzan por turnos, así que un CSV largo no deja esperando a
+# los demás. Un trabajo trabaja sobre una copia de la calculadora y solo se puede
+# recoger cuando ha terminado: la de la sesión no cambia a medias.
+import copy
+import itertools
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from calculadora_bayesiana import ajustar_mcmc
+from ingesta import series_desde_dataframe
+
+ESTADOS = ("en_cola", "ejecutando", "terminado", "cancelado", "error")
+
+
+class _Trabajo:
+    def __init__(self, calculadora, tareas):
+        self.calculadora = calculadora
+        self.tareas = tareas
+        self.pendientes = deque(range(len(tareas)))
+        self.en_vuelo = {}
+        self.traces = {}
+        self.registrados = 0
+        self.estado = "en_cola"
+        self.error = None
+
+    def resumen(self):
+        return {
+            "estado": self.estado,
+            "hechos": self.registrados,
+            "total": len(self.tareas),
+            "en_vuelo": len(self.en_vuelo),
+            "error": self.error,
+        }
+
+
+class ColaAjustes:
+    """
+    Pool de procesos para los ajustes MCMC de las calculadoras Gamma-Poisson, con
+    como mucho max_procesos días ajustándose a la vez entre todos los trabajos.
+    Cada ajuste usa además calculadora.nucleos procesos para sus cadenas.
+
+    El pool se crea con el primer trabajo y con el contexto por defecto, como los
+    de analisis_segmentos y planificador: con "spawn" los procesos volverían a
+    ejecutar el script de Streamlit, que es el __main__ de la app.
+    """
+
+    def __init__(self, max_procesos=2):
+        if max_procesos < 1:
+            raise ValueError("max_procesos debe ser al menos 1")
+        self.max_procesos = max_procesos
+        self._pool = None
+        self._lock = threading.RLock()
+        self._trabajos = {}
+        self._turnos = deque()
+        self._en_vuelo = 0
+
+    def enviar(self, calculadora, df):
+        """
+        Encola los días de df (mismas columnas que actualizar_con_lote) y devuelve
+        el ID del trabajo. La calculadora tiene que usar metodo="mcmc".
+        """
+        if getattr(calculadora, "metodo", None) != "mcmc":
+            raise ValueError("Solo se encolan calculadoras con metodo='mcmc'")
+        copia = copy.deepcopy(calculadora)
+        dias, clicks_a, visitas_a, clicks_b, visitas_b = series_desde_dataframe(df)
+        trabajo = _Trabajo(copia, copia.tareas_mcmc(clicks_a, visitas_a, clicks_b, visitas_b, dias=dias))
+        id_trabajo = uuid.uuid4().hex
+        with self._lock:
+            self._trabajos[id_trabajo] = trabajo
+            if trabajo.tareas:
+                self._turnos.append(id_trabajo)
+            else:
+                trabajo.estado = "terminado"
+            self._lanzar()
+        return id_trabajo
+
+    def estado(self, id_trabajo):
+        """
+        {estado, hechos, total, en_vuelo, error}: hechos son los días ya añadidos
+        a la calculadora del trabajo (en orden) y estado uno de ESTADOS.
+        """
+        with self._lock:
+            return self._trabajo(id_trabajo).resumen()
+
+    def resultado(self, id_trabajo):
+        """
+        Calculadora con todos los días del trabajo, o None si todavía no ha terminado.
+        Un trabajo con error relanza aquí su excepción.
+        """
+        with self._lock:
+            trabajo = self._trabajo(id_trabajo)
+            if trabajo.estado == "error":
+                raise RuntimeError(f"El trabajo {id_trabajo} falló: {trabajo.error}")
+            return trabajo.calculadora if trabajo.estado == "terminado" else None
+
+    def cancelar(self, id_trabajo):
+        """
+        Descarta los días que quedan por lanzar. Los que ya se están ajustando
+        terminan, pero su resultado se ignora. Devuelve True si el trabajo seguía activo.
+        """
+        with self._lock:
+            trabajo = self._trabajo(id_trabajo)
+            if trabajo.estado not in ("en_cola", "ejecutando"):
+                return False
+            self._finalizar(id_trabajo, trabajo, "cancelado")
+            for futuro in list(trabajo.en_vuelo.values()):
+                futuro.cancel()
+            return True
+
+    def olvidar(self, id_trabajo):
+        """
+        Cancela el trabajo si sigue activo y lo quita de la cola.
+        """
+        with self._lock:
+            if id_trabajo in self._trabajos:
+                self.cancelar(id_trabajo)
+                del self._trabajos[id_trabajo]
+
+    def cerrar(self):
+        with self._lock:
+            for id_trabajo in list(self._trabajos):
+                self.cancelar(id_trabajo)
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _trabajo(self, id_trabajo):
+        if id_trabajo not in self._trabajos:
+            raise KeyError(f"Trabajo desconocido '{id_trabajo}'")
+        return self._trabajos[id_trabajo]
+
+    def _finalizar(self, id_trabajo, trabajo, estado, error=None):
+        trabajo.estado = estado
+        trabajo.error = error
+        trabajo.pendientes.clear()
+        trabajo.traces.clear()
+        if id_trabajo in self._turnos:
+            self._turnos.remove(id_trabajo)
+
+    def _lanzar(self):
+        """
+        Lanza tareas mientras haya hueco, una de cada trabajo activo por turnos.
+        """
+        while self._en_vuelo < self.max_procesos and self._turnos:
+            id_trabajo = self._turnos.popleft()
+            trabajo = self._trabajos[id_trabajo]
+            indice = trabajo.pendientes.popleft()
+            if trabajo.pendientes:
+                self._turnos.append(id_trabajo)
+
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_procesos)
+            tarea = trabajo.tareas[indice]
+            calculadora = trabajo.calculadora
+            futuro = self._pool.submit(ajustar_mcmc, tarea["priors"], tarea["datos"], tarea["rng"],
+                                       calculadora.cadenas, calculadora.nucleos, calculadora.sampler_nuts)
+            trabajo.estado = "ejecutando"
+            trabajo.en_vuelo[indice] = futuro
+            self._en_vuelo += 1
+            futuro.add_done_callback(
+                lambda futuro, id_trabajo=id_trabajo, indice=indice: self._al_terminar(id_trabajo, indice, futuro)
+            )
+
+    def _al_terminar(self, id_trabajo, indice, futuro):
+        with self._lock:
+            self._en_vuelo -= 1
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is not None:
+                trabajo.en_vuelo.pop(indice, None)
+            if trabajo is not None and trabajo.estado == "ejecutando":
+                error = None if futuro.cancelled() else futuro.exception()
+                if isinstance(error, BrokenProcessPool):
+                    # Un proceso murió (memoria...): el pool ya no sirve, se crea otro
+                    self._pool = None
+                if error is not None:
+                    self._finalizar(id_trabajo, trabajo, "error", f"{type(error).__name__}: {error}")
+                else:
+                    trabajo.traces[indice] = futuro.result()
+                    # Los días se añaden a la calculadora en orden, según van llegando
+                    for siguiente in itertools.count(trabajo.registrados):
+                        if siguiente not in trabajo.traces:
+                            break
+                        trabajo.calculadora.registrar_mcmc(trabajo.tareas[siguiente], trabajo.traces.pop(siguiente))
+                        trabajo.registrados += 1
+                    if trabajo.registrados == len(trabajo.tareas):
+                        trabajo.estado = "terminado"
+            self._lanzar()